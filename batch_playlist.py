@@ -0,0 +1,46 @@
+import argparse
+import json
+
+import pandas as pd
+
+from src.ach import Ach
+from src.muzik import ACH_IDS, ACH_IDS_LEGACY
+from src.profiler import event
+from src.util import load_cache
+from prototyping.batch import generate_playlists
+from prototyping.playlist import load_transitions
+from prototyping.scoring import GradeMatrix
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate the playlists of many guest lists at once")
+    parser.add_argument("specs", help="json file with the list of playlist specs, see data/batch_example.json")
+    parser.add_argument("--output", default="playlists.csv", help="csv file where the playlists are saved")
+    parser.add_argument("--workers", type=int, default=None, help="number of processes")
+    args = parser.parse_args()
+
+    with open(args.specs, "r") as handle:
+        specs = json.load(handle)
+
+    # everything is loaded once for all the playlists
+    ach = Ach()
+    sheet = ach.get_sheets()
+    ids = load_cache(ACH_IDS, legacy=ACH_IDS_LEGACY)
+    if ids is None:
+        raise SystemExit("No cached ids, run main_playlist.py first")
+    ids = ids[~ids.isnull()]
+    grades = GradeMatrix(sheet.loc[ids.index])
+    transitions = load_transitions(ach=ach)
+
+    playlists, timings = generate_playlists(grades, transitions, specs, workers=args.workers)
+
+    # every playlist in a single file, in order
+    frames = []
+    for name, playlist in playlists.items():
+        frame = playlist.reset_index()
+        frame.insert(0, "playlist", name)
+        frame["id"] = ids[playlist.index].values
+        frames.append(frame)
+    if frames:
+        pd.concat(frames).to_csv(args.output, index=False)
+        event(f"Playlists saved in {args.output}", path=args.output)
+    event(json.dumps(timings, indent=2), timings=timings)
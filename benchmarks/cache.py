@@ -0,0 +1,94 @@
+"""
+Compares the pickle caches with the columnar cache of src/util.py on a synthetic sheet: first save, load, save of
+the loaded sheet unchanged and with one column changed. Times are the median of --repeat runs
+usage: python -m benchmarks.cache [--rows 100000] [--seed 0] [--repeat 5]
+"""
+import argparse
+import os
+import shutil
+import statistics
+import time
+import tracemalloc
+
+import pandas as pd
+
+from prototyping.data import load_from_cache, DATA_PATH
+from prototyping.shuffle import INDEX_COLUMNS
+from src.util import create_cache_dir, cache, save_cache, load_cache
+
+BENCHMARK_CACHE = "benchmark_sheet"
+
+
+def synthetic_sheet(rows, seed):
+    """Sheet of rows songs drawn from the local csv, as Ach.get_sheets returns it"""
+    sheet = load_from_cache(DATA_PATH).astype(str).replace("nan", "")
+    sheet = sheet.sample(n=rows, replace=True, random_state=seed)
+    # make every song unique
+    sheet["song"] = sheet["song"] + [f" #{i}" for i in range(rows)]
+    return sheet.set_index(INDEX_COLUMNS).drop(columns=["api:Spotify"])
+
+
+def measured(function, *args):
+    """Returns the result and the peak traced memory of a call"""
+    tracemalloc.start()
+    result = function(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, peak
+
+
+def timed(function, repeat, setup=None):
+    """Median wall time of repeat calls, setup() being run before each of them"""
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    create_cache_dir()
+    sheet = synthetic_sheet(args.rows, args.seed)
+    pickle_path = cache(BENCHMARK_CACHE + ".pkl")
+    columnar_path = cache(BENCHMARK_CACHE)
+    try:
+        pickle_save = timed(lambda: sheet.to_pickle(pickle_path), args.repeat)
+        columnar_save = timed(lambda: save_cache(sheet, BENCHMARK_CACHE), args.repeat,
+                              setup=lambda: shutil.rmtree(columnar_path, ignore_errors=True))
+        from_pickle, pickle_peak = measured(pd.read_pickle, pickle_path)
+        loaded, columnar_peak = measured(load_cache, BENCHMARK_CACHE)
+        assert loaded.astype(object).equals(from_pickle)
+        pickle_load = timed(lambda: pd.read_pickle(pickle_path), args.repeat)
+        columnar_load = timed(lambda: load_cache(BENCHMARK_CACHE), args.repeat)
+        # what the next run saves: the loaded sheet, as is or with the grades of one contributor changed
+        unchanged = timed(lambda: save_cache(loaded, BENCHMARK_CACHE), args.repeat)
+        changed = loaded.copy()
+        changed[changed.columns[0]] = changed[changed.columns[0]].astype(object).fillna("") + "0"
+        one_column = timed(lambda: save_cache(changed, BENCHMARK_CACHE), args.repeat,
+                           setup=lambda: save_cache(loaded, BENCHMARK_CACHE))
+        pickle_resave = timed(lambda: from_pickle.to_pickle(pickle_path), args.repeat)
+        assert load_cache(BENCHMARK_CACHE).astype(object).equals(changed.astype(object))
+    finally:
+        if os.path.exists(pickle_path):
+            os.remove(pickle_path)
+        shutil.rmtree(columnar_path, ignore_errors=True)
+
+    print(f"{'':>9} {'save (s)':>9} {'load (s)':>9} {'load peak (MB)':>15} {'resave (s)':>11} "
+          f"{'one column changed (s)':>23}")
+    print(f"{'pickle':>9} {pickle_save:>9.3f} {pickle_load:>9.3f} {pickle_peak / 2 ** 20:>15.1f} "
+          f"{pickle_resave:>11.3f} {pickle_resave:>23.3f}")
+    print(f"{'columnar':>9} {columnar_save:>9.3f} {columnar_load:>9.3f} {columnar_peak / 2 ** 20:>15.1f} "
+          f"{unchanged:>11.3f} {one_column:>23.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Times the Schulze ranking on the full local sheet, by top-K candidates and by genre blocks
+usage: python -m benchmarks.condorcet [--top-k 250 500 1000]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from prototyping.condorcet import pairwise_preferences, widest_paths, schulze_wins
+from prototyping.scoring import GradeMatrix
+from benchmarks.scoring import load_sheet
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--top-k", type=int, nargs="+", default=[250, 500, 1000])
+    args = parser.parse_args()
+
+    sheet = load_sheet()
+    grades = GradeMatrix(sheet)
+    people = grades.columns([person for person in grades.people if person != "alb?"])
+    values = grades.grades[:, people]
+    mean = np.nanmean(values, axis=1)
+    by_mean = np.argsort(-np.nan_to_num(mean, nan=-1), kind="stable")
+    print(f"{len(sheet)} tracks, {len(people)} contributors")
+
+    for top_k in args.top_k:
+        candidates = values[by_mean[:top_k]]
+        preferences, pairwise_time = timed(pairwise_preferences, candidates)
+        _, paths_time = timed(widest_paths, preferences)
+        print(f"top {top_k:>5}: pairwise {pairwise_time:.3f}s, widest paths {paths_time:.3f}s")
+
+    genres = sheet.index.get_level_values("genre")
+    start = time.perf_counter()
+    biggest = 0
+    for genre in genres.unique():
+        block = values[np.flatnonzero(genres == genre)]
+        biggest = max(biggest, len(block))
+        schulze_wins(block)
+    print(f"genre blocks: {genres.nunique()} blocks (biggest {biggest}) in {time.perf_counter() - start:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
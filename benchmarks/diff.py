@@ -0,0 +1,72 @@
+"""
+Compares diff_index() with the merge/concat diff Muzik.update used to do
+usage: python -m benchmarks.diff [--rows 100000] [--changes 1000] [--seed 0]
+"""
+import argparse
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from src.diff import diff_index, fingerprint
+
+
+def synthetic_index(rows, seed):
+    """Random sheet index of rows songs, a few of them duplicated"""
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({
+        "genre": rng.choice(["Rock", "Pop", "Jazz", "Metal"], rows),
+        "sub_genre": rng.choice(["", "Soft", "Hard"], rows),
+        "artist": [f"artist {i}" for i in rng.integers(0, rows // 10, rows)],
+        "album": [f"album {i}" for i in rng.integers(0, rows // 5, rows)],
+        "song": [f"song {i}" for i in range(rows)],
+    })
+    duplicates = frame.sample(n=rows // 1000, random_state=seed)
+    return pd.MultiIndex.from_frame(pd.concat([frame, duplicates]))
+
+
+def concat_diff(old, new):
+    """Former Muzik.update implementation, returns (removed, added) frames"""
+    new_songs = new.to_frame().reset_index(drop=True)
+    old_songs = old.to_frame().reset_index(drop=True)
+    common_songs = new_songs.merge(old_songs, how='inner')
+    depr = pd.concat([common_songs, old_songs]).drop_duplicates(keep=False)
+    news = pd.concat([common_songs, new_songs]).drop_duplicates(keep=False)
+    return depr, news
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--changes", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    old = synthetic_index(args.rows, args.seed)
+    kept = old[args.changes:]
+    new = kept.append(synthetic_index(args.changes, args.seed + 1))
+
+    (removed, added), concat_time = timed(concat_diff, old, new)
+    changes, diff_time = timed(diff_index, old, new)
+    _, fingerprint_time = timed(fingerprint, new)
+    print(f"merge/concat diff : {concat_time:.3f}s "
+          f"({len(removed)} removed, {len(added)} added)")
+    print(f"diff_index        : {diff_time:.3f}s "
+          f"({len(changes.removed)} removed, {len(changes.added)} added)")
+    print(f"fingerprint       : {fingerprint_time:.3f}s")
+
+    # multiset reference, duplicates included
+    old_count, new_count = Counter(old), Counter(new)
+    assert Counter(old[changes.removed]) == old_count - new_count
+    assert Counter(new[changes.added]) == new_count - old_count
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+"""
+Local stand-ins for the remote APIs, used to run the benchmarks offline
+"""
+import json
+import os
+import threading
+import time
+
+from spotipy import SpotifyException
+
+
+class FakeSpotify:
+    """
+    Minimal spotipy.Spotify replacement, every call sleeps `latency`
+    seconds. A search finds a track unless its query contains one of
+    the `missing` strings. If `throttle_every` is set, one call out of
+    `throttle_every` fails with a 429 and a `retry_after` header.
+    The tracks endpoint answers that the `unavailable` ids are not
+    playable, that the `deleted` ones do not exist and relinks the
+    keys of `relinked` to their value
+    """
+    TRACKS_PAGE = 50
+
+    def __init__(self, latency=0.02, missing=(), throttle_every=None,
+                 retry_after=1, unavailable=(), deleted=(), relinked=None):
+        self.latency = latency
+        self.missing = missing
+        self.unavailable = set(unavailable)
+        self.deleted = set(deleted)
+        self.relinked = relinked or {}
+        self.throttle_every = throttle_every
+        self.retry_after = retry_after
+        self.calls = 0
+        self.throttled = 0
+        self.__lock = threading.Lock()
+
+    def _call(self):
+        with self.__lock:
+            self.calls += 1
+            throttled = (self.throttle_every is not None
+                         and self.calls % self.throttle_every == 0)
+            if throttled:
+                self.throttled += 1
+        time.sleep(self.latency)
+        if throttled:
+            raise SpotifyException(
+                429, -1, "API rate limit exceeded",
+                headers={"Retry-After": str(self.retry_after)}
+            )
+
+    def search(self, q, market=None, **kwargs):
+        self._call()
+        if any(missing in q for missing in self.missing):
+            return {"tracks": {"items": []}}
+        track = {
+            "id": f"{abs(hash((q, market))):022d}"[:22],
+            "name": q,
+            "artists": [{"name": "fake"}],
+            "album": {"name": "fake"},
+        }
+        return {"tracks": {"items": [track]}}
+
+    def tracks(self, tracks, market=None):
+        self._call()
+        if len(tracks) > self.TRACKS_PAGE:
+            raise SpotifyException(400, -1, "Too many ids requested")
+        answer = []
+        for id in tracks:
+            if id in self.deleted:
+                answer.append(None)
+            elif id in self.relinked:
+                answer.append({"id": self.relinked[id], "is_playable": True,
+                               "linked_from": {"id": id}})
+            else:
+                answer.append({"id": id,
+                               "is_playable": id not in self.unavailable})
+        return {"tracks": answer}
+
+
+class FakeSpotifyUser(FakeSpotify):
+    """
+    FakeSpotify with the playlist endpoints used by Muzik, the
+    playlists are kept in memory. Lists are paginated like the Web API
+    and a request with more than MAX_ITEMS tracks is rejected
+    """
+    MAX_ITEMS = 100
+    PAGE = 50
+
+    def __init__(self, playlists=0, **kwargs):
+        """
+        playlists : number of other playlists of the user, to go
+                    through the pagination of user_playlists
+        """
+        super().__init__(**kwargs)
+        self.playlists = {
+            f"other{idx}": {"name": f"Other {idx}", "tracks": [],
+                            "snapshot": 0}
+            for idx in range(playlists)
+        }
+
+    def __snapshot(self, playlist_id):
+        playlist = self.playlists[playlist_id]
+        playlist["snapshot"] += 1
+        return {"snapshot_id": f"{playlist_id}-{playlist['snapshot']}"}
+
+    def __check_size(self, tracks):
+        if len(tracks) > self.MAX_ITEMS:
+            raise SpotifyException(400, -1, "Too many ids requested")
+
+    def me(self):
+        self._call()
+        return {"id": "fake-user"}
+
+    def user_playlists(self, user, limit=PAGE, offset=0):
+        self._call()
+        items = [{"id": playlist_id, "name": playlist["name"]}
+                 for playlist_id, playlist in self.playlists.items()]
+        page = items[offset:offset + limit]
+        more = offset + limit < len(items)
+        return {"items": page, "total": len(items),
+                "next": f"offset={offset + limit}" if more else None}
+
+    def user_playlist_create(self, user, name, public=True,
+                             description=""):
+        self._call()
+        playlist_id = f"playlist{len(self.playlists)}"
+        self.playlists[playlist_id] = {"name": name, "tracks": [],
+                                       "snapshot": 0}
+        return {"id": playlist_id}
+
+    def playlist_upload_cover_image(self, playlist_id, image):
+        self._call()
+
+    def playlist(self, playlist_id, fields=None):
+        self._call()
+        playlist = self.playlists[playlist_id]
+        return {"snapshot_id": f"{playlist_id}-{playlist['snapshot']}"}
+
+    def playlist_tracks(self, playlist_id, fields=None, limit=MAX_ITEMS,
+                        offset=0):
+        self._call()
+        tracks = self.playlists[playlist_id]["tracks"][offset:offset + limit]
+        return {"items": [{"track": {"id": track}} for track in tracks]}
+
+    def user_playlist_replace_tracks(self, user, playlist_id, tracks):
+        self._call()
+        self.__check_size(tracks)
+        self.playlists[playlist_id]["tracks"] = list(tracks)
+        return self.__snapshot(playlist_id)
+
+    def user_playlist_add_tracks(self, user, playlist_id, tracks,
+                                 position=None):
+        self._call()
+        self.__check_size(tracks)
+        content = self.playlists[playlist_id]["tracks"]
+        position = len(content) if position is None else position
+        content[position:position] = list(tracks)
+        return self.__snapshot(playlist_id)
+
+    def user_playlist_remove_specific_occurrences_of_tracks(
+            self, user, playlist_id, tracks, snapshot_id=None):
+        self._call()
+        self.__check_size(tracks)
+        content = self.playlists[playlist_id]["tracks"]
+        removed = {position for track in tracks
+                   for position in track["positions"]}
+        content[:] = [track for position, track in enumerate(content)
+                      if position not in removed]
+        return self.__snapshot(playlist_id)
+
+    def user_playlist_reorder_tracks(self, user, playlist_id, range_start,
+                                     insert_before, range_length=1,
+                                     snapshot_id=None):
+        self._call()
+        content = self.playlists[playlist_id]["tracks"]
+        moved = content[range_start:range_start + range_length]
+        del content[range_start:range_start + range_length]
+        if insert_before > range_start:
+            insert_before -= range_length
+        content[insert_before:insert_before] = moved
+        return self.__snapshot(playlist_id)
+
+
+class FakeCredentials:
+    """
+    SpotifyOAuth stand-in delivering tokens valid for `lifetime`
+    seconds. The times the token was issued and expires at are written
+    in it, so that any process can check it with token_rejected
+    """
+
+    def __init__(self, lifetime=3600):
+        self.lifetime = lifetime
+        self.refreshes = 0
+
+    def __token(self):
+        issued = time.time()
+        expires_at = issued + self.lifetime
+        return {
+            "access_token": f"fake:{os.getpid()}:{self.refreshes}:"
+                            f"{issued}:{expires_at}",
+            "refresh_token": "fake",
+            "expires_at": expires_at,
+        }
+
+    def get_cached_token(self):
+        return self.__token()
+
+    def refresh_access_token(self, refresh_token):
+        self.refreshes += 1
+        return self.__token()
+
+
+def token_rejected(access_token, revoked_before=0.):
+    """Whether Spotify would answer 401 to a FakeCredentials token:
+    expired, or issued before revoked_before"""
+    _, _, _, issued, expires_at = access_token.split(":")
+    return float(expires_at) <= time.time() or \
+        float(issued) < revoked_before <= time.time()
+
+
+class FakeRequest:
+    """Google API request, the answer is computed on execute()"""
+
+    def __init__(self, service, answer):
+        self.service = service
+        self.answer = answer
+
+    def execute(self):
+        self.service.requests += 1
+        time.sleep(self.service.latency)
+        answer = self.answer()
+        # what the API would send, before compression
+        self.service.bytes_sent += len(json.dumps(answer))
+        return answer
+
+
+class FakeSheets:
+    """
+    Minimal Google Sheets service (googleapiclient discovery object)
+    backed by in-memory sheets: {sheet name: list of rows}, the sheet
+    ids being their positions. The values written by a batchUpdate are
+    applied to the sheets. Also acts as the Drive service, the version
+    of the spreadsheet being bumped on every write. `bytes_sent` sums
+    the size of the JSON answers
+    """
+
+    def __init__(self, sheets, latency=0.05):
+        self.sheets = sheets
+        self.latency = latency
+        self.requests = 0
+        self.bytes_sent = 0
+        self.version = 1
+        self.updates = []
+
+    def spreadsheets(self):
+        return self
+
+    def values(self):
+        return self
+
+    def files(self):
+        return self
+
+    @staticmethod
+    def __cell(cell):
+        """(column, row) of an A1 cell, both 0 based, None if missing"""
+        letters = cell.rstrip("0123456789")
+        digits = cell[len(letters):]
+        column = None
+        for letter in letters:
+            column = (column + 1 if column is not None else 0) * 26 \
+                + ord(letter) - ord("A")
+        return column, int(digits) - 1 if digits else None
+
+    def __range(self, range_):
+        """Values of an A1 range (whole sheets, rows, columns or
+        blocks), the empty cells ending a row are not sent"""
+        name, _, cells = range_.partition("!")
+        rows = self.sheets[name]
+        first_column, last_column = 0, None
+        if cells:
+            first, _, last = cells.partition(":")
+            first_column, first_row = self.__cell(first)
+            last_column, last_row = self.__cell(last or first)
+            first_column = first_column or 0
+            rows = rows[first_row or 0:
+                        last_row + 1 if last_row is not None else None]
+        values = []
+        for row in rows:
+            row = list(row[first_column:last_column + 1
+                           if last_column is not None else None])
+            while row and row[-1] == "":
+                row.pop()
+            values.append(row)
+        return {"range": range_, "majorDimension": "ROWS", "values": values}
+
+    def get(self, spreadsheetId=None, range=None, fileId=None, fields=None):
+        if fileId is not None:
+            return FakeRequest(self, lambda: {"version": str(self.version)})
+        return FakeRequest(self, lambda: self.__range(range))
+
+    def batchGet(self, spreadsheetId=None, ranges=()):
+        return FakeRequest(self, lambda: {
+            "valueRanges": [self.__range(range_) for range_ in ranges]
+        })
+
+    def __write(self, body):
+        self.updates.append(body)
+        for request in body.get("requests", []):
+            cells = request.get("updateCells")
+            if cells is not None and cells["fields"] == "userEnteredValue":
+                self.__update_cells(cells)
+        self.version += 1
+        return {}
+
+    def __update_cells(self, cells):
+        """Writes the string values of an updateCells request"""
+        grid = cells["range"]
+        sheet = self.sheets[list(self.sheets)[grid["sheetId"]]]
+        for offset, row in enumerate(cells["rows"]):
+            target = sheet[grid["startRowIndex"] + offset]
+            for column, value in enumerate(row["values"],
+                                           grid["startColumnIndex"]):
+                target.extend([""] * (column + 1 - len(target)))
+                target[column] = value["userEnteredValue"]["stringValue"]
+
+    def update(self, spreadsheetId=None, range=None, valueInputOption=None,
+               body=None):
+        return FakeRequest(self, lambda: self.__write(body))
+
+    def batchUpdate(self, spreadsheetId=None, body=None):
+        return FakeRequest(self, lambda: self.__write(body))
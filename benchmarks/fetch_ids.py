@@ -0,0 +1,67 @@
+"""
+Times the Spotify id resolution of Muzik against a fake endpoint with latency, the calls going through the scheduler of
+the user client like in the app, at --rate calls per second
+usage: python -m benchmarks.fetch_ids [--songs 200] [--latency 0.02] [--workers 1 8 32] [--rate 25]
+"""
+import argparse
+import contextlib
+import io
+import time
+
+from prototyping.data import load_from_cache, DATA_PATH
+from prototyping.shuffle import INDEX_COLUMNS
+from src.muzik import Muzik, SPOTIFY_RATE
+from src.scheduler import ScheduledClient
+from src.search_cache import SearchCache
+from benchmarks.fakes import FakeSpotify
+
+
+def offline_muzik(endpoint, workers, rate, search_cache=None):
+    """Muzik instance using endpoint through its scheduler, without any credentials or id cache"""
+    muzik = Muzik(workers=workers, rate=rate, burst=workers)
+    muzik._Muzik__sp_user = ScheduledClient(endpoint, muzik.schedulers["user"])
+    muzik.search_cache = search_cache or SearchCache(":memory:")
+    return muzik
+
+
+def timed_fetch(muzik, songs):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        ids = muzik._Muzik__fetch_id(songs)
+    return ids, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--songs", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--rate", type=float, default=SPOTIFY_RATE)
+    args = parser.parse_args()
+
+    songs = load_from_cache(DATA_PATH)[INDEX_COLUMNS].head(args.songs)
+    # one song out of ten is missing, so that every fallback gets searched
+    missing = tuple(songs["song"].iloc[::10])
+    reference = None
+    print(f"{'workers':>8} {'time (s)':>9} {'calls':>6} {'waited (s)':>11} {'speedup':>8}")
+    for workers in args.workers:
+        endpoint = FakeSpotify(latency=args.latency, missing=missing)
+        muzik = offline_muzik(endpoint, workers, args.rate)
+        ids, elapsed = timed_fetch(muzik, songs)
+        if reference is None:
+            reference = (elapsed, ids)
+        assert ids.equals(reference[1]), "results depend on the number of workers"
+        # time spent waiting for a token, summed over the threads
+        waited = muzik.schedulers["user"].stats()["waited"]
+        print(f"{workers:>8} {elapsed:>9.3f} {endpoint.calls:>6} {waited:>11.2f} {reference[0] / elapsed:>7.1f}x")
+
+    # same songs with another genre, everything comes from the search cache
+    endpoint = FakeSpotify(latency=args.latency, missing=missing)
+    muzik = offline_muzik(endpoint, args.workers[-1], args.rate, muzik.search_cache)
+    ids, elapsed = timed_fetch(muzik, songs.assign(genre="Regenred"))
+    assert ids.reset_index(drop=True).equals(reference[1].reset_index(drop=True))
+    print(f"re-genred sheet: {elapsed:.3f}s, {endpoint.calls} calls")
+
+
+if __name__ == "__main__":
+    main()
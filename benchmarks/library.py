@@ -0,0 +1,89 @@
+"""
+Memory of the sheet model: per-object tracks and rating dicts (legacy track/contributor/condorcet) against the Library
+usage: python -m benchmarks.library [--rows 100000] [--seed 0]
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+
+import numpy as np
+
+from prototyping.data import load_from_cache, DATA_PATH
+from prototyping.library import Library, NON_GRADE_COLUMNS
+from prototyping.scoring import parse_grades
+from prototyping.shuffle import INDEX_COLUMNS
+from prototyping.utils import as_real_or_none
+
+
+class LegacyTrack:
+    """prototyping.track.track before the Library"""
+
+    def __init__(self, genre, subgenre, artist, album, title):
+        self.genre = genre if genre else None
+        self.subgenre = subgenre if subgenre else None
+        self.artist = artist if artist else None
+        self.album = album if album else None
+        self.title = title if title else None
+
+
+def legacy_model(sheet):
+    """Tracks and ratings dicts as condorcet.initialize built them"""
+    people = [column for column in sheet.columns if column not in INDEX_COLUMNS + NON_GRADE_COLUMNS]
+    tracks, ratings = [], {}
+    for row in sheet.itertuples(index=False):
+        content = row._asdict()
+        current_track = LegacyTrack(*(content[column] for column in INDEX_COLUMNS))
+        tracks.append(current_track)
+        ratings[current_track] = {person: as_real_or_none(str(content[person])) for person in people}
+    return tracks, ratings
+
+
+def synthetic_sheet(rows, seed):
+    """Sheet of rows songs drawn from the local csv, as strings"""
+    sheet = load_from_cache(DATA_PATH).astype(str).replace("nan", "")
+    sheet = sheet.sample(n=rows, replace=True, random_state=seed).reset_index(drop=True)
+    # make every song unique
+    sheet["song"] = sheet["song"] + [f" #{i}" for i in range(rows)]
+    return sheet
+
+
+def measured(function, *args):
+    """Returns the result, the build time and the memory still allocated by the result"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, current
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    sheet = synthetic_sheet(args.rows, args.seed)
+    # both models keep references to the strings of the sheet, which are not counted
+    legacy, legacy_time, legacy_memory = measured(legacy_model, sheet)
+    del legacy
+    library, library_time, library_memory = measured(Library.from_frame, sheet)
+
+    assert library.track(0).title == sheet["song"][0]
+    print(f"{args.rows} tracks, {len(library.people)} contributors, {len(library.strings)} distinct strings")
+    print(f"legacy objects: {legacy_memory / 2 ** 20:.1f} MiB, built in {legacy_time:.2f}s")
+    print(f"library:        {library_memory / 2 ** 20:.1f} MiB, built in {library_time:.2f}s "
+          f"({library.nbytes() / 2 ** 20:.1f} MiB of arrays and strings)")
+
+    # the float32 ratings give back the exact float64 grades
+    people = library.people
+    expected = np.column_stack([parse_grades(sheet[person]).to_numpy() for person in people])
+    assert np.array_equal(library.grades(), expected, equal_nan=True)
+
+
+if __name__ == "__main__":
+    main()
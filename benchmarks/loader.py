@@ -0,0 +1,87 @@
+"""
+Compares the streaming loader with the previous read_csv + replace + to_numeric loop on a synthetic csv with decimal
+commas
+usage: python -m benchmarks.loader [--rows 1000000] [--chunksize 100000] [--seed 0]
+"""
+import argparse
+import os
+import shutil
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.sheet_fetch import BENCHMARK_CACHE_DIR
+from prototyping.data import DATA_PATH
+from prototyping.loader import read_sheet, TEXT_COLUMNS, CATEGORICAL_COLUMNS
+
+BENCHMARK_CSV = BENCHMARK_CACHE_DIR + "achmusik_synthetic.csv"
+
+
+def write_synthetic_csv(path, rows, seed):
+    """Rows drawn from the local csv, the grades written with decimal commas as the French sheet exports them"""
+    sheet = pd.read_csv(DATA_PATH, dtype=str)
+    sheet = sheet.sample(n=rows, replace=True, random_state=seed)
+    for column in sheet.columns:
+        if column not in TEXT_COLUMNS + CATEGORICAL_COLUMNS:
+            sheet[column] = sheet[column].str.replace(".", ",", regex=False)
+    sheet.to_csv(path, index=False)
+
+
+def legacy_load(path):
+    """Strings first, then every column converted with the replace + to_numeric loop"""
+    sheet = pd.read_csv(path)
+    for column in sheet.columns:
+        if column not in TEXT_COLUMNS + CATEGORICAL_COLUMNS:
+            sheet[column] = pd.to_numeric(sheet[column].astype(str).str.replace(",", "."), errors='coerce')
+    return sheet
+
+
+def measured(function, *args):
+    """
+    Returns the result, the wall time and the peak traced memory of a call
+    The call is run twice: tracemalloc slows down the string operations far more than the parsing
+    """
+    start = time.perf_counter()
+    function(*args)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    result = function(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--chunksize", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    os.makedirs(BENCHMARK_CACHE_DIR, exist_ok=True)
+    try:
+        write_synthetic_csv(BENCHMARK_CSV, args.rows, args.seed)
+        legacy, legacy_time, legacy_peak = measured(legacy_load, BENCHMARK_CSV)
+        legacy_memory = legacy.memory_usage(deep=True).sum()
+        streamed, streamed_time, streamed_peak = measured(read_sheet, BENCHMARK_CSV, args.chunksize)
+        streamed_memory = streamed.memory_usage(deep=True).sum()
+    finally:
+        shutil.rmtree(BENCHMARK_CACHE_DIR, ignore_errors=True)
+
+    for column in legacy.columns:
+        if column in TEXT_COLUMNS + CATEGORICAL_COLUMNS:
+            assert legacy[column].fillna("").tolist() == streamed[column].astype(object).fillna("").tolist()
+        else:
+            # float32 grades give back the float64 ones once rounded
+            assert np.array_equal(legacy[column].to_numpy(), streamed[column].to_numpy(np.float64).round(4),
+                                  equal_nan=True)
+    print(f"{args.rows} rows")
+    print(f"{'':>10} {'load (s)':>9} {'peak (MB)':>10} {'frame (MB)':>11}")
+    print(f"{'legacy':>10} {legacy_time:9.2f} {legacy_peak / 2 ** 20:10.1f} {legacy_memory / 2 ** 20:11.1f}")
+    print(f"{'streaming':>10} {streamed_time:9.2f} {streamed_peak / 2 ** 20:10.1f} {streamed_memory / 2 ** 20:11.1f}")
+
+
+if __name__ == "__main__":
+    main()
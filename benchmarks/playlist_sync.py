@@ -0,0 +1,81 @@
+"""
+Counts the calls needed to update a playlist with plan_sync versus a full replace, the sync columns being the calls
+Muzik.create_playlist(sync=True) sends once it has chosen between both, the snapshot read included
+usage: python -m benchmarks.playlist_sync [--tracks 2000] [--changes 20] [--seed 0]
+"""
+import argparse
+import random
+import time
+
+from src.sync import plan_sync, replace_calls, MAX_TRACK_PER_REQUESTS
+
+
+def edited(tracks, changes, rng):
+    """Copy of tracks with `changes` random removes, inserts and moves"""
+    tracks = list(tracks)
+    for change in range(changes):
+        action = change % 3
+        if action == 0:
+            del tracks[rng.randrange(len(tracks))]
+        elif action == 1:
+            tracks.insert(rng.randrange(len(tracks)), f"new{change}")
+        else:
+            tracks.insert(rng.randrange(len(tracks)), tracks.pop(rng.randrange(len(tracks))))
+    return tracks
+
+
+def apply_operations(current, operations):
+    """Applies the operations of plan_sync on a list of track ids, returns the resulting list"""
+    playlist = list(current)
+    for operation in operations:
+        if operation[0] == "remove":
+            for _, position in operation[1]:
+                del playlist[position]
+        elif operation[0] == "reorder":
+            _, start, length, insert_before = operation
+            block = playlist[start:start + length]
+            del playlist[start:start + length]
+            if insert_before > start:
+                insert_before -= length
+            playlist[insert_before:insert_before] = block
+        else:
+            _, position, tracks = operation
+            playlist[position:position] = tracks
+    return playlist
+
+
+def sync_calls(operations, replace, edited):
+    """Calls of Muzik.__sync_playlist: the snapshot, then the operations, or a replace when they would not be fewer or
+    when the playlist was edited since it was pushed"""
+    if edited or len(operations) >= replace:
+        return 1 + replace
+    return 1 + len(operations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tracks", type=int, default=2000)
+    parser.add_argument("--changes", type=int, nargs="+", default=[0, 20, 200])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    current = [f"track{idx}" for idx in range(args.tracks)]
+    # reading the tracks of a playlist edited by hand, one page per 100 of them, is never worth it
+    pages = args.tracks // MAX_TRACK_PER_REQUESTS + 1
+    print(f"{'changes':>8} {'replace':>8} {'operations':>11} {'read + operations':>18} {'sync edited':>12} "
+          f"{'sync':>5} {'plan (s)':>9}")
+    for changes in args.changes:
+        target = edited(current, changes, rng)
+        start = time.perf_counter()
+        operations = plan_sync(current, target)
+        elapsed = time.perf_counter() - start
+        assert apply_operations(current, operations) == target
+        replace = replace_calls(target)
+        print(f"{changes:>8} {replace:>8} {len(operations):>11} {1 + pages + len(operations):>18} "
+              f"{sync_calls(operations, replace, True):>12} {sync_calls(operations, replace, False):>5} "
+              f"{elapsed:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
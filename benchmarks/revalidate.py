@@ -0,0 +1,80 @@
+"""
+Revalidates the ids cache of the local csv against a fake tracks endpoint where some tracks became unavailable, were
+deleted or relinked, --budget calls per run until every id was checked, then compares the calls with the full refetch
+deleting the cache used to take
+usage: python -m benchmarks.revalidate [--budget 20] [--unavailable 0.02] [--relinked 0.01] [--latency 0.005]
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+
+import numpy as np
+
+from src import util
+from src import muzik as muzik_module
+from src.scheduler import Scheduler
+from prototyping.data import load_from_cache, DATA_PATH
+from prototyping.shuffle import INDEX_COLUMNS
+from benchmarks.fakes import FakeSpotify
+from benchmarks.sheet_fetch import BENCHMARK_CACHE_DIR
+from benchmarks.suite import seeded_ids, offline_muzik
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=int, default=20, help="tracks calls per run")
+    parser.add_argument("--unavailable", type=float, default=.02, help="share of the ids not playable anymore")
+    parser.add_argument("--deleted", type=float, default=.005, help="share of the ids deleted")
+    parser.add_argument("--relinked", type=float, default=.01, help="share of the ids relinked")
+    parser.add_argument("--latency", type=float, default=.005)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    sheet = load_from_cache(DATA_PATH).set_index(INDEX_COLUMNS)
+    ids = seeded_ids(sheet.index, 0, rng)
+    known = ids.dropna().unique()
+    shuffled = rng.permutation(known)
+    sizes = np.cumsum([int(len(known) * share) for share in (args.unavailable, args.deleted, args.relinked)])
+    unavailable, deleted, relinked = np.split(shuffled, sizes)[:3]
+    relinked = {id: f"relinked{id[8:]}" for id in relinked}
+    endpoint = FakeSpotify(latency=args.latency, unavailable=unavailable, deleted=deleted, relinked=relinked)
+    scheduler = Scheduler("fake", rate=1e6, burst=1e6)
+
+    cache_dir = util.CACHE_DIR
+    util.CACHE_DIR = muzik_module.CACHE_DIR = BENCHMARK_CACHE_DIR
+    shutil.rmtree(BENCHMARK_CACHE_DIR, ignore_errors=True)
+    os.makedirs(BENCHMARK_CACHE_DIR)
+    try:
+        muzik = offline_muzik(endpoint, scheduler, ids, args.workers)
+        runs = []
+        while not runs or sum(run["checked"] for run in runs) < len(known):
+            with contextlib.redirect_stdout(io.StringIO()):
+                runs.append(muzik.revalidate(args.budget))
+        revalidated = muzik.ids
+    finally:
+        shutil.rmtree(BENCHMARK_CACHE_DIR, ignore_errors=True)
+        util.CACHE_DIR = muzik_module.CACHE_DIR = cache_dir
+
+    stale = set(unavailable) | set(deleted) | set(relinked)
+    assert not revalidated.isin(stale).any(), "an invalid id is still cached"
+    assert revalidated.isin(list(relinked.values())).sum() == ids.isin(list(relinked)).sum()
+    total = {key: sum(run[key] for run in runs) for key in runs[0]}
+    print(f"{len(known)} ids: {len(unavailable)} unavailable, {len(deleted)} deleted, {len(relinked)} relinked")
+    print(f"{len(runs)} runs of at most {args.budget} tracks calls: {total['calls']} tracks calls, "
+          f"{total['relinked']} relinked, {total['searched']} songs searched again, "
+          f"{endpoint.calls} calls in total")
+
+    # previous fix: delete the cache, every song is searched again
+    endpoint = FakeSpotify(latency=args.latency)
+    muzik = offline_muzik(endpoint, scheduler, ids.iloc[:0], args.workers)
+    with contextlib.redirect_stdout(io.StringIO()):
+        muzik._Muzik__fetch_id(sheet.index.to_frame().reset_index(drop=True))
+    print(f"full refetch: {endpoint.calls} calls")
+
+
+if __name__ == "__main__":
+    main()
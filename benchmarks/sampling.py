@@ -0,0 +1,50 @@
+"""
+Compares WeightedSampler with DataFrame.sample(weights=...) on pools of ranked tracks
+usage: python -m benchmarks.sampling [--pools 3700 100000] [--draws 150 2000] [--seed 0]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from prototyping.sampling import WeightedSampler
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def first_draw_error(weights, trials, seed):
+    """Largest gap between the frequency of the first draw and the normalized weights"""
+    rng = np.random.default_rng(seed)
+    counts = np.zeros(len(weights))
+    for _ in range(trials):
+        counts[WeightedSampler(weights, seed=rng).draw()] += 1
+    return np.abs(counts / trials - weights / weights.sum()).max()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pools", type=int, nargs="+", default=[3700, 100000])
+    parser.add_argument("--draws", type=int, nargs="+", default=[150, 2000])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"first draw frequency error on 10 weights: {first_draw_error(np.arange(1., 11.), 20000, args.seed):.4f}")
+    print(f"{'pool':>8} {'draws':>6} {'pandas (s)':>11} {'sampler (s)':>12} {'build (s)':>10}")
+    for pool_size in args.pools:
+        pool = pd.DataFrame({"rank": np.arange(pool_size, 0, -1, dtype=np.float64)})
+        for draws in args.draws:
+            _, pandas_time = timed(pool.sample, n=draws, weights="rank", random_state=args.seed)
+            sampler, build_time = timed(WeightedSampler, pool["rank"].values, seed=args.seed)
+            positions, sample_time = timed(sampler.sample, draws)
+            assert len(set(positions)) == draws
+            print(f"{pool_size:>8} {draws:>6} {pandas_time:>11.4f} {sample_time + build_time:>12.4f} "
+                  f"{build_time:>10.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Compares the scoring of create_playlist() on a shared GradeMatrix with the original pandas implementation
+usage: python -m benchmarks.scoring [--subsets 1000] [--legacy 20] [--seed 0]
+"""
+import argparse
+import contextlib
+import io
+import time
+
+import numpy as np
+import pandas as pd
+
+from prototyping.data import DATA_PATH
+from prototyping.playlist import score_pool
+from prototyping.scoring import GradeMatrix
+from prototyping.shuffle import INDEX_COLUMNS
+
+PLAYLIST_PARAMETERS = dict(count_factor=.8, inhib_factor=2, min_score=7.75, default_grade=5, eliminating_grade=4.6)
+
+
+def score_pool_legacy(data, people, count_factor, inhib_factor, min_score, default_grade, eliminating_grade):
+    """Original create_playlist() implementation, for reference, stopping before the sampling"""
+    count_inhib = len(people) // inhib_factor
+    for i in range(data.columns.size):
+        data[data.columns[i]] = data[data.columns[i]].str.replace(",", ".")
+        data[data.columns[i]] = pd.to_numeric(data[data.columns[i]], errors='coerce')
+    data = data.filter(people)
+    data = data.dropna(how="all").append(data[data.isnull().all(axis=1)].fillna(default_grade))
+    data["mean"] = data[data.columns].mean(axis=1)
+    data["count"] = data.count(axis=1) - 1
+    data["score"] = data["mean"] + (count_factor * (data["count"] - count_inhib))
+    data = data[data["score"] > min_score]
+    data = data.sort_values("score", ascending=False)
+    data["rank"] = data["score"].rank(method="min")
+    return data[data[data.columns[:-4]].min(axis=1) > eliminating_grade]
+
+
+def load_sheet():
+    """Local csv as Ach.get_sheets returns it: strings with decimal commas"""
+    sheet = pd.read_csv(DATA_PATH, dtype=str).set_index(INDEX_COLUMNS)
+    return sheet.drop(columns=["api:Spotify"]).apply(lambda column: column.str.replace(".", ",", regex=False))
+
+
+def guest_lists(people, subsets, rng):
+    return [list(rng.choice(people, size=rng.integers(1, len(people) + 1), replace=False))
+            for _ in range(subsets)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--subsets", type=int, default=1000)
+    parser.add_argument("--legacy", type=int, default=20, help="number of subsets run with the legacy code")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    sheet = load_sheet()
+    people = [column for column in sheet.columns if column != "alb?"]
+    rng = np.random.default_rng(args.seed)
+    subsets = guest_lists(people, args.subsets, rng)
+    parameters = PLAYLIST_PARAMETERS
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        grades = GradeMatrix(sheet)
+        build_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for guests in subsets:
+            score_pool(grades, guests, **parameters)
+        matrix_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for guests in subsets[:args.legacy]:
+            legacy = score_pool_legacy(sheet.copy(), guests, **parameters)
+            assert legacy.equals(score_pool(grades, guests, **parameters)), guests
+        legacy_time = (time.perf_counter() - start) / args.legacy * args.subsets
+
+    print(f"grade matrix built in {build_time:.3f}s")
+    print(f"{args.subsets} guest lists: {matrix_time:.2f}s with the grade matrix, "
+          f"~{legacy_time:.2f}s with the legacy code (extrapolated from {args.legacy})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Runs Ach.get_sheets twice against a fake Google Sheets service, the second run should only check the version
+usage: python -m benchmarks.sheet_fetch [--latency 0.05]
+"""
+import argparse
+import contextlib
+import csv
+import io
+import os
+import shutil
+import time
+
+from src import util
+from src.ach import Ach, ACH_SHEET_NAME, TRANSITIONS_SHEET_NAME
+from prototyping.data import DATA_PATH, TRANSITIONS_PATH
+from benchmarks.fakes import FakeSheets
+
+BENCHMARK_CACHE_DIR = "cache/benchmark/"
+
+
+def read_rows(path):
+    with open(path, newline="") as handle:
+        return list(csv.reader(handle))
+
+
+def fake_service(latency):
+    return FakeSheets({ACH_SHEET_NAME: read_rows(DATA_PATH), TRANSITIONS_SHEET_NAME: read_rows(TRANSITIONS_PATH)},
+                      latency=latency)
+
+
+def timed_get_sheets(service):
+    ach = Ach(service=service, drive=service)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        sheet = ach.get_sheets()
+    return ach, sheet, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    service = fake_service(args.latency)
+    util.CACHE_DIR = BENCHMARK_CACHE_DIR
+    os.makedirs(BENCHMARK_CACHE_DIR, exist_ok=True)
+    try:
+        for run in ("cold", "unchanged", "modified"):
+            if run == "modified":
+                service.version += 1
+            sent = service.bytes_sent
+            ach, sheet, elapsed = timed_get_sheets(service)
+            print(f"{run:>9} : {elapsed:.3f}s, {ach.requests} requests, "
+                  f"{service.bytes_sent - sent} bytes, {len(sheet)} songs")
+    finally:
+        shutil.rmtree(BENCHMARK_CACHE_DIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
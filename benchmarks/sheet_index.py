@@ -0,0 +1,56 @@
+"""
+Lookups with the precomputed SheetIndex against scans of the sheet MultiIndex, on a synthetic sheet
+usage: python -m benchmarks.sheet_index [--rows 100000] [--queries 1000] [--seed 0]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.cache import synthetic_sheet
+from src.sheet_index import SheetIndex
+
+
+def scan(sheet, artist, person):
+    """Tracks of an artist graded by someone, scanning the whole index"""
+    rows = sheet[sheet.index.get_level_values("artist") == artist]
+    return rows[rows[person] != ""]
+
+
+def timed(function, *args, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function(*args)
+    return result, (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.seed)
+
+    sheet = synthetic_sheet(args.rows, args.seed)
+    index, build_time = timed(SheetIndex, sheet.index)
+    print(f"{args.rows} rows: index built in {build_time:.2f}s, {len(index.values('artist'))} artists")
+
+    artists = rng.choice(index.values("artist"), size=args.queries)
+    start = time.perf_counter()
+    for artist in artists:
+        found = index.tracks(sheet, graded_by="Qu", artist=artist)
+    indexed = (time.perf_counter() - start) / args.queries
+    scanned = 0.
+    for artist in artists[:20]:
+        _, duration = timed(scan, sheet, artist, "Qu")
+        scanned += duration / 20
+    assert found.equals(scan(sheet, artists[-1], "Qu"))
+    _, positions_time = timed(lambda: index.positions(artist=artists[0]), repeat=args.queries)
+    print(f"artist X graded by Qu: {indexed * 1e3:.3f}ms with the index "
+          f"(positions only {positions_time * 1e6:.1f}us), {scanned * 1e3:.2f}ms scanning")
+
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Compares the array based shuffle_playlist() with the original row by row implementation
+usage: python -m benchmarks.shuffle [--sizes 150 1000 10000] [--legacy-max 10000] [--seed 0]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from prototyping.data import load_from_cache, DATA_PATH, TRANSITIONS_PATH
+from prototyping.loader import read_transitions
+from prototyping.playlist import shuffle_playlist, shuffle_playlist_legacy
+from prototyping.shuffle import INDEX_COLUMNS
+
+SHUFFLE_PARAMETERS = dict(default_transition="4,0", chain_factor=.7, desperation_factor=1, default_threshold=8.5)
+
+
+def load_benchmark_transitions():
+    """Transitions from the local csv, without trying the Google API"""
+    transitions = read_transitions(TRANSITIONS_PATH)
+    return transitions.fillna(float(SHUFFLE_PARAMETERS["default_transition"].replace(",", ".")))
+
+
+def synthetic_playlist(size, seed, transitions):
+    """Draw size tracks (with replacement) from the local achmusik csv, keeping only genres with transitions"""
+    sheet = load_from_cache(DATA_PATH)
+    sheet = sheet[sheet["genre"].isin(transitions.index)]
+    return sheet.sample(n=size, replace=True, random_state=seed).set_index(INDEX_COLUMNS)
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[150, 1000, 10000])
+    parser.add_argument("--legacy-max", type=int, default=10000,
+                        help="skip the legacy implementation above this playlist size")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    transitions = load_benchmark_transitions()
+    print(f"{'tracks':>8} {'array (s)':>10} {'legacy (s)':>11} {'speedup':>8} same")
+    for size in args.sizes:
+        playlist = synthetic_playlist(size, args.seed, transitions)
+        fast, fast_time = timed(shuffle_playlist, playlist, transitions=transitions, **SHUFFLE_PARAMETERS)
+        if size > args.legacy_max:
+            print(f"{size:>8} {fast_time:>10.3f} {'-':>11} {'-':>8} -")
+            continue
+        legacy, legacy_time = timed(shuffle_playlist_legacy, playlist, transitions=transitions,
+                                    **SHUFFLE_PARAMETERS)
+        same = np.array_equal(fast.index.to_numpy(), legacy.index.to_numpy())
+        print(f"{size:>8} {fast_time:>10.3f} {legacy_time:>11.3f} {legacy_time / fast_time:>7.1f}x {same}")
+
+
+if __name__ == "__main__":
+    main()
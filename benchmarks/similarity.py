@@ -0,0 +1,60 @@
+"""
+Contributor correlations and grade predictions on the local sheet: agreement with pandas, accuracy on held out grades
+against the default grade, and timings
+usage: python -m benchmarks.similarity [--holdout 0.1] [--rows 100000] [--seed 0]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.scoring import load_sheet
+from prototyping.scoring import GradeMatrix, NON_GRADE_COLUMNS
+from prototyping.similarity import spearman, predict, MIN_OVERLAP
+
+DEFAULT_GRADE = 5
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--holdout", type=float, default=.1, help="share of the grades hidden from the predictions")
+    parser.add_argument("--rows", type=int, default=100000, help="rows of the synthetic matrix for the timings")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.seed)
+
+    grades = GradeMatrix(load_sheet().drop(columns=NON_GRADE_COLUMNS, errors="ignore"))
+    similarity, spearman_time = timed(spearman, grades.grades)
+    expected = pd.DataFrame(grades.grades).corr(method="spearman", min_periods=MIN_OVERLAP).to_numpy()
+    assert np.allclose(similarity, expected, equal_nan=True)
+    print(f"{len(grades)} tracks: correlations in {spearman_time * 1e3:.1f}ms (pandas agrees)")
+
+    # hide some grades and predict them from the others
+    hidden = grades.graded & (rng.random(grades.grades.shape) < args.holdout)
+    training = np.where(hidden, np.nan, grades.grades)
+    predictions, predict_time = timed(predict, training, spearman(training))
+    truth = grades.grades[hidden]
+    predicted = predictions[hidden]
+    covered = ~np.isnan(predicted)
+    error = np.sqrt(np.mean((predicted[covered] - truth[covered]) ** 2))
+    baseline = np.sqrt(np.mean((DEFAULT_GRADE - truth) ** 2))
+    print(f"{hidden.sum()} hidden grades, {covered.mean():.0%} predicted in {predict_time * 1e3:.1f}ms: "
+          f"RMSE {error:.2f} against {baseline:.2f} with default_grade={DEFAULT_GRADE}")
+
+    # timings on a larger matrix drawn from the sheet
+    rows = rng.integers(len(grades), size=args.rows)
+    large = grades.grades[rows]
+    _, large_spearman = timed(spearman, large)
+    _, large_predict = timed(predict, large, similarity)
+    print(f"{args.rows} tracks: correlations in {large_spearman:.2f}s, predictions in {large_predict:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Cold start of main_playlist.py: import time of its modules measured with python -X importtime in fresh interpreters,
+the heaviest top level imports, the API client libraries loaded at import, and the time to build Muzik and Ach (nothing
+should be read nor sent before first use)
+usage: python -m benchmarks.startup [--modules src.muzik src.ach prototyping.playlist] [--runs 5] [--top 10]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+# loaded with the clients only, an offline run should not import them
+CLIENT_LIBRARIES = ["spotipy", "googleapiclient", "google.oauth2"]
+CONSTRUCTION = """
+import json, sys, time
+from src.muzik import Muzik
+from src.ach import Ach
+start = time.perf_counter()
+Muzik(offline=True)
+Ach(offline=True)
+print(json.dumps(time.perf_counter() - start))
+"""
+
+
+def parse_importtime(stderr):
+    """(name, self us, cumulative us, depth) of every line written by -X importtime"""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative, name = line[len("import time:"):].split("|")
+        # one space after the separator, then two per level of nesting
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        imports.append((name.strip(), int(self_us), int(cumulative), depth))
+    return imports
+
+
+def import_module(module):
+    """Imports of module in a fresh interpreter, with the client libraries it loaded"""
+    probe = (f"import json, sys, {module}; "
+             f"print(json.dumps([name for name in {CLIENT_LIBRARIES!r} if name in sys.modules]))")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", probe], capture_output=True, text=True,
+                            check=True)
+    return parse_importtime(result.stderr), json.loads(result.stdout)
+
+
+def construction_time():
+    result = subprocess.run([sys.executable, "-c", CONSTRUCTION], capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=["src.muzik", "src.ach", "prototyping.playlist"])
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per module, the median is shown")
+    parser.add_argument("--top", type=int, default=10, help="heaviest top level imports shown")
+    args = parser.parse_args()
+
+    for module in args.modules:
+        totals = []
+        for _ in range(args.runs):
+            imports, clients = import_module(module)
+            totals.append(next(cumulative for name, _, cumulative, _ in imports if name == module))
+        print(f"{module}: {statistics.median(totals) / 1000:.1f}ms, "
+              f"client libraries loaded: {', '.join(clients) or 'none'}")
+        top_level = sorted((line for line in imports if line[3] <= 1 and line[0] != module), key=lambda line: -line[2])
+        for name, _, cumulative, _ in top_level[:args.top]:
+            print(f"    {name:<40} {cumulative / 1000:8.1f}ms")
+
+    timings = [construction_time() for _ in range(args.runs)]
+    print(f"Muzik(offline=True) + Ach(offline=True): {statistics.median(timings) * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Streams the endless playlist of the local csv into a fake Spotify playlist: stream_playlist() draws the tracks one at a
+time and drain() appends them with Muzik.append_tracks by batches of 100, as main_playlist.py --endless does. Checks
+that no track comes back within the cooldown, and that the memory of the stream does not grow with the tracks played
+usage: python -m benchmarks.stream [--tracks 1000 10000] [--latency 0.005] [--seed 0]
+"""
+import argparse
+import contextlib
+import io
+import math
+import os
+import shutil
+import time
+import tracemalloc
+from itertools import islice
+
+import numpy as np
+
+from src import util
+from src import muzik as muzik_module
+from src.scheduler import Scheduler
+from prototyping.data import load_from_cache, DATA_PATH
+from prototyping.playlist import score_pool
+from prototyping.shuffle import INDEX_COLUMNS
+from prototyping.stream import stream_playlist, drain, SINK_BATCH
+from benchmarks.fakes import FakeSpotifyUser
+from benchmarks.sheet_fetch import BENCHMARK_CACHE_DIR
+from benchmarks.shuffle import load_benchmark_transitions, SHUFFLE_PARAMETERS
+from benchmarks.suite import seeded_ids, offline_muzik, PEOPLE, PLAYLIST_PARAMETERS
+
+STREAM_PARAMETERS = dict(chain_factor=SHUFFLE_PARAMETERS["chain_factor"],
+                         desperation_factor=SHUFFLE_PARAMETERS["desperation_factor"],
+                         default_threshold=SHUFFLE_PARAMETERS["default_threshold"], lookahead=16,
+                         track_cooldown=100)
+
+
+def closest_repeat(entries):
+    """Smallest number of tracks between two plays of the same track, None if no track came back"""
+    last, closest = {}, None
+    for position, entry in enumerate(entries):
+        if entry in last and (closest is None or position - last[entry] < closest):
+            closest = position - last[entry]
+        last[entry] = position
+    return closest
+
+
+def stream_peak(pool, transitions, tracks, seed):
+    """Peak memory (bytes) allocated while streaming tracks tracks, the pool being already built"""
+    tracemalloc.start()
+    for _ in islice(stream_playlist(pool, transitions, seed=seed, **STREAM_PARAMETERS), tracks):
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tracks", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--latency", type=float, default=.005)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    sheet = load_from_cache(DATA_PATH).set_index(INDEX_COLUMNS)
+    transitions = load_benchmark_transitions()
+    parameters = {key: value for key, value in PLAYLIST_PARAMETERS.items() if key != "size"}
+    with contextlib.redirect_stdout(io.StringIO()):
+        pool = score_pool(sheet, PEOPLE, **parameters)
+    ids = seeded_ids(sheet.index, 0, np.random.default_rng(args.seed))
+    scheduler = Scheduler("fake", rate=1e6, burst=1e6)
+    print(f"pool of {len(pool)} tracks")
+
+    cache_dir = util.CACHE_DIR
+    util.CACHE_DIR = muzik_module.CACHE_DIR = BENCHMARK_CACHE_DIR
+    shutil.rmtree(BENCHMARK_CACHE_DIR, ignore_errors=True)
+    os.makedirs(BENCHMARK_CACHE_DIR)
+    print(f"{'tracks':>8} {'time (s)':>9} {'us/track':>9} {'sent':>6} {'calls':>6} {'closest repeat':>15} "
+          f"{'peak (KiB)':>11}")
+    try:
+        for tracks in args.tracks:
+            endpoint = FakeSpotifyUser(latency=args.latency)
+            muzik = offline_muzik(endpoint, scheduler, ids, 1)
+            stream = stream_playlist(pool, transitions, seed=args.seed, **STREAM_PARAMETERS)
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                sent = drain(stream, ids, muzik.append_tracks, tracks=tracks)
+            elapsed = time.perf_counter() - start
+
+            playlist = [playlist["tracks"] for playlist in endpoint.playlists.values()
+                        if playlist["name"] == muzik_module.PLAYLIST_NAME]
+            assert len(playlist) == 1 and len(playlist[0]) == sent, "tracks lost on the way"
+            # same seed, same tracks
+            entries = list(islice(stream_playlist(pool, transitions, seed=args.seed, **STREAM_PARAMETERS), tracks))
+            closest = closest_repeat(entries)
+            # smaller pools release the played tracks early
+            if len(pool) > STREAM_PARAMETERS["track_cooldown"] + STREAM_PARAMETERS["lookahead"]:
+                assert closest is None or closest > STREAM_PARAMETERS["track_cooldown"], "track back too early"
+            # playlists of the user, creation and cover, then the appends
+            assert endpoint.calls == 3 + math.ceil(sent / SINK_BATCH)
+            peak = stream_peak(pool, transitions, tracks, args.seed)
+            print(f"{tracks:>8} {elapsed:>9.3f} {elapsed / tracks * 1e6:>9.1f} {sent:>6} {endpoint.calls:>6} "
+                  f"{closest if closest is not None else '-':>15} {peak / 1024:>11.0f}")
+    finally:
+        shutil.rmtree(BENCHMARK_CACHE_DIR, ignore_errors=True)
+        util.CACHE_DIR = muzik_module.CACHE_DIR = cache_dir
+
+
+if __name__ == "__main__":
+    main()
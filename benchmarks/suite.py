@@ -0,0 +1,185 @@
+"""
+End to end offline benchmark of the pipeline of main_playlist.py on synthetic sheets made of copies of the local csv:
+Ach.get_sheets, Muzik.update, Ach.update_missing, create_playlist, shuffle_playlist and Muzik.create_playlist (full
+replace, then sync), against fake Spotify and Google Sheets services with latency, 429 answers and pagination.
+The timings of every scale are saved as json, pass a previous file to --compare to spot regressions.
+The 1000x scale (3.7M songs) needs about 8GB of memory.
+usage: python -m benchmarks.suite [--scales 10 100] [--compare benchmarks/results/previous.json]
+"""
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import shutil
+import subprocess
+import time
+
+import numpy as np
+import pandas as pd
+
+from src import util
+from src import muzik as muzik_module
+from src.ach import Ach, ACH_SHEET_NAME, TRANSITIONS_SHEET_NAME
+from src.muzik import Muzik
+from src.profiler import Profiler
+from src.scheduler import Scheduler, ScheduledClient
+from src.search_cache import SearchCache
+from prototyping.data import DATA_PATH, TRANSITIONS_PATH
+from prototyping.playlist import create_playlist, shuffle_playlist, load_transitions
+from benchmarks.fakes import FakeSheets, FakeSpotifyUser
+from benchmarks.sheet_fetch import BENCHMARK_CACHE_DIR, read_rows
+
+RESULTS_DIR = "benchmarks/results/"
+PEOPLE = ["Qu", "Vi", "Ro"]
+PLAYLIST_PARAMETERS = dict(count_factor=.8, inhib_factor=2, min_score=7.75, size=150, default_grade=5,
+                           eliminating_grade=4.6)
+SHUFFLE_PARAMETERS = dict(default_transition="4,0", chain_factor=.7, desperation_factor=1, default_threshold=8.5)
+
+
+def synthetic_rows(scale):
+    """Header and rows of the local csv copied scale times, the songs of every copy being renamed"""
+    with open(DATA_PATH, newline="") as handle:
+        header, *rows = list(csv.reader(handle))
+    song = header.index("song")
+    synthetic = [header]
+    for copy in range(scale):
+        for row in rows:
+            row = list(row)
+            if copy:
+                row[song] = f"{row[song]} #{copy}"
+            synthetic.append(row)
+    return synthetic
+
+
+def seeded_ids(index, new_fraction, rng):
+    """Ids cache of a previous run: every song but new_fraction of them, a few of them missing on Spotify"""
+    known = rng.random(len(index)) >= new_fraction
+    ids = pd.Series([f"{position:022d}" for position in range(len(index))], index=index, dtype=object)
+    ids[rng.random(len(index)) < .05] = None
+    return ids[known]
+
+
+def offline_muzik(endpoint, scheduler, ids, workers):
+    """Muzik connected to a fake endpoint, with an already filled ids cache"""
+    muzik = Muzik(workers=workers)
+    muzik.schedulers["user"] = scheduler
+    muzik._Muzik__sp_user = ScheduledClient(endpoint, scheduler)
+    muzik._Muzik__user_id = "fake-user"
+    muzik.ids = ids
+    muzik.search_cache = SearchCache(":memory:")
+    return muzik
+
+
+def run_scale(scale, args):
+    """Runs the whole pipeline on a sheet of scale copies, returns the report of its profiler"""
+    rng = np.random.default_rng(args.seed)
+    service = FakeSheets({ACH_SHEET_NAME: synthetic_rows(scale), TRANSITIONS_SHEET_NAME: read_rows(TRANSITIONS_PATH)},
+                         latency=args.latency)
+    endpoint = FakeSpotifyUser(playlists=args.playlists, latency=args.latency,
+                               throttle_every=args.throttle_every, retry_after=args.retry_after)
+    scheduler = Scheduler("fake user", rate=args.rate, burst=args.rate)
+
+    profiler = Profiler(trace_memory=args.trace_memory)
+    with profiler.run(), contextlib.redirect_stdout(io.StringIO()):
+        ach = Ach(service=service, drive=service)
+        profiler.add_counter("google", ach.stats)
+        profiler.add_counter("spotify", scheduler.stats)
+        sheet = ach.get_sheets()
+
+        muzik = offline_muzik(endpoint, scheduler, seeded_ids(sheet.index, args.new_fraction, rng), args.workers)
+        ids = muzik.update(sheet)
+        ach.update_missing(ids, muzik.name)
+
+        with profiler.stage("create_playlist"):
+            playlist = create_playlist(sheet.loc[ids.index], PEOPLE, seed=args.seed, **PLAYLIST_PARAMETERS)
+        with profiler.stage("shuffle_playlist"):
+            transitions = load_transitions(SHUFFLE_PARAMETERS["default_transition"], ach=ach)
+            playlist = shuffle_playlist(playlist, transitions=transitions, **SHUFFLE_PARAMETERS)
+        with profiler.stage("replace"):
+            muzik.create_playlist(playlist)
+
+        # next party: some tracks change, the playlist is synced
+        playlist = create_playlist(sheet.loc[ids.index], PEOPLE, seed=args.seed + 1, **PLAYLIST_PARAMETERS)
+        playlist = shuffle_playlist(playlist, transitions=transitions, **SHUFFLE_PARAMETERS)
+        with profiler.stage("sync"):
+            muzik.create_playlist(playlist, sync=True)
+
+    report = profiler.report()
+    report["songs"] = len(sheet)
+    report["throttled"] = endpoint.throttled
+    # the events (one per fetched song) are too many to be kept
+    del report["events"]
+    return report
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def stage_timings(report):
+    return {stage["name"]: stage["wall"] for stage in report["stages"]}
+
+
+def print_results(results, previous=None):
+    for scale, report in results.items():
+        print(f"x{scale}: {report['songs']} songs, {report['total']:.2f}s, "
+              f"{report['counters'].get('spotify.calls', 0)} Spotify calls, {report['throttled']} throttled")
+        before = stage_timings(previous["results"][scale]) if previous and scale in previous["results"] else {}
+        for name, wall in stage_timings(report).items():
+            line = f"    {name:<40} {wall:9.3f}s"
+            if name in before and before[name] > 0:
+                line += f" {wall / before[name]:6.2f}x"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--latency", type=float, default=.005, help="latency of every fake API call (s)")
+    parser.add_argument("--rate", type=float, default=100, help="calls per second allowed by the scheduler")
+    parser.add_argument("--throttle-every", type=int, default=100, help="one Spotify call out of n answers 429")
+    parser.add_argument("--retry-after", type=float, default=.1)
+    parser.add_argument("--playlists", type=int, default=120, help="other playlists of the user (pagination)")
+    parser.add_argument("--new-fraction", type=float, default=.001, help="share of songs not in the ids cache")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--trace-memory", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="json file of the results, in benchmarks/results by default")
+    parser.add_argument("--compare", default=None, help="results of a previous run")
+    args = parser.parse_args()
+
+    previous = None
+    if args.compare is not None:
+        with open(args.compare) as handle:
+            previous = json.load(handle)
+
+    # every cache file goes to a temporary folder
+    cache_dir = util.CACHE_DIR
+    util.CACHE_DIR = muzik_module.CACHE_DIR = BENCHMARK_CACHE_DIR
+    results = {}
+    try:
+        for scale in args.scales:
+            shutil.rmtree(BENCHMARK_CACHE_DIR, ignore_errors=True)
+            os.makedirs(BENCHMARK_CACHE_DIR)
+            results[str(scale)] = run_scale(scale, args)
+    finally:
+        shutil.rmtree(BENCHMARK_CACHE_DIR, ignore_errors=True)
+        util.CACHE_DIR = muzik_module.CACHE_DIR = cache_dir
+
+    print_results(results, previous)
+    output = args.output or RESULTS_DIR + time.strftime("suite-%Y%m%d-%H%M%S.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as handle:
+        json.dump({"date": time.strftime("%Y-%m-%d %H:%M:%S"), "commit": git_commit(),
+                   "parameters": vars(args), "results": results}, handle, indent=2, default=str)
+    print(f"Results saved in {output}")
+
+
+if __name__ == "__main__":
+    main()
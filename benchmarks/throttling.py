@@ -0,0 +1,38 @@
+"""
+Runs searches through the Scheduler against a fake Spotify answering 429s
+usage: python -m benchmarks.throttling [--calls 100] [--rate 50] [--throttle-every 20]
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.scheduler import Scheduler, ScheduledClient
+from benchmarks.fakes import FakeSpotify
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=50)
+    parser.add_argument("--throttle-every", type=int, default=20)
+    parser.add_argument("--retry-after", type=float, default=.5)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    endpoint = FakeSpotify(latency=.01, throttle_every=args.throttle_every,
+                           retry_after=args.retry_after)
+    scheduler = Scheduler("fake", rate=args.rate, burst=args.rate)
+    client = ScheduledClient(endpoint, scheduler)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        results = list(executor.map(lambda i: client.search(f"track:{i}"),
+                                    range(args.calls)))
+    elapsed = time.perf_counter() - start
+    assert len(results) == args.calls
+    print(f"{args.calls} searches in {elapsed:.2f}s, "
+          f"{endpoint.throttled} answered with a 429")
+    print(scheduler.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Runs calls from several processes of several threads through TokenManager against a fake Spotify whose tokens expire
+quickly, and that revokes every token issued before --revoke-after seconds. The token should be refreshed once per
+expiry for all the processes, a revoked token retried once, and no call spent on checking the token
+usage: python -m benchmarks.tokens [--processes 4] [--threads 8] [--duration 3] [--lifetime 1]
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from spotipy import SpotifyException
+
+from src.tokens import TokenManager, UNAUTHORIZED_ST_CODE
+from benchmarks.fakes import FakeCredentials, token_rejected
+
+
+class FakeUserEndpoint:
+    """Answers 401 to the expired or revoked tokens of the manager, like spotipy reading its auth_manager"""
+
+    def __init__(self, tokens, latency, revoked_before):
+        self.tokens = tokens
+        self.latency = latency
+        self.revoked_before = revoked_before
+        self.calls = 0
+        self.rejected = 0
+
+    def me(self):
+        access_token = self.tokens.get_access_token()
+        self.calls += 1
+        time.sleep(self.latency)
+        if token_rejected(access_token, self.revoked_before):
+            self.rejected += 1
+            raise SpotifyException(UNAUTHORIZED_ST_CODE, -1, "The access token expired")
+        return {"id": "fake-user"}
+
+
+def run_process(path, args, deadline, revoked_before):
+    """Calls of the threads of one process until deadline, returns its counters"""
+    credentials = FakeCredentials(lifetime=args.lifetime)
+    tokens = TokenManager(credentials, path=path, margin=args.margin)
+    endpoint = FakeUserEndpoint(tokens, args.latency, revoked_before)
+    failures = 0
+
+    def work(_):
+        nonlocal failures
+        while time.time() < deadline:
+            try:
+                tokens.call(endpoint.me)
+            except SpotifyException:
+                failures += 1
+
+    with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(max_workers=args.threads) as executor:
+        list(executor.map(work, range(args.threads)))
+    return {"calls": endpoint.calls, "rejected": endpoint.rejected, "failures": failures,
+            "refreshes": credentials.refreshes, "retries": tokens.retries}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=3, help="seconds every thread keeps calling")
+    parser.add_argument("--lifetime", type=float, default=1, help="seconds a token is valid")
+    parser.add_argument("--margin", type=float, default=.2, help="refresh margin of the token manager")
+    parser.add_argument("--latency", type=float, default=.01)
+    parser.add_argument("--revoke-after", type=float, default=1.5, help="tokens issued before are rejected")
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp()
+    path = os.path.join(folder, "token.json")
+    start = time.time()
+    deadline = start + args.duration
+    try:
+        with ProcessPoolExecutor(max_workers=args.processes) as executor:
+            futures = [executor.submit(run_process, path, args, deadline, start + args.revoke_after)
+                       for _ in range(args.processes)]
+            results = [future.result() for future in futures]
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+    total = {key: sum(result[key] for result in results) for key in results[0]}
+    # one per lifetime shortened by the margin, one for the revocation
+    expected = int(args.duration / (args.lifetime - args.margin)) + 1
+    print(f"{args.processes} processes x {args.threads} threads for {args.duration}s")
+    print(f"{total['calls']} calls, {total['rejected']} rejected, {total['retries']} retried, "
+          f"{total['failures']} failed")
+    print(f"{total['refreshes']} refreshes for all the processes (about {expected} expected, "
+          f"{expected * args.processes} if every process refreshed on its own)")
+
+
+if __name__ == "__main__":
+    main()
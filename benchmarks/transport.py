@@ -0,0 +1,145 @@
+"""
+Sends Spotify searches (spotipy) and Sheets requests (googleapiclient) to a local HTTP stub server, once with the
+clients of the previous versions (a spotipy client rebuilt on every token refresh, a Sheets service built for every
+fetch) and once through the shared Transport. The stub counts the connections it accepted and delays each of them by
+--handshake seconds, as a TLS handshake would
+usage: python -m benchmarks.transport [--searches 400] [--workers 8] [--handshake 0.05]
+"""
+import argparse
+import gzip
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httplib2
+import spotipy
+from googleapiclient.http import HttpRequest
+from googleapiclient.model import JsonModel
+
+from src.transport import Transport
+
+# answer of a search, about the size of a real one
+SEARCH_ANSWER = {"tracks": {"items": [{"id": f"{idx:022d}", "name": "fake " * 40, "artists": [{"name": "fake"}],
+                                       "album": {"name": "fake " * 40}} for idx in range(10)]}}
+SHEET_ANSWER = {"range": "Notations", "values": [["fake"] * 20] * 200}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # keep-alive, a connection serves requests until the client closes it
+    protocol_version = "HTTP/1.1"
+    # headers and body in a single write, flushed after every request
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        time.sleep(self.server.handshake)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        body = json.dumps(SEARCH_ANSWER if "/search" in self.path else SHEET_ANSWER).encode()
+        gzipped = "gzip" in self.headers.get("Accept-Encoding", "")
+        if gzipped:
+            body = gzip.compress(body)
+        time.sleep(self.server.latency)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        if gzipped:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with self.server.lock:
+            self.server.requests += 1
+            self.server.bytes_sent += len(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, handshake, latency):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.handshake = handshake
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.connections = self.requests = self.bytes_sent = 0
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/"
+
+    def reset(self):
+        counters = {"connections": self.connections, "requests": self.requests, "bytes": self.bytes_sent}
+        self.connections = self.requests = self.bytes_sent = 0
+        return counters
+
+
+def spotify(server, session=True):
+    client = spotipy.Spotify(auth="fake", requests_session=session, retries=0)
+    client.prefix = server.url + "v1/"
+    return client
+
+
+def sheet_request(server, http):
+    return HttpRequest(http, JsonModel().response, server.url + "v4/spreadsheets/fake/values/Notations").execute()
+
+
+def run(server, args, shared):
+    """Searches on args.workers threads, then args.sheets Sheets requests, returns the elapsed time"""
+    transport = Transport(pool_maxsize=args.workers) if shared else None
+    clients = {"client": spotify(server, transport.session() if shared else True), "calls": 0}
+    lock = threading.Lock()
+
+    def search(idx):
+        with lock:
+            if not shared and clients["calls"] % args.refresh_every == 0:
+                # previous Muzik.__refresh_token: a new client, new connections
+                clients["client"] = spotify(server)
+            clients["calls"] += 1
+            client = clients["client"]
+        return client.search(f"track:{idx}")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        results = list(executor.map(search, range(args.searches)))
+    assert all(len(result["tracks"]["items"]) == 10 for result in results)
+    for _ in range(args.sheets):
+        # previous fetch_values: a new service and http for every fetch
+        http = transport.http() if shared else httplib2.Http()
+        assert len(sheet_request(server, http)["values"]) == 200
+    elapsed = time.perf_counter() - start
+    return elapsed, transport.stats() if shared else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--searches", type=int, default=400)
+    parser.add_argument("--sheets", type=int, default=5, help="Sheets requests after the searches")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--refresh-every", type=int, default=50, help="searches between two client rebuilds")
+    parser.add_argument("--handshake", type=float, default=.05, help="delay of every new connection (s)")
+    parser.add_argument("--latency", type=float, default=.002, help="delay of every answer (s)")
+    args = parser.parse_args()
+
+    server = StubServer(args.handshake, args.latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        for name, shared in (("previous clients", False), ("shared transport", True)):
+            elapsed, stats = run(server, args, shared)
+            counters = server.reset()
+            print(f"{name:<17}: {elapsed:.2f}s, {counters['requests']} requests on {counters['connections']} "
+                  f"connections, {counters['bytes'] / 1024:.0f} KiB sent")
+            if stats is not None:
+                print(f"{'':<17}  client side: {stats}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
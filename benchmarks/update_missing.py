@@ -0,0 +1,58 @@
+"""
+Measures the payload Ach.update_missing sends to a fake Google Sheets service
+usage: python -m benchmarks.update_missing [--modified 10] [--seed 0]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from src import util
+from src.ach import Ach
+from prototyping.data import DATA_PATH
+from prototyping.shuffle import INDEX_COLUMNS
+from benchmarks.sheet_fetch import fake_service, BENCHMARK_CACHE_DIR
+
+
+def sheet_ids(modified, seed):
+    """Ids of the local csv, with `modified` of them replaced"""
+    # raw strings, as the sheets API sends them
+    sheet = pd.read_csv(DATA_PATH, dtype=str, keep_default_na=False)
+    ids = sheet.set_index(INDEX_COLUMNS)["api:Spotify"]
+    changed = np.random.default_rng(seed).choice(len(ids), modified, replace=False)
+    ids.iloc[changed] = [f"modified{idx}" for idx in changed]
+    return ids[ids != "none"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--modified", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    service = fake_service(latency=0)
+    util.CACHE_DIR = BENCHMARK_CACHE_DIR
+    os.makedirs(BENCHMARK_CACHE_DIR, exist_ok=True)
+    try:
+        ach = Ach(service=service, drive=service)
+        with contextlib.redirect_stdout(io.StringIO()):
+            ach.get_sheets()
+        ids = sheet_ids(args.modified, args.seed)
+        full_rewrite = len(json.dumps(ids.reindex(ach.ach.index, fill_value="none").tolist()))
+        requests = ach.requests
+        ach.update_missing(ids, "Spotify")
+        payload = sum(len(json.dumps(body)) for body in service.updates)
+        # the others read the version of the spreadsheet around the write
+        print(f"{len(service.updates)} batchUpdate out of {ach.requests - requests} requests, {payload} bytes sent "
+              f"(full column rewrite: {full_rewrite} bytes + note)")
+    finally:
+        shutil.rmtree(BENCHMARK_CACHE_DIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
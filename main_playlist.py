@@ -1,33 +1,96 @@
-from src.muzik import Muzik
-from prototyping.playlist import create_playlist, shuffle_playlist
+import argparse
+
+from src.muzik import Muzik, SPOTIFY_RATE, SPOTIFY_BURST
+from prototyping.playlist import create_playlist, shuffle_playlist, load_transitions, score_pool
+from prototyping.stream import stream_playlist, drain
 from src.ach import Ach
+from src.profiler import Profiler, event
 
 if __name__ == "__main__":
-    # create Spotify connector
-    muzik = Muzik()
+    parser = argparse.ArgumentParser(description="Generate the playlist and push it to Spotify")
+    parser.add_argument("--report", default=None, help="json file where the timings of every stage are saved")
+    parser.add_argument("--trace-memory", action="store_true", help="peak memory of every stage with tracemalloc")
+    parser.add_argument("--cprofile", default=None, help="profile the run with cProfile and save the stats there")
+    parser.add_argument("--offline", action="store_true",
+                        help="only use the cached sheet and ids, the playlist is saved instead of pushed")
+    parser.add_argument("--output", default="playlist.csv", help="csv file where the playlist is saved offline")
+    parser.add_argument("--revalidate", type=int, default=0, metavar="CALLS",
+                        help="check the cached ids checked the longest time ago with at most CALLS tracks calls")
+    parser.add_argument("--endless", type=int, default=0, metavar="TRACKS",
+                        help="stream TRACKS tracks to the end of the playlist by batches instead of replacing it")
+    parser.add_argument("--rate", type=float, default=SPOTIFY_RATE,
+                        help="calls per second sent to Spotify with each credentials")
+    parser.add_argument("--burst", type=int, default=SPOTIFY_BURST,
+                        help="calls sent to Spotify at once before the rate applies")
+    args = parser.parse_args()
+    if args.endless > 0 and args.offline:
+        parser.error("--endless appends to the Spotify playlist, it cannot be used --offline")
+
+    profiler = Profiler(trace_memory=args.trace_memory, cprofile=args.cprofile is not None)
+    with profiler.run():
+        # create Spotify connector, connected on first use
+        muzik = Muzik(offline=args.offline, rate=args.rate, burst=args.burst)
+        profiler.add_counter("spotify", lambda: {f"{name}.{key}": value
+                                                 for name, stats in muzik.api_stats().items()
+                                                 for key, value in stats.items()})
+
+        if not args.offline:
+            # connections of every client, opened on first use
+            from src.transport import shared_transport
+            profiler.add_counter("http", lambda: shared_transport().stats())
+
+        # fetches latest update from the datasheet
+        ach = Ach(offline=args.offline)
+        profiler.add_counter("google", ach.stats)
+        sheet = ach.get_sheets()
 
-    # fetches latest update from the datasheet
-    ach = Ach()
-    sheet = ach.get_sheets()
+        # OPTIONAL but better to do
+        # updated the cached list with the latest version
+        # of the datasheet
+        #
+        # updates the cached version
 
-    # OPTIONAL but better to do
-    # updated the cached list with the latest version
-    # of the datasheet
-    #
-    # updates the cached version
+        ids = muzik.update(sheet)
+        if args.revalidate > 0 and not args.offline:
+            # unavailable tracks are searched again, relinked ones replaced
+            muzik.revalidate(args.revalidate)
+            ids = muzik.ids[~muzik.ids.isnull()]
 
-    ids = muzik.update(sheet)
+        # OPTIONAL but better to do
+        # update the missing id list from the sheet
+        if not args.offline:
+            ach.update_missing(ids, muzik.name)
 
-    # OPTIONAL but better to do
-    # update the missing id list from the sheet
-    ach.update_missing(ids, muzik.name)
+        if args.endless > 0:
+            # same scoring and transition rules, the tracks are drawn one at a time and appended by batches of 100
+            with profiler.stage("stream_playlist"):
+                pool = score_pool(sheet.loc[ids.index], ["Qu", "Vi", "Ro"], count_factor=.8, inhib_factor=2,
+                                  min_score=7.75, default_grade=5, eliminating_grade=4.6)
+                stream = stream_playlist(pool, load_transitions("4,0", ach=ach), chain_factor=.7,
+                                         desperation_factor=1, default_threshold=8.5)
+                sent = drain(stream, ids, muzik.append_tracks, tracks=args.endless)
+            event(f"{sent} tracks appended to the playlist", sent=sent)
+        else:
+            # generate playlist with only the songs that "exists"
+            with profiler.stage("create_playlist"):
+                playlist = create_playlist(sheet.loc[ids.index], ["Qu", "Vi", "Ro"], count_factor=.8, inhib_factor=2,
+                                           min_score=7.75, size=150, default_grade=5, eliminating_grade=4.6)
 
-    # generate playlist with only the songs that "exists"
-    playlist = create_playlist(sheet.loc[ids.index], ["Qu", "Vi", "Ro"], count_factor=.8, inhib_factor=2,
-                               min_score=7.75, size=150, default_grade=5, eliminating_grade=4.6)
+            with profiler.stage("shuffle_playlist"):
+                # downloaded with the sheet, no other request to google
+                transitions = load_transitions("4,0", ach=ach)
+                playlist = shuffle_playlist(playlist, default_transition="4,0", chain_factor=.7, desperation_factor=1,
+                                            default_threshold=8.5, transitions=transitions)
 
-    playlist = shuffle_playlist(playlist, default_transition="4,0", chain_factor=.7, desperation_factor=1,
-                                default_threshold=8.5)
+            if args.offline:
+                playlist.assign(id=ids[playlist.index].values).to_csv(args.output)
+                event(f"Playlist saved in {args.output}", path=args.output)
+            else:
+                # push the playlist
+                muzik.create_playlist(playlist)
 
-    # push the playlist
-    muzik.create_playlist(playlist)
+    if args.report is not None:
+        profiler.save(args.report)
+        event(f"Report saved in {args.report}", path=args.report)
+    if args.cprofile is not None:
+        profiler.dump_profile(args.cprofile)
@@ -0,0 +1,60 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from src.profiler import event
+from .playlist import create_playlist, shuffle_playlist
+
+# Shared by the worker processes, set once by _init_worker so that the grades and transitions are only sent once
+_grades = None
+_transitions = None
+
+
+def _init_worker(grades, transitions):
+    global _grades, _transitions
+    _grades = grades
+    _transitions = transitions
+
+
+def _generate(spec):
+    """
+    Generate the playlist of a single spec with the worker's grades and transitions
+    :return: (name, playlist or None, error message or None, duration in seconds)
+    """
+    start = time.perf_counter()
+    try:
+        playlist = create_playlist(_grades, spec["people"], seed=spec.get("seed"), **spec.get("playlist", {}))
+        playlist = shuffle_playlist(playlist, transitions=_transitions, **spec.get("shuffle", {}))
+    except (ValueError, KeyError) as ex:
+        # Bad parameters or a genre missing from the transitions
+        return spec["name"], None, str(ex), time.perf_counter() - start
+    return spec["name"], playlist, None, time.perf_counter() - start
+
+
+def generate_playlists(grades, transitions, specs, workers=None):
+    """
+    Generate the playlists of many guest lists in one go, in a pool of processes
+    :param grades: GradeMatrix of the sheet, restricted to the songs available on Spotify
+    :param transitions: transitions DataFrame from load_transitions()
+    :param specs: list of dicts with a "name", the "people" at the party and optionally the "playlist" parameters of
+                  create_playlist(), the "shuffle" parameters of shuffle_playlist() and a "seed"
+    :param workers: number of processes, as many as CPUs if None
+    :return: (dict of the playlists by name, dict of the timings in seconds by name plus the "total" wall time)
+    """
+    names = [spec["name"] for spec in specs]
+    if len(set(names)) != len(names):
+        raise ValueError("Playlist names must be unique")
+    start = time.perf_counter()
+    playlists, timings = {}, {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(grades, transitions)) as executor:
+        for name, playlist, error, duration in executor.map(_generate, specs):
+            timings[name] = duration
+            if error is not None:
+                event(f"Playlist {name} failed: {error}", level="error", playlist=name)
+                continue
+            playlists[name] = playlist
+            event(f"Playlist {name}: {len(playlist)} tracks in {duration:.2f}s", playlist=name, tracks=len(playlist),
+                  duration=duration)
+    timings["total"] = time.perf_counter() - start
+    event(f"{len(playlists)}/{len(specs)} playlists generated in {timings['total']:.2f}s")
+    return playlists, timings
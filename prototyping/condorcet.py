@@ -1,28 +1,76 @@
-import contributor
-from data import data
-from track import track
-import utils
-
-def initialize() -> tuple:
-    tracks, ratings = [], {}
-    for label, content in data.data.iterrows():
-        current_track = track.track(content.genre, content.sub_genre, content.artist, content.album, content.song)
-        tracks.append(current_track)
-        ratings[current_track] = { c: utils.as_real_or_none(content[c.index]) for c in contributor.CONTRIBUTORS }
-    return (tracks, ratings)
-
-
-def condorcet_method(candidate):
-    pass
-
-def schulze_method():
-    pass
-
-tracks, ratings = initialize()
-for t in ratings:
-    for c in ratings[t]:
-        if ratings[t][c]:
-            c.ratings[ratings[t][c]].append(t) 
-
-for c in contributor.CONTRIBUTORS:
-    print("{}: {}".format(c, c.personal_ranking()))
\ No newline at end of file
+import numpy as np
+
+
+def pairwise_preferences(grades):
+    """
+    Pairwise preference matrix of the candidates
+    :param grades: (candidates x contributors) matrix, NaN where a contributor did not grade the candidate
+    :return: int matrix, d[i, j] being the number of contributors who graded both and prefer i to j
+    """
+    size = grades.shape[0]
+    preferences = np.zeros((size, size), dtype=np.int32)
+    for column in grades.T:
+        # comparisons with NaN are False, so only the pairs graded by the contributor are counted
+        preferences += column[:, None] > column[None, :]
+    return preferences
+
+
+def condorcet_winner(preferences):
+    """
+    Candidate preferred to every other one by a majority, if there is one
+    :param preferences: matrix from pairwise_preferences()
+    :return: position of the winner, None if there is no Condorcet winner
+    """
+    beats = preferences > preferences.T
+    np.fill_diagonal(beats, True)
+    winners = np.flatnonzero(beats.all(axis=1))
+    return winners[0] if len(winners) else None
+
+
+def widest_paths(preferences):
+    """
+    Strength of the strongest (widest) paths between every pair of candidates, Floyd-Warshall style
+    :param preferences: matrix from pairwise_preferences()
+    :return: matrix p, p[i, j] being the strength of the strongest path from i to j
+    """
+    strengths = np.where(preferences > preferences.T, preferences, 0)
+    np.fill_diagonal(strengths, 0)
+    for k in range(strengths.shape[0]):
+        # every path going through k, computed for all (i, j) at once
+        np.maximum(strengths, np.minimum(strengths[:, k, None], strengths[None, k, :]), out=strengths)
+    np.fill_diagonal(strengths, 0)
+    return strengths
+
+
+def schulze_wins(grades):
+    """
+    Schulze method: number of candidates each candidate beats through the strongest paths
+    Ranking the candidates by decreasing wins gives the Schulze ranking
+    :param grades: (candidates x contributors) matrix, NaN where a contributor did not grade the candidate
+    :return: int array of the wins of every candidate
+    """
+    strengths = widest_paths(pairwise_preferences(grades))
+    return (strengths > strengths.T).sum(axis=1)
+
+
+def schulze_ranking(grades):
+    """
+    Positions of the candidates from the Schulze winner to the last one, ties keep their original order
+    """
+    return np.argsort(-schulze_wins(grades), kind="stable")
+
+
+def library_ranking(library, people=None, top_k=None):
+    """
+    Schulze ranking of the tracks of a Library
+    :param library: Library of the sheet
+    :param people: contributor columns taking part in the vote, all of them if None
+    :param top_k: only rank the top_k tracks with the best mean grade, the cost is cubic in the number of tracks
+    :return: list of Track views, the winner first
+    """
+    grades = library.grades(people)
+    candidates = np.arange(len(library))
+    if top_k is not None:
+        mean = np.nan_to_num(np.nanmean(np.where(np.isnan(grades).all(axis=1, keepdims=True), 0, grades), axis=1))
+        candidates = np.argsort(-mean, kind="stable")[:top_k]
+    return [library.track(position) for position in candidates[schulze_ranking(grades[candidates])]]
@@ -1,30 +1,50 @@
 import collections
 
-class contributor:
-    def __init__(self, name, index):
+import numpy as np
+
+
+class Contributor:
+    """
+    Lightweight view of a grade column of a Library
+    """
+    __slots__ = ("name", "index", "library")
+
+    def __init__(self, name, index, library=None):
         self.name = name
         self.index = index
-        self.ratings = collections.defaultdict(list)
-        
+        self.library = library
+
     def __str__(self) -> str:
         return self.name
-        
+
     def __repr__(self) -> str:
         return self.name
-        
-    def __sort_ratings(self):
-        self.ratings = { r: self.ratings[r] for r in sorted(self.ratings, reverse=True) }
+
+    def grades(self):
+        """Grades of the contributor for every track of the library, NaN where not graded"""
+        return self.library.grades([self.index])[:, 0]
+
+    @property
+    def ratings(self):
+        """Tracks graded by the contributor grouped by grade, best grades first"""
+        grades = self.grades()
+        graded = np.flatnonzero(~np.isnan(grades))
+        ratings = collections.defaultdict(list)
+        for position in graded[np.argsort(-grades[graded], kind="stable")]:
+            ratings[float(grades[position])].append(self.library.track(position))
+        return ratings
 
     def personal_ranking(self) -> list:
-        self.__sort_ratings()
         return self.ratings.values()
 
-# Hardcoded contributors and column indexes.
-CONTRIBUTORS = [ 
-    contributor('Quentin', 'ntQ'), contributor('Gary', 'ntG'), contributor('Vincent', 'ntV'),
-    contributor('Romain', 'ntR'), contributor('Samuel', 'ntS'), contributor('Galtier', 'ntGl'), 
-    contributor('Roxane', 'ntRx'), contributor('Clémence', 'ntC'), contributor('Lucas', 'ntL')
+
+# Hardcoded contributors and their sheet columns.
+CONTRIBUTORS = [
+    Contributor('Quentin', 'Qu'), Contributor('Gary', 'Gr'), Contributor('Vincent', 'Vi'),
+    Contributor('Romain', 'Ro'), Contributor('Samuel', 'Sa'), Contributor('Galtier', 'Gl'),
+    Contributor('Roxane', 'Rx'), Contributor('Clémence', 'Cl'), Contributor('Lucas', 'Lu')
 ]
+NAMES = {c.index: c.name for c in CONTRIBUTORS}
 
 if __name__ == "__main__":
-    print("Ach! Musik contributors are: {}".format(CONTRIBUTORS))
\ No newline at end of file
+    print("Ach! Musik contributors are: {}".format(CONTRIBUTORS))
@@ -1,35 +1,45 @@
-import pandas as pd
+from src.sheets import shared_client
+from src.profiler import event
 
-# from oauth2client.service_account import ServiceAccountCredentials 
-from googleapiclient.discovery import build
-from google.oauth2.service_account import Credentials
-
-CREDENTIALS_PATH_GOOGLE = 'google-credentials.json'
-SCOPES = ['https://www.googleapis.com/auth/spreadsheets.readonly']
-SPREADSHEET = '1b75J-QTGrujSgF9r0_JPOKkcXAwzFVwpETOAyVBw8ak'
+from .loader import read_sheet, read_transitions, sheet_from_values, transitions_from_values
 
 DATA_PATH = "data/csv/achmusik.csv"
 TRANSITIONS_PATH = "data/csv/transitions.csv"
 
+
+def fetch_values(sheet="Notations"):
+    """
+    Raw values of a sheet from the Google Sheets API: the header row then rows of strings. The client is shared by the
+    process, a sheet is downloaded once per run
+    """
+    return shared_client().get(sheet)
+
+
 def load_from_api(sheet="Notations", fallback=DATA_PATH):
+    """
+    Loads a sheet with its numbers parsed: grades as float32 for the Notations sheet, scores indexed by genre for the
+    Transitions sheet
+    """
+    from_values, from_file = (transitions_from_values, read_transitions) if sheet == "Transitions" \
+        else (sheet_from_values, read_sheet)
     try:
-        # Load service account credentials.
-        __credentials = Credentials.from_service_account_file(CREDENTIALS_PATH_GOOGLE, scopes=SCOPES)
-
-        # Creates Google Sheets API (v4/latest) service.
-        service = build('sheets', 'v4', credentials=__credentials)
-        # Gets values from Ach! Musik: Notations sheet.
-        values = service.spreadsheets().values().get(spreadsheetId=SPREADSHEET, range=sheet).execute()['values']
-        headers = values.pop(0)
-        # Format data as pd.DataFrame
-        return pd.DataFrame(values, columns=headers)
+        values = fetch_values(sheet)
     except Exception as ex:
-        print("No valid Google credentials found or fetch exception. Falling back on csv file...")
-        return load_from_cache(fallback)
+        event("No valid Google credentials found or fetch exception. Falling back on csv file...", level="warning")
+        return from_file(fallback)
+    return from_values(values)
 
 
 def load_from_cache(fallback=DATA_PATH):
-    return pd.read_csv(fallback)
+    return read_sheet(fallback)
+
+
+def load_library(sheet="Notations", fallback=DATA_PATH):
+    """
+    Sheet loaded as a compact Library, shared by the playlist and ranking code
+    """
+    from .library import Library
+    return Library.from_frame(load_from_api(sheet, fallback))
 
 
 if __name__ == '__main__':
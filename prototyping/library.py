@@ -0,0 +1,137 @@
+from sys import getsizeof
+
+import numpy as np
+import pandas as pd
+
+from .contributor import Contributor, NAMES
+from .scoring import parse_grades, GRADE_DECIMALS, NON_GRADE_COLUMNS
+from .shuffle import INDEX_COLUMNS
+from .track import Track
+
+ID_COLUMN = "api:Spotify"
+MISSING = -1
+
+
+class StringTable:
+    """
+    Interned strings: every distinct string is stored once and referred to by its int code
+    """
+    __slots__ = ("values", "codes")
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def intern(self, value):
+        """Code of value, added to the table if needed, MISSING for empty values"""
+        if value is None or value != value or value == "":
+            return MISSING
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def encode(self, column):
+        """
+        Codes of a whole column, the distinct values are interned once
+        :param column: Series or array of strings
+        :return: int32 array of the codes
+        """
+        codes, uniques = pd.factorize(np.asarray(column, dtype=object))
+        table = np.array([self.intern(value) for value in uniques] + [MISSING], dtype=np.int32)
+        # factorize gives -1 to the missing values, the last entry of the table
+        return table[codes]
+
+    def get(self, code):
+        return self.values[code] if code != MISSING else None
+
+    def decode(self, codes):
+        """Strings of an array of codes, None for MISSING"""
+        values = np.array(self.values + [None], dtype=object)
+        return values[codes]
+
+
+class Library:
+    """
+    Compact in-memory model of the sheet: the track fields as codes of a shared StringTable in parallel int32 arrays
+    and the grades as a (tracks x contributors) float32 matrix, NaN where not graded.
+    Track and Contributor objects are views over these arrays, created on demand.
+    """
+
+    def __init__(self, strings, columns, ratings, people):
+        """
+        :param strings: StringTable of the fields
+        :param columns: dict of the int32 code arrays by field (INDEX_COLUMNS and ID_COLUMN)
+        :param ratings: float32 matrix of the grades
+        :param people: contributor column of every ratings column
+        """
+        self.strings = strings
+        self.columns = columns
+        self.ratings = ratings
+        self.people = list(people)
+        self.positions = {person: idx for idx, person in enumerate(self.people)}
+
+    @classmethod
+    def from_frame(cls, data):
+        """
+        :param data: sheet DataFrame, as loaded from the csv or the API (the track fields may be its index)
+        """
+        if set(INDEX_COLUMNS) <= set(data.index.names):
+            data = data.reset_index()
+        strings = StringTable()
+        columns = {column: strings.encode(data[column]) for column in INDEX_COLUMNS}
+        columns[ID_COLUMN] = strings.encode(data[ID_COLUMN]) if ID_COLUMN in data.columns \
+            else np.full(len(data), MISSING, dtype=np.int32)
+        people = [column for column in data.columns if column not in INDEX_COLUMNS + NON_GRADE_COLUMNS]
+        ratings = np.empty((len(data), len(people)), dtype=np.float32)
+        for idx, person in enumerate(people):
+            ratings[:, idx] = parse_grades(data[person]).to_numpy()
+        return cls(strings, columns, ratings, people)
+
+    def __len__(self):
+        return len(self.ratings)
+
+    def __iter__(self):
+        return (Track(self, position) for position in range(len(self)))
+
+    def track(self, position):
+        return Track(self, position)
+
+    def contributors(self):
+        """Contributor views of the grade columns"""
+        return [Contributor(NAMES.get(person, person), person, self) for person in self.people]
+
+    def column(self, field):
+        """Strings of a field for every track, None where empty"""
+        return self.strings.decode(self.columns[field])
+
+    def index(self):
+        """MultiIndex of the tracks, as the sheet DataFrame uses it (empty fields become empty strings)"""
+        return pd.MultiIndex.from_arrays([pd.Series(self.column(column)).fillna("").values
+                                          for column in INDEX_COLUMNS], names=INDEX_COLUMNS)
+
+    def ids(self):
+        """Spotify ids of the tracks, None if not found"""
+        return pd.Series(self.column(ID_COLUMN), index=self.index(), name=ID_COLUMN)
+
+    def grades(self, people=None):
+        """
+        float64 grades, exactly the values parse_grades() would give
+        :param people: contributor columns to keep, all of them if None
+        """
+        columns = [self.positions[person] for person in people] if people is not None else slice(None)
+        return np.round(self.ratings[:, columns].astype(np.float64), GRADE_DECIMALS)
+
+    def row(self, position):
+        """float64 grades of a single track"""
+        return np.round(self.ratings[position].astype(np.float64), GRADE_DECIMALS)
+
+    def nbytes(self):
+        """Memory used by the arrays and the string table (the strings themselves included)"""
+        strings = getsizeof(self.strings.values) + getsizeof(self.strings.codes) \
+            + sum(getsizeof(value) for value in self.strings.values)
+        return strings + self.ratings.nbytes + sum(codes.nbytes for codes in self.columns.values())
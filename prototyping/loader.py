@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+
+# Rows parsed at once, the strings of a single chunk are alive at a time
+CHUNK_ROWS = 100000
+# Track fields with few distinct values, kept as categoricals
+CATEGORICAL_COLUMNS = ["genre", "sub_genre", "artist", "album"]
+# Columns kept as strings, every other column of the sheet holds grades
+TEXT_COLUMNS = ["song", "api:Spotify", "alb?"]
+
+
+def parse_decimal(values, dtype=np.float32):
+    """
+    Parses French formatted numbers ("7,25", dots are accepted too), anything else becomes NaN
+    Grades only take a few hundred distinct values: each distinct string is parsed once and the result is spread with
+    the factorize codes, instead of replacing and converting every cell
+    :param values: array-like of strings (None or NaN for empty cells)
+    :param dtype: float dtype of the result
+    :return: numpy array of dtype
+    """
+    values = np.asarray(values, dtype=object)
+    codes, uniques = pd.factorize(values)
+    parsed = pd.to_numeric(pd.Series(uniques, dtype=object).astype(str).str.replace(",", ".", regex=False),
+                           errors="coerce").to_numpy(dtype=dtype)
+    # factorize gives -1 to the empty cells, the last entry
+    return np.append(parsed, np.nan).astype(dtype)[codes]
+
+
+def _typed_columns(chunk):
+    """Columns of a chunk of string cells with their final types: categoricals, strings and float32 grades"""
+    columns = {}
+    for column in chunk.columns:
+        if column in CATEGORICAL_COLUMNS:
+            columns[column] = pd.Categorical(chunk[column])
+        elif column in TEXT_COLUMNS:
+            columns[column] = chunk[column].to_numpy(dtype=object)
+        else:
+            columns[column] = parse_decimal(chunk[column].to_numpy())
+    return columns
+
+
+def _assemble(chunks, headers):
+    """Single DataFrame from the typed columns of every chunk"""
+    if not chunks:
+        return pd.DataFrame(columns=headers)
+    data = {}
+    for column in headers:
+        parts = [chunk[column] for chunk in chunks]
+        if column in CATEGORICAL_COLUMNS:
+            data[column] = pd.api.types.union_categoricals(parts)
+        else:
+            data[column] = np.concatenate(parts)
+    return pd.DataFrame(data, columns=headers)
+
+
+def read_sheet(path, chunksize=CHUNK_ROWS):
+    """
+    Streams the achmusik csv in one pass: the cells are read as strings by chunks and each chunk is typed before the
+    next one is read
+    :param path: path of the csv
+    :param chunksize: number of rows of a chunk
+    :return: DataFrame with categorical track fields, string song/id columns and float32 grades
+    """
+    chunks, headers = [], None
+    for chunk in pd.read_csv(path, dtype=str, chunksize=chunksize):
+        headers = list(chunk.columns)
+        chunks.append(_typed_columns(chunk))
+    if headers is None:
+        headers = list(pd.read_csv(path, nrows=0).columns)
+    return _assemble(chunks, headers)
+
+
+def sheet_from_values(values, chunksize=CHUNK_ROWS):
+    """
+    Same as read_sheet() on the raw values of the Sheets API: a header row then rows of strings, the trailing empty
+    cells of a row being left out by the API
+    """
+    headers, rows = values[0], values[1:]
+    chunks = []
+    for start in range(0, len(rows), chunksize):
+        chunk = pd.DataFrame(rows[start:start + chunksize]).reindex(columns=range(len(headers)))
+        chunk.columns = headers
+        chunks.append(_typed_columns(chunk))
+    return _assemble(chunks, headers)
+
+
+def _transitions(frame):
+    """Transition scores indexed by the genres of the first column, as float64"""
+    frame = frame.set_index(frame.columns[0])
+    frame.index.name = None
+    # float64: the scores are compared with thresholds, float32 would move 7.3 above a 7.3 threshold
+    return frame.apply(lambda column: parse_decimal(column.to_numpy(), dtype=np.float64))
+
+
+def read_transitions(path):
+    """
+    Transitions csv as numbers, NaN where there is no score
+    :return: float64 DataFrame, transitions[from][to]
+    """
+    return _transitions(pd.read_csv(path, dtype=str))
+
+
+def transitions_from_values(values):
+    """
+    Same as read_transitions() on the raw values of the Sheets API
+    """
+    headers, rows = values[0], values[1:]
+    frame = pd.DataFrame(rows).reindex(columns=range(len(headers)))
+    frame.columns = headers
+    return _transitions(frame)
@@ -1,59 +1,122 @@
 import random
 
+import numpy as np
 import pandas as pd
-from .data import load_from_api
+from src.profiler import event
+from .data import load_from_api, TRANSITIONS_PATH
+from .shuffle import INDEX_COLUMNS, encode, transition_matrix, shuffle_order
+from .scoring import GradeMatrix
+from .library import Library
+from .loader import parse_decimal, read_transitions
+from .sampling import WeightedSampler
+from .condorcet import schulze_wins
 
+# Number of best scored tracks ranked with the Schulze method
+SCHULZE_TOP_K = 500
 
-def create_playlist(data, people=None, count_factor=.1, inhib_factor=2, min_score=5.5, size=300, default_grade=5,
-                    eliminating_grade=4.6):
+
+def score_pool(data, people=None, count_factor=.1, inhib_factor=2, min_score=5.5, default_grade=5,
+               eliminating_grade=4.6, ranking="score", top_k=SCHULZE_TOP_K, predict=False):
     """
-    Create a personalized playlist with ACHMUSIK data loaded directly from the sheet
+    Score the tracks for the people at the party and keep the ones that can enter the roulette wheel
+    :param data: the sheet DataFrame, its Library or its GradeMatrix to score several guest lists without parsing it
+                 again
     :param people: The people presently present at the gathering to include in the scoring
     :param count_factor: multiplicative factor to help properly graded songs rise to the top
     :param inhib_factor: the added factor to scoring is count_factor * (COUNT - len(people) / inhib_factor)
     :param min_score: minimum score for songs to be kept in the roulette wheel
-    :param size: size of the playlist
     :param default_grade: grade applied to songs not graded by any member of people yet
     :param eliminating_grade: minimum required grade for every person (unless not graded yet)
-    :return: a shuffled playlist (DataFrame)
+    :param ranking: "score" to weight the tracks by the rank of their score, "schulze" to keep the top_k best scores
+                    and weight them by their rank in the Schulze method (pairwise preferences of the people)
+    :param top_k: number of candidates of the Schulze method, its cost is cubic in top_k
+    :param predict: grade the songs no one present graded yet with their predicted grades instead of default_grade
+    :return: the pool (DataFrame) sorted by score, with its "rank" column to use as weight
     """
     if people is None:
         people = ["Qu", "Gr", "Vi", "Ro"]
-    count_inhib = len(people) // inhib_factor
-
-    for i in range(data.columns.size):
-        data[data.columns[i]] = data[data.columns[i]].str.replace(",", ".")
-        data[data.columns[i]] = pd.to_numeric(data[data.columns[i]], errors='coerce')
+    # Parsing the grades is the expensive part, reuse the matrix when scoring several guest lists
+    if isinstance(data, Library):
+        grades = GradeMatrix.from_library(data)
+    else:
+        grades = data if isinstance(data, GradeMatrix) else GradeMatrix(data)
 
     # Keeping only present people at the hypothetical party!
-    data = data.filter(people)
-
-    # Hard to do this shit inplace -- if no grades at all, give it a chance to play with default grade
-    data = data.dropna(how="all").append(data[data.isnull().all(axis=1)].fillna(default_grade))
-
-    # Mean of all notes for each track
-    data["mean"] = data[data.columns].mean(axis=1)
-    # Amount of notes for each track
-    data["count"] = data.count(axis=1) - 1
-    # Helping songs graded by more people in the group
-    data["score"] = data["mean"] + (count_factor * (data["count"] - count_inhib))
+    order, values, mean, count, score, minimum = grades.scores(people, count_factor=count_factor,
+                                                               inhib_factor=inhib_factor,
+                                                               default_grade=default_grade, predict=predict)
     # Truncating to keep only the acceptable songs
-    data = data[data["score"] > min_score]
+    kept = score > min_score
+    columns = [grades.people[column] for column in grades.columns(people)]
+    # Tracks are identified by their position in the pool until the end, the sheet index may have duplicates
+    data = pd.DataFrame(values[kept], columns=columns)
+    data["mean"] = mean[kept]
+    data["count"] = count[kept]
+    data["score"] = score[kept]
 
     # Using ranking of scores as weight for the playlist bootstrap
-    print("Creating playlist...")
     data = data.sort_values("score", ascending=False)
     data["rank"] = data["score"].rank(method="min")
 
     # Eliminating tracks with a grade under the required minimum
-    data = data[data[data.columns[:-4]].min(axis=1) > eliminating_grade]
-    playlist = data.sample(n=size, weights="rank")
+    data = data[minimum[kept][data.index] > eliminating_grade]
+    data.index = grades.index[order[kept]][data.index]
 
-    return playlist
+    if ranking == "schulze":
+        data = data.head(top_k).copy()
+        wins = schulze_wins(data[columns].to_numpy(dtype=float))
+        data["rank"] = pd.Series(wins, index=range(len(data))).rank(method="min").values
+    elif ranking != "score":
+        raise ValueError(f"Unknown ranking {ranking}")
+    return data
+
+
+def create_playlist(data, people=None, count_factor=.1, inhib_factor=2, min_score=5.5, size=300, default_grade=5,
+                    eliminating_grade=4.6, seed=None, ranking="score", top_k=SCHULZE_TOP_K, predict=False):
+    """
+    Create a personalized playlist with ACHMUSIK data loaded directly from the sheet
+    :param data: the sheet DataFrame, its Library or its GradeMatrix to score several guest lists without parsing it
+                 again
+    :param people: The people presently present at the gathering to include in the scoring
+    :param count_factor: multiplicative factor to help properly graded songs rise to the top
+    :param inhib_factor: the added factor to scoring is count_factor * (COUNT - len(people) / inhib_factor)
+    :param min_score: minimum score for songs to be kept in the roulette wheel
+    :param size: size of the playlist, the whole pool is taken if it is smaller
+    :param default_grade: grade applied to songs not graded by any member of people yet
+    :param eliminating_grade: minimum required grade for every person (unless not graded yet)
+    :param seed: seed of the roulette wheel, for reproducible playlists
+    :param ranking: "score" or "schulze", see score_pool()
+    :param top_k: number of candidates of the Schulze method
+    :param predict: use predicted grades instead of default_grade, see score_pool()
+    :return: a shuffled playlist (DataFrame)
+    """
+    pool = score_pool(data, people, count_factor=count_factor, inhib_factor=inhib_factor, min_score=min_score,
+                      default_grade=default_grade, eliminating_grade=eliminating_grade, ranking=ranking, top_k=top_k,
+                      predict=predict)
+    event("Creating playlist...")
+    sampler = WeightedSampler(pool["rank"].values, seed=seed)
+    return pool.iloc[sampler.sample(size)]
+
+
+def load_transitions(default_transition="4,0", ach=None):
+    """
+    Load the genre transitions sheet as a numeric DataFrame, transitions[from][to] being the score of the transition
+    :param default_transition: default value for transition scores between different genres
+    :param ach: src.ach.Ach whose sheets were fetched, its transitions come with the sheet (same request, cached with
+    it), the Transitions sheet is fetched on its own if None or if Ach has none, read from the csv if Ach is offline
+    :return: transitions DataFrame indexed and labelled by genre
+    """
+    transitions = ach.get_transitions() if ach is not None else None
+    if transitions is None and ach is not None and ach.offline:
+        transitions = read_transitions(TRANSITIONS_PATH)
+    if transitions is None:
+        # Parsed and indexed by genre by the loader, only the missing scores are left
+        transitions = load_from_api("Transitions", fallback=TRANSITIONS_PATH)
+    return transitions.fillna(parse_decimal([default_transition], dtype=np.float64)[0])
 
 
 def shuffle_playlist(playlist, default_transition="4,0", chain_factor=.6, desperation_factor=1, default_threshold=8,
-                     verbose=False):
+                     verbose=False, transitions=None):
     """
     shuffles a playlist according to genre distance scores
     :param verbose: self-explanatory
@@ -62,18 +125,37 @@ def shuffle_playlist(playlist, default_transition="4,0", chain_factor=.6, desper
     :param chain_factor: 0 < < 1 -- how much chaining the same genre again and again lowers the threshold
     :param desperation_factor: if no track is found after looping over the playlist, how much to lower threshold
     :param default_threshold: default threshold for the score needed to accept track as next in shuffle
+    :param transitions: already loaded transitions DataFrame, fetched with load_transitions() if None
     :return: a shuffled playlist (DataFrame)
     """
-    transitions = load_from_api("Transitions", fallback="data/csv/transitions.csv").fillna(default_transition)
-    transitions.index = transitions[""]
-    transitions.drop("", axis=1, inplace=True)
+    if transitions is None:
+        transitions = load_transitions(default_transition)
+
+    tracks = playlist.reset_index()[INDEX_COLUMNS]
+    genre_codes, genres = encode(tracks["genre"])
+    artist_codes, _ = encode(tracks["artist"])
+    matrix = transition_matrix(transitions, genres)
+
+    order = shuffle_order(genre_codes, artist_codes, matrix, chain_factor=chain_factor,
+                          desperation_factor=desperation_factor, default_threshold=default_threshold)
+    shuffled_playlist = tracks.iloc[order].reset_index(drop=True)
+    if verbose:
+        for _, row in shuffled_playlist.iterrows():
+            print("Playing ", row["song"], " from ", row["artist"], "-- of genre ", row["genre"])
+
+    return shuffled_playlist.set_index(INDEX_COLUMNS)
 
-    # Getting the decimals right again -- commas to points and no more Nones
-    for i in range(transitions.columns.size):
-        transitions[transitions.columns[i]] = transitions[transitions.columns[i]].str.replace(",", ".")
-        transitions[transitions.columns[i]] = pd.to_numeric(transitions[transitions.columns[i]], errors='coerce')
 
-    playlist.reset_index(inplace=True)
+def shuffle_playlist_legacy(playlist, default_transition="4,0", chain_factor=.6, desperation_factor=1,
+                            default_threshold=8, verbose=False, transitions=None):
+    """
+    Original row by row implementation of shuffle_playlist(), kept as a reference for benchmarks
+    Same parameters and output as shuffle_playlist()
+    """
+    if transitions is None:
+        transitions = load_transitions(default_transition)
+
+    playlist = playlist.reset_index()
 
     # This is so horribly un-optimized... May the Python Lords forgive me.
     shuffled_playlist = playlist.iloc[0:1].drop(playlist.columns[5:], axis=1)
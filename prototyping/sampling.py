@@ -0,0 +1,119 @@
+import numpy as np
+
+from src.profiler import event
+
+
+class WeightedSampler:
+    """
+    Weighted sampling without replacement over a fixed pool, backed by a Fenwick tree of the weights
+    Built once in O(n), every streaming draw is O(log n). Drawn positions can be put back with restore(), which makes
+    it usable as an endless roulette wheel.
+    """
+
+    def __init__(self, weights, seed=None):
+        """
+        :param weights: non negative weight of every position of the pool
+        :param seed: seed (or numpy Generator) for reproducible draws
+        """
+        self.weights = np.array(weights, dtype=np.float64)
+        if self.weights.ndim != 1 or (self.weights < 0).any() or not np.isfinite(self.weights).all():
+            raise ValueError("Weights must be a 1d array of finite non negative values")
+        self.size = self.weights.size
+        self.rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+        # highest power of two <= size, starting point of the tree descent
+        self.__top = 1 << (self.size.bit_length() - 1) if self.size else 0
+        self.__build()
+
+    def __build(self):
+        """Builds the tree from the weights: tree[i] is the sum of the lowbit(i) weights ending at position i - 1"""
+        positions = np.arange(1, self.size + 1)
+        prefix = np.concatenate([[0.], np.cumsum(self.weights)])
+        self.__tree = np.zeros(self.size + 1)
+        self.__tree[1:] = prefix[positions] - prefix[positions - (positions & -positions)]
+        self.remaining = int(np.count_nonzero(self.weights))
+
+    def __add(self, position, value):
+        idx = position + 1
+        while idx <= self.size:
+            self.__tree[idx] += value
+            idx += idx & -idx
+
+    def __find(self, value):
+        """Position whose cumulated weight interval contains value"""
+        idx, step = 0, self.__top
+        while step:
+            if idx + step <= self.size and self.__tree[idx + step] <= value:
+                idx += step
+                value -= self.__tree[idx]
+            step >>= 1
+        return min(idx, self.size - 1)
+
+    def total(self):
+        """Sum of the weights still in the pool"""
+        idx, total = self.size, 0.
+        while idx > 0:
+            total += self.__tree[idx]
+            idx -= idx & -idx
+        return total
+
+    def __len__(self):
+        """Number of positions that can still be drawn"""
+        return self.remaining
+
+    def draw(self):
+        """
+        Draw a single position and remove it from the pool
+        :return: the position, None if the pool is empty
+        """
+        if self.remaining == 0:
+            return None
+        position = self.__find(self.rng.random() * self.total())
+        if self.weights[position] == 0:
+            # Rounding errors piled up in the tree, start again from the weights
+            self.__build()
+            position = self.__find(self.rng.random() * self.total())
+        self.__add(position, -self.weights[position])
+        self.weights[position] = 0.
+        self.remaining -= 1
+        return position
+
+    def sample(self, k):
+        """
+        Draw k positions without replacement, less if the pool is too small
+        Batch draws use the Efraimidis-Spirakis keys (u ** (1 / weight), largest first) in a single vectorized pass,
+        O(n + k log k), which gives the same distribution as k successive draw() calls
+        :return: int array of the positions in drawing order
+        """
+        if k > self.remaining:
+            event(f"Only {self.remaining} tracks left to draw, {k} requested", level="warning", requested=k,
+                  remaining=self.remaining)
+            k = self.remaining
+        if k <= 0:
+            return np.empty(0, dtype=np.intp)
+        candidates = np.flatnonzero(self.weights)
+        # log(u) / weight, in exponential form to stay accurate with large weights
+        keys = -self.rng.exponential(size=candidates.size) / self.weights[candidates]
+        best = np.argpartition(-keys, k - 1)[:k]
+        positions = candidates[best[np.argsort(-keys[best], kind="stable")]]
+        self.weights[positions] = 0.
+        self.__build()
+        return positions
+
+    def restore(self, position, weight):
+        """
+        Put a drawn position back in the pool
+        :param weight: weight of the position, usually its initial weight
+        """
+        if self.weights[position] != 0:
+            raise ValueError(f"Position {position} was not drawn")
+        if weight > 0:
+            self.__add(position, weight)
+            self.weights[position] = weight
+            self.remaining += 1
+
+    def __iter__(self):
+        """Streaming draws, until the pool is empty"""
+        position = self.draw()
+        while position is not None:
+            yield position
+            position = self.draw()
@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+
+from .similarity import spearman, predict
+
+
+# Sheet columns that are not grades, left out of the correlations
+NON_GRADE_COLUMNS = ["api:Spotify", "alb?"]
+# Grades have at most 2 decimals, rounding float32 grades at 4 gives back the exact float64 grades
+GRADE_DECIMALS = 4
+
+
+def parse_grades(column):
+    """
+    Converts a column of French formatted grades ("7,25") to floats, anything else becomes NaN
+    :param column: Series of strings (or categorical strings), or of grades already parsed by the loader
+    :return: float64 Series
+    """
+    if column.dtype == np.float32:
+        return column.astype(np.float64).round(GRADE_DECIMALS)
+    if pd.api.types.is_float_dtype(column.dtype):
+        return column
+    return pd.to_numeric(column.astype(str).str.replace(",", "."), errors='coerce')
+
+
+class GradeMatrix:
+    """
+    Grades of the sheet parsed once as a (tracks x contributors) matrix, NaN for the tracks not graded yet
+    Build it once per sheet load and score it for as many guest lists as needed
+    Grades are kept as float64: float32 would move grades like 7.3 above a 7.3 threshold
+    """
+
+    def __init__(self, data):
+        """
+        :param data: sheet DataFrame indexed by track, one column per contributor
+        """
+        self.index = data.index
+        self.people = list(data.columns)
+        self.positions = {person: idx for idx, person in enumerate(self.people)}
+        self.grades = np.column_stack([parse_grades(data[column]).to_numpy(dtype=np.float64)
+                                       for column in data.columns]) if self.people \
+            else np.empty((len(data), 0))
+        self.graded = ~np.isnan(self.grades)
+        self.__predictions = None
+
+    @classmethod
+    def from_library(cls, library):
+        """
+        Grade matrix sharing the already parsed grades of a Library
+        """
+        matrix = cls.__new__(cls)
+        matrix.index = library.index()
+        matrix.people = list(library.people)
+        matrix.positions = dict(library.positions)
+        matrix.grades = library.grades()
+        matrix.graded = ~np.isnan(matrix.grades)
+        matrix.__predictions = None
+        return matrix
+
+    def __len__(self):
+        return len(self.index)
+
+    def columns(self, people):
+        """
+        Positions of the people that have a column in the sheet, in the order of people
+        """
+        return [self.positions[person] for person in dict.fromkeys(people) if person in self.positions]
+
+    def similarity(self):
+        """
+        Spearman correlations of the contributors, see similarity.spearman(), NaN for the columns that are not grades
+        """
+        columns = [idx for idx, person in enumerate(self.people) if person not in NON_GRADE_COLUMNS]
+        correlations = np.full((len(self.people), len(self.people)), np.nan)
+        correlations[np.ix_(columns, columns)] = spearman(self.grades[:, columns])
+        return correlations
+
+    def predictions(self):
+        """
+        Predicted grades of every contributor for every track, see similarity.predict()
+        Computed on first use and kept with the matrix, which is rebuilt when the sheet changes
+        """
+        if self.__predictions is None:
+            self.__predictions = predict(self.grades, self.similarity())
+        return self.__predictions
+
+    def scores(self, people, count_factor=.1, inhib_factor=2, default_grade=5, predict=False):
+        """
+        Scores every track for a guest list, with the create_playlist() rules
+        :param people: The people presently present at the gathering to include in the scoring
+        :param count_factor: multiplicative factor to help properly graded songs rise to the top
+        :param inhib_factor: the added factor to scoring is count_factor * (COUNT - len(people) / inhib_factor)
+        :param default_grade: grade applied to songs not graded by any member of people yet
+        :param predict: use the predicted grades of the people for these songs, default_grade being only used when
+                        no similar contributor graded them either
+        :return: (order, grades, mean, count, score, minimum) arrays, order being the positions of the tracks: the
+                 graded ones first, then the ones with default grades, as create_playlist() always did
+        """
+        count_inhib = len(people) // inhib_factor
+        columns = self.columns(people)
+        graded = self.graded[:, columns]
+        any_graded = graded.any(axis=1)
+        order = np.concatenate([np.flatnonzero(any_graded), np.flatnonzero(~any_graded)])
+        grades = self.grades[order][:, columns]
+        # if no grades at all, give it a chance to play with default grade
+        ungraded = ~any_graded[order]
+        if predict:
+            predicted = self.predictions()[order[ungraded]][:, columns]
+            grades[ungraded] = np.where(np.isnan(predicted), default_grade, predicted)
+        else:
+            grades[ungraded] = default_grade
+        graded = ~np.isnan(grades)
+
+        count = graded.sum(axis=1)
+        # row-major sum over the people, the same reduction pandas does for mean(axis=1)
+        mean = np.ascontiguousarray(np.where(graded, grades, 0)).sum(axis=1) / count
+        score = mean + (count_factor * (count - count_inhib))
+        minimum = np.fmin.reduce(grades, axis=1) if grades.shape[1] else np.full(len(order), np.nan)
+        return order, grades, mean, count, score, minimum
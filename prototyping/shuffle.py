@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+
+INDEX_COLUMNS = ["genre", "sub_genre", "artist", "album", "song"]
+# Size of the first slice scanned when looking for the next accepted track, doubled until a track is found
+SCAN_WINDOW = 64
+
+
+def encode(values):
+    """
+    Encode a column of labels as integer codes
+    :param values: array-like of hashable labels (genres, artists...)
+    :return: (codes as an int array, unique labels in order of first appearance)
+    """
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+    return codes, uniques
+
+
+def transition_matrix(transitions, genres):
+    """
+    Build a dense transition matrix aligned on the genre codes
+    matrix[to, from] is transitions[from][to], the score of playing a `to` track right after a `from` track
+    :param transitions: numeric transitions DataFrame as returned by playlist.load_transitions()
+    :param genres: genre labels, position i being the genre of code i
+    :return: float64 matrix of shape (len(genres), len(genres))
+    """
+    # Raises a KeyError on an unknown genre, just like the original row by row lookup did
+    return transitions.loc[list(genres), list(genres)].to_numpy(dtype=np.float64)
+
+
+def _first_accepted(candidates, accepted_genres, genre_codes, allowed_artists, start):
+    """
+    Position (in candidates) of the first accepted track at or after start, None if there is none
+    The scan is done by slices of growing size so finding a track close to the cursor stays cheap
+    """
+    window = SCAN_WINDOW
+    while start < candidates.size:
+        chunk = candidates[start:start + window]
+        mask = accepted_genres[genre_codes[chunk]]
+        if allowed_artists is not None:
+            mask &= allowed_artists[chunk]
+        hit = mask.argmax()
+        if mask[hit]:
+            return start + hit
+        start += window
+        window *= 2
+    return None
+
+
+def shuffle_order(genre_codes, artist_codes, matrix, chain_factor=.6, desperation_factor=1, default_threshold=8):
+    """
+    Array based implementation of the shuffle_playlist() rules
+    Tracks are walked in order, a track being accepted when the transition score from the current genre (plus the
+    chain bonus/malus) is above the threshold. The threshold is lowered by desperation_factor after a full pass
+    without any accepted track.
+    :param genre_codes: genre code of each track, indexing matrix
+    :param artist_codes: artist code of each track
+    :param matrix: transition matrix built with transition_matrix()
+    :param chain_factor: 0 < < 1 -- how much chaining the same genre again and again lowers the threshold
+    :param desperation_factor: if no track is found after looping over the playlist, how much to lower threshold
+    :param default_threshold: default threshold for the score needed to accept track as next in shuffle
+    :return: positions of the tracks in their shuffled order
+    """
+    genre_codes = np.asarray(genre_codes)
+    artist_codes = np.asarray(artist_codes)
+    size = genre_codes.size
+    if size == 0:
+        return np.empty(0, dtype=np.intp)
+
+    order = np.empty(size, dtype=np.intp)
+    order[0] = 0
+    filled = 1
+    current_genre = genre_codes[0]
+    # The artist check is always done against the first track, as in the original implementation
+    other_artist = artist_codes != artist_codes[0]
+
+    chain = 0
+    threshold = default_threshold
+    remaining = np.arange(1, size)
+
+    while remaining.size > 0:
+        accepted = []
+        cursor = 0
+        while cursor < remaining.size:
+            if threshold < 0:
+                # Desperate enough to take anything
+                found = cursor
+            else:
+                chain_scores = np.full(matrix.shape[0], chain * chain_factor, dtype=np.float64)
+                chain_scores[current_genre] = -(chain * chain_factor) / 2
+                accepted_genres = matrix[:, current_genre] + chain_scores > threshold
+                allowed_artists = other_artist if threshold == default_threshold else None
+                found = _first_accepted(remaining, accepted_genres, genre_codes, allowed_artists, cursor)
+                if found is None:
+                    break
+
+            track = remaining[found]
+            # Song accepted -- increment or reset chain + reset threshold if lowered
+            if current_genre == genre_codes[track]:
+                chain += 1
+            else:
+                chain = 0
+                current_genre = genre_codes[track]
+                threshold = default_threshold
+            order[filled] = track
+            filled += 1
+            accepted.append(found)
+            # Reset threshold if it has gone too low
+            if (default_threshold - threshold) > 2:
+                threshold = default_threshold
+            cursor = found + 1
+
+        # Removing songs that were added during the pass
+        if accepted:
+            remaining = np.delete(remaining, accepted)
+            threshold = default_threshold
+        else:
+            threshold -= desperation_factor
+
+    return order
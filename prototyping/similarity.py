@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+
+# Minimum number of tracks graded by both contributors for their correlation to be used
+MIN_OVERLAP = 20
+# Rows of the grade matrix predicted at once, bounds the temporary arrays
+BLOCK_ROWS = 65536
+GRADE_RANGE = (0., 10.)
+
+
+def _ranks(values):
+    """Average ranks (1 based) of a 1d array without NaN, ties get the mean of their ranks like pandas does"""
+    return pd.Series(values).rank(method="average").to_numpy()
+
+
+def spearman(grades, min_overlap=MIN_OVERLAP):
+    """
+    Spearman correlation of every pair of contributors, computed on the tracks graded by both (pairwise complete),
+    the same values as DataFrame.corr(method="spearman", min_periods=min_overlap)
+    :param grades: (tracks x contributors) float matrix, NaN where not graded
+    :param min_overlap: pairs with fewer common tracks get NaN
+    :return: (contributors x contributors) float64 matrix
+    """
+    graded = ~np.isnan(grades)
+    size = grades.shape[1]
+    correlations = np.full((size, size), np.nan)
+    # number of tracks graded by both, for every pair at once
+    overlap = graded.T.astype(np.int64) @ graded.astype(np.int64)
+    for first in range(size):
+        for second in range(first, size):
+            if overlap[first, second] < min_overlap:
+                continue
+            common = graded[:, first] & graded[:, second]
+            a = _ranks(grades[common, first])
+            b = _ranks(grades[common, second])
+            a -= a.mean()
+            b -= b.mean()
+            norm = np.sqrt((a * a).sum() * (b * b).sum())
+            if norm > 0:
+                correlations[first, second] = correlations[second, first] = (a * b).sum() / norm
+    return correlations
+
+
+def predict(grades, similarity, block_rows=BLOCK_ROWS):
+    """
+    Predicts the grade of every contributor for every track from the grades of the most similar contributors:
+    mean of the contributor plus the similarity weighted deviations of the others from their own mean.
+    Only positive similarities are used. Computed by blocks of rows as two matrix products.
+    :param grades: (tracks x contributors) float matrix, NaN where not graded
+    :param similarity: (contributors x contributors) matrix from spearman()
+    :param block_rows: number of rows predicted at once
+    :return: float64 matrix shaped like grades, NaN where no similar contributor graded the track
+    """
+    graded = ~np.isnan(grades)
+    means = np.nanmean(np.where(graded.any(axis=0), grades, 0), axis=0)
+    weights = np.nan_to_num(similarity)
+    weights[weights < 0] = 0
+    np.fill_diagonal(weights, 0)
+    predictions = np.empty(grades.shape)
+    for start in range(0, len(grades), block_rows):
+        block = slice(start, start + block_rows)
+        deviations = np.where(graded[block], grades[block] - means, 0)
+        # predictions[t, p] = means[p] + sum_q w[p, q] * dev[t, q] / sum_q w[p, q] (q graded t)
+        weighted = deviations @ weights.T
+        norm = graded[block].astype(np.float64) @ weights.T
+        with np.errstate(invalid="ignore", divide="ignore"):
+            predictions[block] = np.where(norm > 0, means + weighted / norm, np.nan)
+    return np.clip(predictions, *GRADE_RANGE)
+
+
+def group_means(grades, people, groups, min_count=1):
+    """
+    Mean grade of every contributor by group of tracks (by artist for instance), for all contributors at once
+    :param grades: (tracks x contributors) float matrix, NaN where not graded
+    :param people: contributor of every column
+    :param groups: group of every track, a level of the sheet index
+    :param min_count: groups with fewer grades of a contributor get NaN for that contributor
+    :return: DataFrame of the means, indexed by group
+    """
+    frame = pd.DataFrame(grades, columns=people)
+    grouped = frame.groupby(np.asarray(groups), sort=True)
+    return grouped.mean().where(grouped.count() >= min_count)
@@ -0,0 +1,131 @@
+from collections import deque, Counter
+from itertools import islice
+
+import pandas as pd
+
+from .sampling import WeightedSampler
+from .shuffle import encode, transition_matrix
+
+SINK_BATCH = 100
+
+
+def stream_playlist(pool, transitions, chain_factor=.6, desperation_factor=1, default_threshold=8, lookahead=16,
+                    track_cooldown=100, artist_cooldown=5, seed=None):
+    """
+    Endless playlist: yields the tracks of a scored pool one at a time, with the shuffle_playlist() transition rules
+    Tracks are drawn from the roulette wheel into a small lookahead buffer, the first buffered track whose transition
+    from the current genre is above the threshold is played. The threshold is lowered by desperation_factor when no
+    buffered track fits. Played tracks go back in the wheel after track_cooldown tracks, and an artist cannot be
+    played again within artist_cooldown tracks (unless the threshold had to be lowered).
+    The threshold is reset on the same acceptances as in shuffle_playlist(): a change of genre, or a threshold more
+    than 2 below default_threshold. shuffle_playlist() also resets it after every pass over the playlist, the stream
+    has no passes so a lowered threshold lasts until one of the former happens.
+    Every track costs O(lookahead + log n), and the memory stays bounded by the pool and the cooldown windows.
+    :param pool: DataFrame from score_pool(), with its "rank" column used as weight
+    :param transitions: transitions DataFrame from load_transitions()
+    :param chain_factor: 0 < < 1 -- how much chaining the same genre again and again lowers the threshold
+    :param desperation_factor: if no buffered track fits, how much to lower threshold
+    :param default_threshold: default threshold for the score needed to accept track as next in shuffle
+    :param lookahead: number of drawn tracks the next one is chosen from
+    :param track_cooldown: number of tracks played before a track can come back
+    :param artist_cooldown: number of tracks played before an artist can come back
+    :param seed: seed of the roulette wheel
+    :return: generator of the index entries (genre, sub_genre, artist, album, song) of the pool
+    """
+    entries = list(pool.index)
+    tracks = pool.index.to_frame(index=False)
+    genre_codes, genres = encode(tracks["genre"])
+    artist_codes, _ = encode(tracks["artist"])
+    matrix = transition_matrix(transitions, genres)
+    weights = pool["rank"].to_numpy(dtype=float)
+    sampler = WeightedSampler(weights, seed=seed)
+
+    buffer = []
+    played = deque()
+    recent_artists = deque()
+    artist_counts = Counter()
+    current_genre = None
+    chain = 0
+    threshold = default_threshold
+
+    while True:
+        while len(buffer) < lookahead and len(sampler) > 0:
+            buffer.append(sampler.draw())
+        if not buffer:
+            if not played:
+                # Empty pool
+                return
+            # Small pool: release the oldest played track early
+            oldest = played.popleft()
+            sampler.restore(oldest, weights[oldest])
+            continue
+
+        found = None
+        for idx, track in enumerate(buffer):
+            if current_genre is None or threshold < 0:
+                found = idx
+                break
+            if current_genre != genre_codes[track]:
+                chain_score = chain * chain_factor
+            else:
+                chain_score = -(chain * chain_factor) / 2
+            if (matrix[genre_codes[track], current_genre] + chain_score > threshold
+                    and (artist_counts[artist_codes[track]] == 0 or threshold != default_threshold)):
+                found = idx
+                break
+        if found is None:
+            threshold -= desperation_factor
+            continue
+
+        track = buffer.pop(found)
+        # Song accepted -- increment or reset chain + reset threshold if lowered
+        if current_genre == genre_codes[track]:
+            chain += 1
+        else:
+            chain = 0
+            current_genre = genre_codes[track]
+            threshold = default_threshold
+        # Reset threshold if it has gone too low
+        if (default_threshold - threshold) > 2:
+            threshold = default_threshold
+
+        played.append(track)
+        if len(played) > track_cooldown:
+            oldest = played.popleft()
+            sampler.restore(oldest, weights[oldest])
+        recent_artists.append(artist_codes[track])
+        artist_counts[artist_codes[track]] += 1
+        if len(recent_artists) > artist_cooldown:
+            artist_counts[recent_artists.popleft()] -= 1
+
+        yield entries[track]
+
+
+def drain(stream, ids, sink, tracks=None, batch_size=SINK_BATCH):
+    """
+    Send the tracks of a stream to a sink by batches, the tracks without id are skipped
+    :param stream: generator from stream_playlist()
+    :param ids: Series of the Spotify ids indexed like the pool
+    :param sink: callable receiving a list of ids, Muzik.append_tracks for instance
+    :param tracks: number of tracks to send, endless if None
+    :param batch_size: number of ids sent at once, Spotify handles 100 tracks by request
+    :return: number of ids sent
+    """
+    sent = 0
+    batch = []
+    for entry in islice(stream, tracks):
+        track_id = ids.get(entry)
+        if isinstance(track_id, pd.Series):
+            # duplicated song in the sheet
+            track_id = track_id.iloc[0]
+        if track_id is None or pd.isnull(track_id):
+            continue
+        batch.append(track_id)
+        if len(batch) == batch_size:
+            sink(batch)
+            sent += len(batch)
+            batch = []
+    if batch:
+        sink(batch)
+        sent += len(batch)
+    return sent
@@ -1,21 +1,58 @@
+class Track:
+    """
+    Lightweight view of a track of a Library: no per-instance dict, the fields are read from the library arrays
+    """
+    __slots__ = ("library", "position")
 
-class track:
-    def __init__(self, genre, subgenre, artist, album, title):
-        self.genre = genre if genre else None
-        self.subgenre = subgenre if subgenre else None
-        self.artist = artist if artist else None
-        self.album = album if album else None
-        self.title = title if title else None
+    def __init__(self, library, position):
+        self.library = library
+        self.position = position
+
+    def __field(self, column):
+        return self.library.strings.get(self.library.columns[column][self.position])
+
+    @property
+    def genre(self):
+        return self.__field("genre")
+
+    @property
+    def subgenre(self):
+        return self.__field("sub_genre")
+
+    @property
+    def artist(self):
+        return self.__field("artist")
+
+    @property
+    def album(self):
+        return self.__field("album")
+
+    @property
+    def title(self):
+        return self.__field("song")
+
+    @property
+    def ratings(self):
+        """Grades of the track by contributor column, only the graded ones"""
+        row = self.library.row(self.position)
+        return {person: grade for person, grade in zip(self.library.people, row.tolist()) if grade == grade}
+
+    def __eq__(self, other):
+        return isinstance(other, Track) and other.library is self.library and other.position == self.position
+
+    def __hash__(self):
+        return hash((id(self.library), self.position))
 
     def __str__(self) -> str:
         return "{}, {}, {}, {}, {}".format(self.genre, self.subgenre, self.artist, self.album, self.title)
-        
+
     def __repr__(self) -> str:
         return "{}".format(self.title)
-        
+
+
 if __name__ == "__main__":
-    import data
+    from prototyping.data import load_library
 
     print("Those are the listed track on Ach! Musik: ")
-    for row in data.data():
-        print(track(row[0], row[1], row[2], row[3], row[4]))
\ No newline at end of file
+    for current_track in load_library():
+        print(current_track)
@@ -1,55 +1,89 @@
+import os
+import json
 import time
 
 import pandas as pd
-import numpy as np
-from googleapiclient.discovery import build
-from google.oauth2.service_account import Credentials
+from src.util import create_cache_dir, save_cache, load_cache, cache
+from src.sheet_index import SheetIndex
+from src.sheets import SheetsClient, shared_client, parse_transitions
+from src.profiler import event, instrumented
 
-from src.util import create_cache_dir, cache
-
-CREDENTIALS_PATH_GOOGLE = 'google-credentials.json'
-SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
-SPREADSHEET = '1b75J-QTGrujSgF9r0_JPOKkcXAwzFVwpETOAyVBw8ak'
-ACH_SHEETS = "achmusik.pkl"
+ACH_SHEETS = "achmusik"
+# pickle used by the previous versions, migrated on first use
+ACH_SHEETS_LEGACY = "achmusik.pkl"
+# drive version of the spreadsheet the cached sheet was downloaded from
+ACH_VERSION = "achmusik.version"
+# parsed transitions sheet, downloaded with the sheet
+ACH_TRANSITIONS = "transitions.json"
 ACH_SHEET_NAME = "Notations"
 ACH_SHEET_ID = 0
+TRANSITIONS_SHEET_NAME = "Transitions"
 API_PREFIX = "api:"
+# maximum size (bytes) of the body of a single batchUpdate
+MAX_PAYLOAD = 2 * 1024 * 1024
 
 
 class Ach:
 
-    def __init__(self):
+    def __init__(self, service=None, drive=None, client=None,
+                 offline=False):
+        """
+        input:
+            - service : Google Sheets service, the client shared by
+                        the process is used if None
+            - drive : Google Drive service, used to check if the
+                      spreadsheet changed since the last download
+            - client : SheetsClient to use instead of the shared one
+            - offline : only read the cached sheet, google is never
+                        reached
+        """
         create_cache_dir()
+        self.offline = offline
+        if client is None:
+            client = SheetsClient(service, drive) if service is not None \
+                else shared_client()
+        self.client = client
+        # values of the api columns as they were read from the sheet
+        self.api_values = {}
+        self.transitions = None
+
+    @property
+    def requests(self):
+        """Number of requests sent to google"""
+        return self.client.requests
+
+    @property
+    def bytes_received(self):
+        """Bytes of the answers of google on the wire"""
+        return self.client.bytes_received
 
     def __check_empty_row(self):
         """Simple sanity check to see if there is rows with missing
         artist, album, song
         """
-        # Extract only the indexes and put them in a DataFrame
-        df_index = self.ach.index.to_frame(index=False)
-        # Check if there are rows with ONLY nan values
-        # and get their indexes
-        empty = df_index[
-            df_index.replace(r"^\s$", value=np.NaN, regex=True)
-                    .isnull()
-                    .all(axis=1)
-        ].index
+        # rows with ONLY empty or blank fields, precomputed by the index
+        empty = self.index.empty_rows()
         if len(empty) > 0:
-            print("WARNING some empty rows in the datasheet:")
+            event("WARNING some empty rows in the datasheet:",
+                  level="warning", rows=len(empty))
             for idx in empty:
                 # Display the indexes, need to shift the result by
                 # 2 because arrays start at 1 lol (not in Sheets)
                 # and the header doesn't count
-                print(f"Empty row at index {idx + 2}")
+                event(f"Empty row at index {idx + 2}")
 
     def __check_for_duplicates(self):
-        """Simple sanity check to see if there are duplicates in the sheet
+        """Simple sanity check to see if there are duplicates in the sheet,
+        rows only differing by case or spacing are duplicates too
         """
-        duplicates = self.ach.index[self.ach.index.duplicated()].tolist()
+        duplicates = self.index.duplicates()
         if len(duplicates) > 0:
-            print("WARNING some duplicated in the datasheet:")
-            for duplicate in duplicates:
-                print(duplicate)
+            event("WARNING some duplicated in the datasheet:",
+                  level="warning", duplicates=len(duplicates))
+            for positions in duplicates:
+                # every occurrence after the first one
+                for idx in positions[1:]:
+                    event(self.ach.index[idx])
 
     def __column_to_letter(self, idx):
         """Helper function to _translate_ an integer column index to a
@@ -69,6 +103,7 @@ class Ach:
         for idx, name in enumerate(headers):
             if API_PREFIX in name:
                 api_col[name] = {
+                    "name": name,
                     "letter": self.__column_to_letter(idx),
                     "index": idx
                 }
@@ -80,55 +115,165 @@ class Ach:
 
     def __load_from_cache(self):
         """Load the sheet from the cache"""
-        print("Reading from cache")
-        return pd.read_pickle(cache(ACH_SHEETS))
+        event("Reading from cache")
+        ach = load_cache(ACH_SHEETS, legacy=ACH_SHEETS_LEGACY)
+        if ach is None:
+            raise Exception("No cached version of the sheet")
+        return ach
+
+    def __remote_version(self):
+        """Returns the current drive version of the spreadsheet,
+        None if it cannot be read"""
+        try:
+            return self.client.version()
+        except Exception:
+            event("Cannot read the version of the sheet", level="warning")
+            return None
+
+    def __read_version(self):
+        """Returns the version of the cached sheet, None if unknown"""
+        if not os.path.exists(cache(ACH_VERSION)):
+            return None
+        with open(cache(ACH_VERSION), 'r') as handle:
+            return handle.read().strip()
+
+    def __write_version(self, version):
+        """Saves the version of the cached sheet"""
+        if version is None:
+            # unknown version, the next run will download everything
+            if os.path.exists(cache(ACH_VERSION)):
+                os.remove(cache(ACH_VERSION))
+            return
+        with open(cache(ACH_VERSION), 'w') as handle:
+            handle.write(version)
+
+    def __load_headers(self):
+        """Fetches only the header row of the sheet from the google API
+        to know where the api columns are"""
+        values = self.client.get(f"{ACH_SHEET_NAME}!1:1", refresh=True)
+        self.__get_api_columns(values[0])
 
     def __load_from_google(self):
-        """Fetches the sheet from the google API"""
-        # Load service account credentials.
-        credentials = Credentials.from_service_account_file(
-            CREDENTIALS_PATH_GOOGLE, scopes=SCOPES)
-
-        # Creates Google Sheets API (v4/latest) service.
-        self.service = build('sheets', 'v4', credentials=credentials)
-        # Gets values from Ach! Musik: Notations sheet.
-        values = self.service.spreadsheets().values()\
-            .get(spreadsheetId=SPREADSHEET, range=ACH_SHEET_NAME)\
-            .execute()['values']
-        headers = values.pop(0)
+        """Fetches the sheet and the transitions from the google API, in
+        a single round trip"""
+        # Gets values from Ach! Musik: Notations and Transitions sheets.
+        values, transitions = self.client.batch_get(
+            [ACH_SHEET_NAME, TRANSITIONS_SHEET_NAME], refresh=True)
+        # the raw values are not needed once parsed
+        self.client.forget(ACH_SHEET_NAME)
+        self.transitions = parse_transitions(transitions)
+        headers, values = values[0], values[1:]
         # Get the api column index
         self.__get_api_columns(headers)
         # Format data as pd.DataFrame
         ach = pd.DataFrame.from_records(values)
         # Remove any _additional_ columns (usually the one with)
-        # comments in them
-        if ach.shape[1] > len(headers):
-            ach.drop(ach.columns[len(headers):], axis=1, inplace=True)
+        # comments in them, google does not send the empty cells
+        # ending the rows so some columns may be missing as well
+        ach = ach.reindex(columns=range(len(headers)))
         # Apply the columns and the index
         ach.columns = headers
         ach.set_index(['genre', 'sub_genre', 'artist', 'album', 'song'],
                       inplace=True)
+        # Keep the values of the APIs missing id list columns, to only
+        # write the modified ones
+        self.api_values = {
+            name: ach[name].fillna("").tolist() for name in self.api_columns
+        }
         # Remove the APIs missing id list column
         ach = self.__drop_api_columns(ach)
         return ach
 
+    def stats(self):
+        """
+        Returns the counters of the requests sent to google
+        """
+        return self.client.stats()
+
+    def __read_transitions(self, version=None):
+        """Returns the cached transitions, None if there are none or if
+        they do not come from version (when it is known)"""
+        if not os.path.exists(cache(ACH_TRANSITIONS)):
+            return None
+        with open(cache(ACH_TRANSITIONS), 'r') as handle:
+            cached = json.load(handle)
+        if version is not None and cached["version"] != version:
+            return None
+        return pd.DataFrame(cached["values"], index=cached["index"],
+                            columns=cached["columns"], dtype=float)
+
+    def __write_transitions(self, version):
+        """Saves the parsed transitions next to the cached sheet"""
+        transitions = self.transitions.astype(object)\
+            .where(self.transitions.notnull(), None)
+        with open(cache(ACH_TRANSITIONS), 'w') as handle:
+            json.dump({
+                "version": version,
+                "index": list(transitions.index),
+                "columns": list(transitions.columns),
+                "values": transitions.values.tolist(),
+            }, handle)
+
+    def get_transitions(self):
+        """Returns the transitions sheet as numbers, transitions[from][to],
+        downloaded along with the sheet. None if neither google nor
+        the cache have them"""
+        if self.transitions is None and not hasattr(self, "ach"):
+            self.get_sheets()
+        return self.transitions
+
+    @instrumented
     def get_sheets(self):
         """Returns the sheet, checks if it can get it from Google
         directly, otherwise tries to get the one from the cache"""
         # Check if we get the sheet from Google (last updated version)
         self.updated = False
-        try:
-            self.ach = self.__load_from_google()
-            self.ach.to_pickle(cache(ACH_SHEETS))
-            self.updated = True
-        except Exception:
-            print("Error while reading from google")
+        if self.offline:
+            event("Offline, reading the cached sheet")
             self.ach = self.__load_from_cache()
+            self.transitions = self.__read_transitions()
+        else:
+            self.__download()
+        event(f"Google API : {self.requests} requests, "
+              f"{self.bytes_received} bytes received",
+              **self.stats())
+        # lookup tables of the sheet, built once per load
+        self.index = SheetIndex(self.ach.index)
         # Sanity checks
         self.__check_empty_row()
         self.__check_for_duplicates()
         return self.ach
 
+    def __download(self):
+        """Gets the sheet and the transitions from google if they
+        changed, from the cache otherwise or if google fails"""
+        try:
+            version = self.__remote_version()
+            cached = None
+            if version is not None and version == self.__read_version():
+                cached = load_cache(ACH_SHEETS, legacy=ACH_SHEETS_LEGACY)
+            if cached is not None:
+                # nothing changed since the last download
+                event("Sheet not modified, reading from cache")
+                self.__load_headers()
+                self.ach = cached
+                self.transitions = self.__read_transitions(version)
+                if self.transitions is None:
+                    self.transitions = parse_transitions(
+                        self.client.get(TRANSITIONS_SHEET_NAME))
+                    self.__write_transitions(version)
+            else:
+                self.ach = self.__load_from_google()
+                save_cache(self.ach, ACH_SHEETS)
+                self.__write_version(version)
+                self.__write_transitions(version)
+            self.updated = True
+        except Exception:
+            event("Error while reading from google", level="error")
+            self.ach = self.__load_from_cache()
+            self.transitions = self.__read_transitions()
+
+    @instrumented
     def update_missing(self, ids: pd.Series, api_name: str):
         """Update the API missing id columns list"""
         if not self.updated:
@@ -137,7 +282,7 @@ class Ach:
             raise Exception("Cannot update tracks from a not "
                             "updated version of the sheet")
         # admit that we have the last updated version of the sheet
-        print("Updating missing songs...")
+        event("Updating missing songs...")
         # get the index order from the updated version of the sheet
         ordered_index = self.ach.index
         # get the column where to write the missing list
@@ -145,33 +290,109 @@ class Ach:
         # reindex the ids list with the updated ordered index
         # and fill the empty values with none
         ids_strings = ids.reindex(ordered_index, fill_value="none")
-        payload = {
-            "majorDimension": "ROWS",
-            # needs to be a 2d array
-            "values": ids_strings.values.reshape(-1, 1).tolist()
+        new_values = ids_strings.astype(str).tolist()
+        old_values = self.__read_api_values(column)
+        # only the contiguous ranges of modified rows are written
+        requests = [
+            self.__values_request(column, first, new_values[first:last])
+            for first, last in self.__changed_ranges(old_values, new_values)
+        ]
+        modified = sum(len(r['updateCells']['rows']) for r in requests)
+        event(f"{modified} modified rows in {len(requests)} ranges",
+              rows=modified, ranges=len(requests))
+        if not requests:
+            # nothing written, the note keeps the date of the last write
+            return
+        # the note goes in the same round trip as the values
+        requests.append(self.__note_request(column))
+        version = self.__remote_version()
+        for batch in self.__split_requests(requests):
+            self.client.batch_update(batch)
+        self.api_values[column["name"]] = new_values
+        self.__follow_write(version)
+
+    def __follow_write(self, version):
+        """Saves the version our own write left the spreadsheet in, so
+        that the next run does not download it again. version is the
+        one read just before writing: if it is not the cached one,
+        someone else modified the sheet and it has to be downloaded"""
+        if version is None or version != self.__read_version():
+            return
+        version = self.__remote_version()
+        self.__write_version(version)
+        if self.transitions is not None:
+            self.__write_transitions(version)
+
+    def __read_api_values(self, column):
+        """Returns the values of an api column as they are in the sheet,
+        fetching the column only if the whole sheet was not downloaded"""
+        if column["name"] not in self.api_values:
+            range_ = (f"{ACH_SHEET_NAME}!{column['letter']}2:"
+                      f"{column['letter']}")
+            rows = self.client.get(range_, refresh=True)
+            self.client.forget(range_)
+            self.api_values[column["name"]] = [
+                row[0] if len(row) > 0 else "" for row in rows
+            ]
+        return self.api_values[column["name"]]
+
+    def __changed_ranges(self, old_values, new_values):
+        """Yields the (first, last) bounds (last excluded) of every
+        contiguous range of values that differ"""
+        # google does not send the empty cells at the end of a column
+        old_values = old_values + [""] * (len(new_values) - len(old_values))
+        first = None
+        for idx, (old, new) in enumerate(zip(old_values, new_values)):
+            if old != new and first is None:
+                first = idx
+            elif old == new and first is not None:
+                yield first, idx
+                first = None
+        if first is not None:
+            yield first, len(new_values)
+
+    def __values_request(self, column, first, values):
+        """Creates the updateCells request writing values in the column,
+        starting at the row of the first song"""
+        return {
+            "updateCells": {
+                "fields": "userEnteredValue",
+                "range": {
+                    "sheetId": ACH_SHEET_ID,
+                    # the header is the row 0
+                    "startRowIndex": first + 1,
+                    "endRowIndex": first + 1 + len(values),
+                    "startColumnIndex": column['index'],
+                    "endColumnIndex": column['index'] + 1
+                },
+                "rows": [
+                    {"values": [{"userEnteredValue": {"stringValue": value}}]}
+                    for value in values
+                ],
+            }
         }
-        # calculate the range to write the list
-        range_ = (f"{ACH_SHEET_NAME}!{column['letter']}2:"
-                  f"{column['letter']}{len(ids_strings)+1}")
-        # push the list
-        self.service.spreadsheets()\
-                    .values()\
-                    .update(spreadsheetId=SPREADSHEET,
-                            range=range_,
-                            valueInputOption="RAW",
-                            body=payload)\
-                    .execute()
-        # update the note
-        self.__update_cell_note(column)
-
-    def __update_cell_note(self, column):
-        """Update the note in the header of the missing ids columns list
-        to know when the last ids were updated"""
-        print("Updating update note...")
+
+    def __split_requests(self, requests):
+        """Splits the requests in batches whose payload stays under
+        MAX_PAYLOAD bytes"""
+        batch, size = [], 0
+        for request in requests:
+            request_size = len(json.dumps(request))
+            if batch and size + request_size > MAX_PAYLOAD:
+                yield batch
+                batch, size = [], 0
+            batch.append(request)
+            size += request_size
+        if batch:
+            yield batch
+
+    def __note_request(self, column):
+        """Creates the request updating the note in the header of the
+        missing ids columns list to know when the last ids were updated"""
         # Get the note string
         note = f"Last updated : {time.ctime()}"
         # create the payload (cmon google...)
-        notes = {
+        return {
             "updateCells": {
                 "fields": "note",
                 "range": {
@@ -192,9 +413,3 @@ class Ach:
                 ],
             }
         }
-        body = {"requests": [notes]}
-        # push the note
-        self.service.spreadsheets()\
-            .batchUpdate(spreadsheetId=SPREADSHEET,
-                         body=body)\
-            .execute()
@@ -0,0 +1,66 @@
+import hashlib
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# positions (in the old index for removed, in the new one for added and
+# unchanged) of the rows of a diff
+Diff = namedtuple("Diff", ["added", "removed", "unchanged"])
+
+
+def row_hashes(index):
+    """
+    Fingerprints the identity of every row of a (Multi)Index as an
+    uint64, rows with the same labels have the same hash
+    """
+    return pd.util.hash_pandas_object(index.to_frame(index=False),
+                                      index=False).values
+
+
+def fingerprint(index):
+    """
+    Fingerprint of the whole index (content and order) as an hex string
+    """
+    return hashlib.sha1(row_hashes(index).tobytes()).hexdigest()
+
+
+def _occurrences(hashes):
+    """
+    Mixes every hash with its occurrence number (0 for the first time
+    it appears, 1 for the second...), so that duplicated rows are
+    matched one to one
+    """
+    repeated = pd.Index(hashes).duplicated(keep=False)
+    if not repeated.any():
+        return pd.Index(hashes)
+    # occurrences are only counted for the rows that are repeated
+    subset = hashes[repeated]
+    occurrence = pd.Series(subset).groupby(subset, sort=False).cumcount()
+    keys = hashes.copy()
+    # first occurrences keep their hash, the next ones get a new key
+    keys[repeated] = np.where(
+        occurrence.values == 0, subset,
+        pd.util.hash_array(subset ^ occurrence.values.astype(np.uint64))
+    )
+    return pd.Index(keys)
+
+
+def diff_index(old, new):
+    """
+    Computes the rows added and removed between two versions of the
+    sheet index in linear time. Duplicated rows are counted: a row
+    present twice in new and once in old has one added occurrence
+    input:
+        - old : index of the previous version
+        - new : index of the current version
+    output:
+        - Diff of int arrays
+    """
+    old_keys = _occurrences(row_hashes(old))
+    new_keys = _occurrences(row_hashes(new))
+    in_old = new_keys.isin(old_keys)
+    in_new = old_keys.isin(new_keys)
+    return Diff(added=np.flatnonzero(~in_old),
+                removed=np.flatnonzero(~in_new),
+                unchanged=np.flatnonzero(in_old))
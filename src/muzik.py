@@ -4,24 +4,48 @@ import json
 import hashlib
 import os
 import base64
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import pandas as pd
 import numpy as np
-from spotipy.oauth2 import SpotifyClientCredentials, SpotifyOAuth
-import spotipy
-from spotipy import SpotifyException
 
 from src.color import Color
-from src.util import create_cache_dir, CACHE_DIR
+from src.profiler import event, instrumented
+from src.util import create_cache_dir, save_cache, load_cache, CACHE_DIR
+from src.scheduler import Scheduler, ScheduledClient
+from src.tokens import TokenManager
+from src.search_cache import SearchCache
+from src.diff import fingerprint, diff_index
+from src.sync import plan_sync, replace_calls, MAX_TRACK_PER_REQUESTS
 
-ACH_IDS = "ids.pkl"
+ACH_IDS = "ids"
+# pickle used by the previous versions, migrated on first use
+ACH_IDS_LEGACY = "ids.pkl"
+ACH_FINGERPRINT = "ids.sha1"
+SEARCH_CACHE = "searches.sqlite"
 MISSING_IDS = "missing.csv"
 CRED_PATH_SPOTIFY = "credentials-spotify.json"
 API_NAME = "Spotify"
-UNAUTHORIZED_ST_CODE = 401
-MAX_TRACK_PER_REQUESTS = 100
 MARKETS = ["FR", "US"]
+# ids by call of the tracks endpoint, the maximum of the API
+TRACKS_PAGE = 50
+# default number of tracks calls of a revalidation
+REVALIDATE_CALLS = 20
+# number of songs searched concurrently when fetching ids
+FETCH_WORKERS = 8
+# calls per second sent with each kind of credentials. Spotify counts
+# them over a rolling 30 seconds window without publishing the limit,
+# the 429 answers are retried by the scheduler so the rate only keeps
+# them rare. A burst of one call per worker lets the fetch start at
+# full speed
+SPOTIFY_RATE = 25
+SPOTIFY_BURST = FETCH_WORKERS
 PLAYLIST_NAME = "Mon Bot le DJ"
+# playlists by page of user_playlists, the maximum of the API
+PLAYLISTS_PAGE = 50
+# last pushed content of the playlist
+PLAYLIST_CACHE = "playlist.json"
 PLAYLIST_COVER = "data/playlist_cover.jpg"
 PLAYLIST_DESC = "Auto generated playlist for the"\
                 " project mon-bot-le-dj, visit"\
@@ -29,30 +53,119 @@ PLAYLIST_DESC = "Auto generated playlist for the"\
                 " for more information"
 
 
+class OfflineError(Exception):
+    """
+    Raised when Spotify is needed by a Muzik created offline
+    """
+
+
 class Muzik:
 
-    def __init__(self, public_api=False):
+    @instrumented
+    def __init__(self, public_api=False, workers=FETCH_WORKERS,
+                 offline=False, rate=SPOTIFY_RATE, burst=SPOTIFY_BURST):
+        """
+        Nothing is read nor sent here, the ids cache is read and the
+        Spotify clients are connected on first use
+        input:
+            - public_api : search the ids with the app credentials,
+                           whose rate limit is higher
+            - workers : number of songs searched concurrently
+            - offline : only the local caches are used, new songs are
+                        left out and reaching Spotify raises an
+                        OfflineError
+            - rate : calls per second sent with each credentials
+            - burst : calls sent at once before the rate applies
+        """
         create_cache_dir()
-        self.ids = self.__read_cached_ids()
-        if public_api:
-            self.__sp = self.__connect_spotify()
-        self.__sp_user = self.__connect_spotify_user()
-        self.__user_id = self.__sp_user.me()["id"]
+        self.workers = workers
+        self.public_api = public_api
+        self.offline = offline
+        # separate rate limit budgets for both kind of credentials
+        self.schedulers = {
+            "public": Scheduler("Spotify public", rate=rate, burst=burst),
+            "user": Scheduler("Spotify user", rate=rate, burst=burst),
+        }
+        self.__ids = None
+        self.__search_cache = None
+        # the search cache is first read by the fetching threads
+        self.__search_cache_lock = threading.Lock()
+        self.__sp = None
+        self.__sp_user = None
+        self.__user_id = None
+        self.__playlist_id = None
+        self.tokens = None
         self.name = API_NAME
 
+    @property
+    def ids(self):
+        """
+        Spotify ids of the known songs, read from the cache on first use
+        """
+        if self.__ids is None:
+            self.__ids = self.__read_cached_ids()
+        return self.__ids
+
+    @ids.setter
+    def ids(self, ids):
+        self.__ids = ids
+
+    @property
+    def search_cache(self):
+        """
+        Results of the previous searches, opened on first use
+        """
+        with self.__search_cache_lock:
+            if self.__search_cache is None:
+                self.__search_cache = SearchCache(CACHE_DIR + SEARCH_CACHE)
+            return self.__search_cache
+
+    @search_cache.setter
+    def search_cache(self, search_cache):
+        self.__search_cache = search_cache
+
+    def __check_online(self):
+        if self.offline:
+            raise OfflineError("Spotify cannot be reached offline")
+
+    def __user(self):
+        """
+        Spotify client of the user, connected on first use
+        """
+        if self.__sp_user is None:
+            self.__check_online()
+            self.__sp_user = self.__connect_spotify_user()
+        return self.__sp_user
+
+    def __public(self):
+        """
+        Spotify client of the public API, connected on first use
+        """
+        if self.__sp is None:
+            self.__check_online()
+            self.__sp = self.__connect_spotify()
+        return self.__sp
+
+    def __current_user(self):
+        """
+        Id of the user, asked to Spotify on first use
+        """
+        if self.__user_id is None:
+            self.__user_id = self.__user().me()["id"]
+        return self.__user_id
+
     def __read_cached_ids(self) -> pd.Series:
         """
         Read the cached already fetched ids from the cache folder
         either returns the cached pd.Series, or empty series if
         no file there
         """
-        path = CACHE_DIR + ACH_IDS
-        if os.path.exists(path):
-            print(f"Reading data from cache file {path}")
-            df = pd.read_pickle(path)
+        df = load_cache(ACH_IDS, legacy=ACH_IDS_LEGACY)
+        if df is not None:
+            event(f"Reading data from cache {CACHE_DIR + ACH_IDS}")
         else:
-            df = pd.Series()
-        print(f"Local library contains {len(df)} songs")
+            df = pd.Series(dtype=object, name="ids")
+        event(f"Local library contains {len(df)} songs")
         return df
 
     def __read_credentials(self):
@@ -71,24 +184,30 @@ class Muzik:
         access to personnal informations (including playlists :o)
         of the user
         """
+        from spotipy.oauth2 import SpotifyOAuth
         data = self.__read_credentials()
         # generate a unique random number to prevent csrf
         state = hashlib.sha256(os.urandom(1024)).hexdigest()
-        self.__user_credentials = SpotifyOAuth(
+        credentials = SpotifyOAuth(
             **data,
             state=state,
+            requests_session=self.__transport().session(),
         )
-        return self.__get_spotify_user(
-            self.__user_credentials.get_access_token(as_dict=(False))
-        )
+        self.tokens = TokenManager(credentials)
+        return self.__get_spotify_user()
 
-    def __get_spotify_user(self, token):
+    def __get_spotify_user(self):
         """
-        Returns a Spotify client authentified with the provided
-        token
+        Returns a Spotify client authentified by the token manager,
+        calls are sent through the user scheduler and retried once
+        with a new token if it was rejected
         """
-        return spotipy.Spotify(
-            auth=token
+        import spotipy
+        return ScheduledClient(
+            spotipy.Spotify(auth_manager=self.tokens,
+                            requests_session=self.__transport().session()),
+            self.schedulers["user"],
+            tokens=self.tokens
         )
 
     def __connect_spotify(self):
@@ -97,46 +216,42 @@ class Muzik:
         since the API limite rate is higher here, however not really
         useful to create playlists and stuff
         """
+        import spotipy
+        from spotipy.oauth2 import SpotifyClientCredentials
         data = self.__read_credentials()
         auth = {}
         auth["client_id"] = data["client_id"]
         auth["client_secret"] = data["client_secret"]
-        return spotipy.Spotify(auth_manager=SpotifyClientCredentials(
-            **auth
-        ))
+        transport = self.__transport()
+        return ScheduledClient(
+            spotipy.Spotify(
+                auth_manager=SpotifyClientCredentials(
+                    **auth, requests_session=transport.session()),
+                requests_session=transport.session()
+            ),
+            self.schedulers["public"]
+        )
 
-    def __refresh_token(self):
+    def __transport(self):
         """
-        Refreshes the tokenn if it has expired or not
-        and updates the sp_user Spotify Interface with
-        the new token
+        HTTP connections shared by every client of the process, the
+        pools sized to the concurrent searches
         """
-        cached = self.__user_credentials.get_cached_token()
-        refreshed = self.__user_credentials.refresh_access_token(
-            cached["refresh_token"]
-        )
-        self.__sp_user = self.__get_spotify_user(
-            refreshed["access_token"]
-        )
+        from src.transport import shared_transport
+        transport = shared_transport()
+        transport.reserve(self.workers)
+        return transport
 
-    def __update_token(self):
-        """
-        Updates the token if it has expired
-        !! may not work flawlessely (probably not in fact),
-        hard to test since the token lasts for 1 hour haha
-        """
-        # built-in function, does not work always good
-        cached = self.__user_credentials.get_cached_token()
-        if self.__user_credentials.is_token_expired(cached):
-            print("Token expired, refreshing now")
-            self.__refresh_token()
-        # handmade function just in case the one above fails
-        try:
-            _ = self.__sp_user.me()
-        except SpotifyException as e:
-            if e.http_status == UNAUTHORIZED_ST_CODE:
-                print("Token expired, refreshing now")
-                self.__refresh_token()
+    def api_stats(self):
+        """
+        Returns the calls, throttles and time spent waiting for
+        each Spotify client, and the token refreshes
+        """
+        stats = {name: scheduler.stats()
+                 for name, scheduler in self.schedulers.items()}
+        if self.tokens is not None:
+            stats["tokens"] = self.tokens.stats()
+        return stats
 
     def __search_strings(self, row):
         """
@@ -175,10 +290,38 @@ class Muzik:
                 searches.append((search, market))
         return searches
 
+    def __search_track(self, endpoint, row):
+        """
+        Tries every search string of the row until one of them
+        returns a track, the remaining fallbacks are not sent
+        Results already in the search cache are not sent either
+        input:
+            - endpoint : spotipy.Spotify client used for the searches
+            - row : pd.Series with genre, artists, songs,...
+        output:
+            - (track, search) : the track found (None if not found) and
+                                the last search string tried
+        """
+        search = None
+        for search, market in self.__search_strings(row):
+            cached, track = self.search_cache.get(search, market)
+            if not cached:
+                res = endpoint.search(search, market=market)
+                items = res['tracks']['items']
+                track = items[0] if len(items) > 0 else None
+                self.search_cache.put(search, market, track)
+            if track is not None:
+                # succeed to fetch an id
+                return track, search
+        # did not managed to find an id with all the search strings
+        return None, search
+
     def __fetch_id(self, df):
         """
         Fetches the Spotify songs id for each provided songs
         If it cannot find ids for a song, it will be set to None
+        The searches are run concurrently on `self.workers` threads,
+        results are still written (and printed) in row order
         input:
             - df : a pd.DataFrame with a random index and the
                    song specific columns (genre, artist, ...)
@@ -189,49 +332,56 @@ class Muzik:
                              columns=df.columns).dropna(how="all")
         ids = pd.Series(index=indexs,
                         dtype=str, name="ids")
-        bad_formats = []
         # chosing the endpoint
-        # by default try to take the public one, if doesn't exists
-        # (public_api = False), use the private one
-        try:
-            endpoint = self.__sp
-        except AttributeError:
-            endpoint = self.__sp_user
+        # the public one if public_api, the private one otherwise
+        endpoint = self.__public() if self.public_api else self.__user()
         # format string padding used for the debug output
         str_format = int(math.log(len(songs), 10)) + 1
-        for idx, (_, content) in enumerate(songs.iterrows()):
-            searches = self.__search_strings(content)
-            bad_format = []
-            for search, market in searches:
-                try:
-                    res = endpoint.search(search, market=market)
-                    track = res['tracks']['items'][0]
-                except IndexError:
-                    bad_format.append((search, market))
-                else:
-                    # succeed to fetch an id
-                    break
-            else:
-                # did not managed to find an id with all the search strings
-                # provided, set the id of the song to None
-                bad_formats.append(bad_format)
-                ids.iloc[idx] = None
-                print(f"{Color.FAIL}"
+        rows = (content for _, content in songs.iterrows())
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            # map yields the results in the submission order
+            results = executor.map(
+                lambda row: self.__search_track(endpoint, row), rows
+            )
+            for idx, (track, search) in enumerate(results):
+                if track is None:
+                    ids.iloc[idx] = None
+                    event(f"{Color.FAIL}"
+                          f"{idx + 1:<{str_format}}/{len(df)}"
+                          f"{Color.ENDC}"
+                          f" : {search} not in Spotify",
+                          level="warning", search=search, found=False)
+                    continue
+                album = track['album']['name']
+                name = track['name']
+                artist = track['artists'][0]['name']
+                id = track['id']
+                ids.iloc[idx] = id
+                event(f"{Color.OKGREEN}"
                       f"{idx + 1:<{str_format}}/{len(df)}"
                       f"{Color.ENDC}"
-                      f" : {search} not in Spotify")
-                continue
-            album = track['album']['name']
-            name = track['name']
-            artist = track['artists'][0]['name']
-            id = track['id']
-            ids.iloc[idx] = id
-            print(f"{Color.OKGREEN}"
-                  f"{idx + 1:<{str_format}}/{len(df)}"
-                  f"{Color.ENDC}"
-                  f" : {id} {name} {artist} {album}")
+                      f" : {id} {name} {artist} {album}",
+                      id=id, found=True)
         return ids
 
+    def __read_fingerprint(self):
+        """
+        Returns the fingerprint of the sheet used for the cached ids,
+        None if there is none
+        """
+        path = CACHE_DIR + ACH_FINGERPRINT
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r') as handle:
+            return handle.read().strip()
+
+    def __write_fingerprint(self, sheet_fingerprint):
+        """
+        Saves the fingerprint of the sheet used for the cached ids
+        """
+        with open(CACHE_DIR + ACH_FINGERPRINT, 'w') as handle:
+            handle.write(sheet_fingerprint)
+
     def __update_missing_list(self):
         """
         Create a csv file containing every tracks that were not
@@ -248,17 +398,19 @@ class Muzik:
             - playlist_id : string containing the id of the playlist
         """
         # create the playlist with name, description, visibility
-        print(f"Creating {PLAYLIST_NAME}...")
-        ret = self.__sp_user.user_playlist_create(user=self.__user_id,
-                                                  name=PLAYLIST_NAME,
-                                                  public=True,
-                                                  description=PLAYLIST_DESC)
+        event(f"Creating {PLAYLIST_NAME}...")
+        ret = self.__user().user_playlist_create(
+            user=self.__current_user(),
+            name=PLAYLIST_NAME,
+            public=True,
+            description=PLAYLIST_DESC
+        )
         playlist_id = ret["id"]
         # most important, upload the playlist image
-        print(f"Uploading playlist cover from {PLAYLIST_COVER}")
+        event(f"Uploading playlist cover from {PLAYLIST_COVER}")
         with open(PLAYLIST_COVER, "rb") as image_file:
             cover = base64.b64encode(image_file.read())
-        ret = self.__sp_user.playlist_upload_cover_image(playlist_id, cover)
+        ret = self.__user().playlist_upload_cover_image(playlist_id, cover)
         return playlist_id
 
     def __get_playlist_id(self):
@@ -267,22 +419,29 @@ class Muzik:
         if the playlist doesn't exists yet, it will create it
         and return the id of the newly created playlist
         """
-        # check if the playlist already exists
-        user_playlists = self.__sp_user.user_playlists(self.__user_id)
+        # check if the playlist already exists, going through every
+        # page of the user playlists
         playlist_id = None
-        if len(user_playlists["items"]) > 0:
+        offset = 0
+        while playlist_id is None:
+            user_playlists = self.__user().user_playlists(
+                self.__current_user(), limit=PLAYLISTS_PAGE, offset=offset)
             for user_pl in user_playlists["items"]:
                 if user_pl["name"] == PLAYLIST_NAME:
                     playlist_id = user_pl["id"]
                     break
+            if user_playlists.get("next") is None:
+                break
+            offset += len(user_playlists["items"])
         # at this point, if the playlist exists, the id is stored in
         # playlist_id, otherwise we have still a None value
         if playlist_id is None:
-            print(f"Playlist {PLAYLIST_NAME} doesn't exists yet")
+            event(f"Playlist {PLAYLIST_NAME} doesn't exists yet")
             playlist_id = self.__create_user_playlist()
-        print(f"Using playlist {PLAYLIST_NAME} : {playlist_id}")
+        event(f"Using playlist {PLAYLIST_NAME} : {playlist_id}")
         return playlist_id
 
+    @instrumented
     def update(self, ach):
         """
         updates the known list of ids with the newer version of the
@@ -290,80 +449,300 @@ class Muzik:
         input:
             - ach : raw sheet from google with multiindex
         """
-        self.__update_token()
-        # turn the index to DataFrame objects
-        new_songs = ach.index.to_frame().reset_index(drop=True)
+        sheet_fingerprint = fingerprint(ach.index)
+        if not self.ids.empty and \
+                sheet_fingerprint == self.__read_fingerprint():
+            # same sheet as the last run, nothing to do
+            event("Local list already updated")
+            return self.ids[~self.ids.isnull()]
+        if self.offline:
+            # new songs cannot be searched, only the known ones are kept
+            known = self.ids[self.ids.index.isin(ach.index)]
+            event(f"Offline, {len(ach) - len(known)} songs of the sheet "
+                  "are left out", level="warning",
+                  left_out=len(ach) - len(known))
+            return known[~known.isnull()]
         if self.ids.empty:
             # in case the cached list was empty, simply fetch the whole
             # list
+            new_songs = ach.index.to_frame().reset_index(drop=True)
             self.ids = self.__fetch_id(new_songs)
         else:
-            old_songs = self.ids.index.to_frame().reset_index(drop=True)
-            # get the list of the common values
-            common_songs = new_songs.merge(old_songs, how='inner')
-            # remove the songs that are not anymore in the cached df
-            depr = pd.concat([common_songs, old_songs]
-                             ).drop_duplicates(keep=False)
-            to_remove = pd.MultiIndex.from_frame(depr)
-            if len(to_remove) > 0:
-                self.ids = self.ids.drop(to_remove)
+            changes = diff_index(self.ids.index, ach.index)
+            # remove the songs that are not anymore in the sheet
+            if len(changes.removed) > 0:
+                keep = np.ones(len(self.ids), dtype=bool)
+                keep[changes.removed] = False
+                self.ids = self.ids[keep]
             # adds the new songs from the ach sheet
-            news = pd.concat([common_songs, new_songs]
-                             ).drop_duplicates(keep=False)
-            if len(news) > 0:
+            if len(changes.added) > 0:
+                news = ach.index[changes.added].to_frame()\
+                    .reset_index(drop=True)
                 new_ids = self.__fetch_id(news)
                 self.ids = pd.concat([self.ids, new_ids])
             else:
-                print("Local list already updated")
+                event("Local list already updated")
         # save updated list in cache
-        self.ids.to_pickle(CACHE_DIR + ACH_IDS)
+        save_cache(self.ids, ACH_IDS)
+        self.__write_fingerprint(sheet_fingerprint)
+        self.search_cache.evict()
         # also updates missing ID list
         self.__update_missing_list()
         return self.ids[~self.ids.isnull()]
 
-    def create_playlist(self, playlist):
+    def __check_ids(self, endpoint, ids):
+        """
+        Checks TRACKS_PAGE ids against the tracks endpoint, in every
+        market of MARKETS until they are playable
+        input:
+            - endpoint : spotipy.Spotify client used for the calls
+            - ids : list of at most TRACKS_PAGE ids
+        output:
+            - (relinked, invalid, calls) : {id: id of the track it is
+              relinked to}, the ids playable in no market, and the
+              number of calls sent
+        """
+        relinked = {}
+        calls = 0
+        for market in MARKETS:
+            answer = endpoint.tracks(ids, market=market)
+            calls += 1
+            unplayable = []
+            for id, track in zip(ids, answer["tracks"]):
+                if track is None or not track.get("is_playable", False):
+                    # deleted, or not available in this market
+                    unplayable.append(id)
+                elif track["id"] != id:
+                    # relinked to another version available in the
+                    # market, track["linked_from"] is the cached one
+                    relinked[id] = track["id"]
+            ids = unplayable
+            if not ids:
+                break
+        return relinked, ids, calls
+
+    @instrumented
+    def revalidate(self, budget=REVALIDATE_CALLS):
+        """
+        Checks the cached ids against the tracks endpoint, TRACKS_PAGE
+        at a time, the ids checked the longest time ago first. The
+        relinked tracks get the id Spotify relinks them to, only the
+        songs whose track is gone or playable in none of MARKETS are
+        searched again
+        input:
+            - budget : maximum number of tracks calls, every page of
+                       ids takes up to one call by market
+        output:
+            - dict with the number of ids checked and relinked, of
+              songs searched again, and the tracks calls sent
+        """
+        endpoint = self.__public() if self.public_api else self.__user()
+        known = self.ids.dropna().unique()
+        # never checked ids first, stable so that the order is kept
+        oldest = np.argsort(self.search_cache.last_checked(known),
+                            kind="stable")
+        known = known[oldest]
+        relinked, invalid, checked = {}, [], []
+        calls = 0
+        for first in range(0, len(known), TRACKS_PAGE):
+            if calls + len(MARKETS) > budget:
+                break
+            page = list(known[first:first + TRACKS_PAGE])
+            page_relinked, page_invalid, page_calls = \
+                self.__check_ids(endpoint, page)
+            relinked.update(page_relinked)
+            invalid.extend(page_invalid)
+            checked.extend(page)
+            calls += page_calls
+        event(f"Checked {len(checked)} ids in {calls} calls, "
+              f"{len(relinked)} relinked, {len(invalid)} unavailable",
+              checked=len(checked), relinked=len(relinked),
+              invalid=len(invalid), calls=calls)
+
+        values = self.ids.to_numpy(dtype=object, copy=True)
+        if relinked:
+            values = np.array([relinked.get(id, id) for id in values],
+                              dtype=object)
+            # the cached searches would bring the old ids back
+            self.search_cache.relink(relinked)
+        found = []
+        searched = 0
+        if invalid:
+            stale = self.ids.isin(invalid).to_numpy()
+            searched = int(stale.sum())
+            # the cached searches would find the same tracks again
+            self.search_cache.forget_tracks(invalid)
+            songs = self.ids.index[stale].to_frame().reset_index(drop=True)
+            found = self.__fetch_id(songs).to_numpy(dtype=object)
+            values[stale] = found
+        self.ids = pd.Series(values, index=self.ids.index,
+                             name=self.ids.name)
+        # relinked and new ids were just found playable as well
+        invalid_ids = set(invalid)
+        self.search_cache.set_checked(
+            [id for id in checked if id not in invalid_ids]
+            + list(relinked.values())
+            + [id for id in found if isinstance(id, str)]
+        )
+        save_cache(self.ids, ACH_IDS)
+        self.__update_missing_list()
+        return {"checked": len(checked), "relinked": len(relinked),
+                "searched": searched, "calls": calls}
+
+    @instrumented
+    def create_playlist(self, playlist, sync=False):
         """
         Create (or replace) a playlist containing all the songs provided
         in the playlists DataFrame
         input:
             - playlist : pd.DataFrame indexed by a MultiIndex with
                          genre, artist, song, ...
+            - sync : only send the removes, reorders and inserts
+                     needed to reach the new playlist instead of
+                     replacing the whole playlist, cheaper for big
+                     playlists that barely change
         """
-        self.__update_token()
         # get the playlist id of PLAYLIST_NAME
         playlist_id = self.__get_playlist_id()
         # get the tracks
-        print(self.ids[self.ids.index.duplicated()])
+        duplicated = self.ids[self.ids.index.duplicated()]
+        event(f"{len(duplicated)} duplicated songs in the ids",
+              duplicated=len(duplicated))
         tracks_all = self.ids[playlist.index]
         tracks_results = tracks_all.isnull().value_counts()
-        print(f"Adding {tracks_results[False]} tracks")
+        event(f"Adding {tracks_results[False]} tracks",
+              tracks=int(tracks_results[False]))
         if True in tracks_results:
             # some tracks are missing
-            print(f" Missing {tracks_results[True]} tracks")
+            event(f" Missing {tracks_results[True]} tracks",
+                  level="warning", missing=int(tracks_results[True]))
         tracks_id = tracks_all.dropna().values
-        print(f"Inserting {len(tracks_id)} songs in the playlist...")
+        if sync:
+            self.__sync_playlist(playlist_id, list(tracks_id))
+        else:
+            self.__replace_playlist(playlist_id, tracks_id)
+        event("Playlist done")
+
+    @instrumented
+    def append_tracks(self, tracks_id):
+        """
+        Appends tracks at the end of the playlist PLAYLIST_NAME,
+        used as the sink of the endless playlist
+        input:
+            - tracks_id : list of at most MAX_TRACK_PER_REQUESTS ids
+        """
+        if self.__playlist_id is None:
+            self.__playlist_id = self.__get_playlist_id()
+        event(f"Appending {len(tracks_id)} songs to the playlist...")
+        self.__user().user_playlist_add_tracks(
+            self.__current_user(),
+            playlist_id=self.__playlist_id,
+            tracks=tracks_id
+        )
+
+    def __replace_playlist(self, playlist_id, tracks_id):
+        """
+        Replaces every track of the playlist with tracks_id
+        """
+        event(f"Inserting {len(tracks_id)} songs in the playlist...")
         # spotify api "only" handles 100 tracks by requests
         # so here we split the data
         batch_size = int(len(tracks_id)/MAX_TRACK_PER_REQUESTS) + 1
         batches = np.array_split(tracks_id, batch_size)
         str_format = int(math.log(len(batches), 10)) + 1
-        print(f"{0:<{str_format}}/{len(batches)} batch inserting...")
+        event(f"{0:<{str_format}}/{len(batches)} batch inserting...")
         # the first call `replace_tracks` clear the playlist AND
         # adds the supplied tracks
-        self.__sp_user.user_playlist_replace_tracks(
-            self.__user_id,
+        res = self.__user().user_playlist_replace_tracks(
+            self.__current_user(),
             playlist_id=playlist_id,
             tracks=batches[0]
         )
         if len(batches) > 1:
             for idx, batch in enumerate(batches[1:]):
-                print(f"{idx+2:<{str_format}}/{len(batches)}"
+                event(f"{idx+2:<{str_format}}/{len(batches)}"
                       " batch inserting...")
                 # add the rest of the tracks
-                self.__sp_user.user_playlist_add_tracks(
-                    self.__user_id,
+                res = self.__user().user_playlist_add_tracks(
+                    self.__current_user(),
                     playlist_id=playlist_id,
                     tracks=batch
                 )
+        if isinstance(res, dict) and "snapshot_id" in res:
+            self.__write_playlist_cache(res["snapshot_id"], list(tracks_id))
+
+    def __write_playlist_cache(self, snapshot_id, tracks):
+        """
+        Saves the content of the playlist we pushed, with its snapshot
+        """
+        with open(CACHE_DIR + PLAYLIST_CACHE, 'w') as handle:
+            json.dump({"snapshot_id": snapshot_id, "tracks": tracks}, handle)
+
+    def __read_playlist_cache(self):
+        """
+        Returns the snapshot id and the tracks of the playlist we last
+        pushed, None if there is none
+        """
+        if not os.path.exists(CACHE_DIR + PLAYLIST_CACHE):
+            return None
+        with open(CACHE_DIR + PLAYLIST_CACHE, 'r') as handle:
+            cached = json.load(handle)
+        return cached["snapshot_id"], cached["tracks"]
 
-        print("Playlist done")
+    def __sync_playlist(self, playlist_id, tracks_id):
+        """
+        Updates the playlist with the minimal list of removes, reorders
+        and inserts to reach tracks_id, falls back to a full replace
+        when it would not take fewer calls. Only a playlist left as we
+        last pushed it is synced
+        """
+        replace = replace_calls(tracks_id)
+        cached = self.__read_playlist_cache()
+        snapshot_id = None
+        if cached is not None:
+            snapshot_id = self.__user().playlist(
+                playlist_id, fields="snapshot_id")["snapshot_id"]
+        if cached is None or cached[0] != snapshot_id:
+            # reading its tracks takes a call by MAX_TRACK_PER_REQUESTS
+            # of them, and the new ones are added by as many: never
+            # fewer calls than the replace
+            event("Playlist unknown or edited since it was pushed, "
+                  "replacing it")
+            self.__replace_playlist(playlist_id, tracks_id)
+            return
+        operations = plan_sync(cached[1], tracks_id)
+        if len(operations) >= replace:
+            # the call reading the snapshot was sent for nothing
+            event("Sync is not cheaper than a full replace, fell back "
+                  "to it (1 read call wasted)", wasted=1)
+            self.__replace_playlist(playlist_id, tracks_id)
+            return
+        event(f"Syncing the playlist with {len(operations)} calls...")
+        for operation in operations:
+            if operation[0] == "remove":
+                res = self.__user()\
+                    .user_playlist_remove_specific_occurrences_of_tracks(
+                        self.__current_user(), playlist_id,
+                        [{"uri": track, "positions": [position]}
+                         for track, position in operation[1]],
+                        snapshot_id=snapshot_id
+                    )
+            elif operation[0] == "reorder":
+                _, start, length, insert_before = operation
+                res = self.__user().user_playlist_reorder_tracks(
+                    self.__current_user(), playlist_id,
+                    range_start=start, insert_before=insert_before,
+                    range_length=length, snapshot_id=snapshot_id
+                )
+            else:
+                _, position, tracks = operation
+                res = self.__user().user_playlist_add_tracks(
+                    self.__current_user(), playlist_id, tracks,
+                    position=position
+                )
+            # every call works on the version left by the previous one
+            snapshot_id = res["snapshot_id"]
+        self.__write_playlist_cache(snapshot_id, tracks_id)
+        # the snapshot and the operations
+        saved = replace - len(operations) - 1
+        event(f"Sync saved {saved} calls", saved=saved)
@@ -0,0 +1,238 @@
+import cProfile
+import functools
+import io
+import json
+import pstats
+import re
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows, the peak memory is then only known
+    # in tracemalloc mode
+    resource = None
+
+# number of functions kept in the report in cProfile mode
+PROFILE_TOP = 30
+
+# profiler of the current run, events and stages are recorded there
+_active = None
+# terminal colors of src.color, left out of the recorded messages
+COLOR_CODES = re.compile(r"\033\[[0-9;]*m")
+
+
+def _max_rss():
+    """
+    High water mark of the resident memory of the process in bytes
+    """
+    if resource is None:
+        return None
+    # kilobytes on linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Profiler:
+    """
+    Records the stages of a run (wall time, API calls, bytes and peak
+    memory) and the events sent during the run, as a JSON report
+    """
+
+    def __init__(self, trace_memory=False, cprofile=False):
+        """
+        input:
+            - trace_memory : peak memory of every stage with
+                             tracemalloc, slows down the run
+            - cprofile : profile every function call with cProfile
+        """
+        self.trace_memory = trace_memory
+        self.cprofile = cProfile.Profile() if cprofile else None
+        self.counters = {}
+        self.stages = []
+        self.events = []
+        self.__stack = []
+        self.__start = None
+        self.__end = None
+
+    def add_counter(self, name, counter):
+        """
+        Registers a source of counters, the difference of every value
+        over a stage is added to the stage
+        input:
+            - name : name of the source, "sheets" for instance
+            - counter : callable returning a dict of numbers
+        """
+        self.counters[name] = counter
+
+    def __read_counters(self):
+        values = {}
+        for name, counter in self.counters.items():
+            for key, value in counter().items():
+                values[f"{name}.{key}"] = value
+        return values
+
+    def __now(self):
+        return time.perf_counter() - self.__start
+
+    @contextmanager
+    def run(self):
+        """
+        Activates the profiler for the whole run
+        """
+        global _active
+        previous = _active
+        _active = self
+        self.__start = time.perf_counter()
+        if self.trace_memory:
+            tracemalloc.start()
+        if self.cprofile is not None:
+            self.cprofile.enable()
+        try:
+            yield self
+        finally:
+            if self.cprofile is not None:
+                self.cprofile.disable()
+            if self.trace_memory:
+                tracemalloc.stop()
+            self.__end = self.__now()
+            _active = previous
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Records a stage of the run, stages can be nested
+        input:
+            - name : name of the stage, prefixed with the names of
+                     the enclosing stages in the report
+        """
+        path = "/".join([frame["name"] for frame in self.__stack] + [name])
+        record = {"name": path, "start": self.__now()}
+        frame = {"name": name, "peak": 0}
+        self.__stack.append(frame)
+        before = self.__read_counters()
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        wall = time.perf_counter()
+        try:
+            yield
+        except Exception as ex:
+            record["error"] = repr(ex)
+            raise
+        finally:
+            record["wall"] = time.perf_counter() - wall
+            after = self.__read_counters()
+            record["counters"] = {
+                key: after[key] - before.get(key, 0) for key in after
+                if after[key] != before.get(key, 0)
+            }
+            self.__stack.pop()
+            if self.trace_memory:
+                # the peak of a nested stage was reset by its children
+                frame["peak"] = max(frame["peak"],
+                                    tracemalloc.get_traced_memory()[1])
+                record["peak_memory"] = frame["peak"]
+                if self.__stack:
+                    parent = self.__stack[-1]
+                    parent["peak"] = max(parent["peak"], frame["peak"])
+            else:
+                record["max_rss"] = _max_rss()
+            self.stages.append(record)
+
+    def event(self, message, level="info", **fields):
+        """
+        Records an event of the current stage
+        """
+        self.events.append({
+            "time": self.__now(),
+            "stage": "/".join(frame["name"] for frame in self.__stack),
+            "level": level,
+            "message": COLOR_CODES.sub("", str(message)),
+            **fields,
+        })
+
+    def __profile(self):
+        """
+        Functions with the highest cumulative time in cProfile mode
+        """
+        stats = pstats.Stats(self.cprofile, stream=io.StringIO())
+        stats.sort_stats("cumulative")
+        functions = []
+        for function in stats.fcn_list[:PROFILE_TOP]:
+            calls, _, total, cumulative, _ = stats.stats[function]
+            filename, line, name = function
+            functions.append({
+                "function": f"{filename}:{line}({name})",
+                "calls": calls,
+                "total": total,
+                "cumulative": cumulative,
+            })
+        return functions
+
+    def report(self):
+        """
+        Machine readable report of the run
+        output:
+            - dict with the total wall time, the stages in the order
+              they ended, the events and the profile in cProfile mode
+        """
+        report = {
+            "total": self.__end if self.__end is not None
+            else self.__now(),
+            "max_rss": _max_rss(),
+            "counters": self.__read_counters(),
+            "stages": self.stages,
+            "events": self.events,
+        }
+        if self.cprofile is not None:
+            report["profile"] = self.__profile()
+        return report
+
+    def save(self, path):
+        """
+        Saves the report as JSON
+        """
+        with open(path, "w") as handle:
+            json.dump(self.report(), handle, indent=2, default=str)
+
+    def dump_profile(self, path):
+        """
+        Saves the raw cProfile stats, readable with pstats or snakeviz
+        """
+        self.cprofile.dump_stats(path)
+
+
+def stage(name):
+    """
+    Stage of the active profiler, does nothing without profiler
+    """
+    if _active is None:
+        return nullcontext()
+    return _active.stage(name)
+
+
+def event(message, level="info", **fields):
+    """
+    Progress output: printed and recorded as a structured event by
+    the active profiler
+    input:
+        - message : text printed on the console
+        - level : info, warning or error
+        - fields : values attached to the event in the report
+    """
+    print(message)
+    if _active is not None:
+        _active.event(message, level=level, **fields)
+
+
+def instrumented(method):
+    """
+    Decorator recording every call of a method as a stage named after
+    its class and name
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with stage(f"{type(self).__name__}.{method.__name__}"):
+            return method(self, *args, **kwargs)
+    return wrapper
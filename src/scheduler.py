@@ -0,0 +1,141 @@
+import functools
+import random
+import threading
+import time
+
+from src.profiler import event
+
+TOO_MANY_REQUESTS_ST_CODE = 429
+# token bucket defaults, Spotify does not publish its limits
+DEFAULT_RATE = 10
+DEFAULT_BURST = 10
+MAX_RETRIES = 5
+# first backoff delay (seconds) when no Retry-After header is sent,
+# doubled on every new attempt
+BACKOFF = 1
+# maximum random delay added to a backoff, as a fraction of it
+JITTER = .1
+
+
+class Scheduler:
+    """
+    Sends every call of an API client through a token bucket
+    and retries the throttled ones (HTTP 429), honouring the
+    Retry-After header. Thread safe, one instance per rate limit
+    budget (one per client credentials)
+    """
+
+    def __init__(self, name, rate=DEFAULT_RATE, burst=DEFAULT_BURST,
+                 max_retries=MAX_RETRIES):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.calls = 0
+        self.throttles = 0
+        self.waited = 0.
+        self.__tokens = burst
+        self.__last = time.monotonic()
+        # set by a Retry-After, every thread waits until then
+        self.__blocked_until = 0.
+        self.__lock = threading.Lock()
+
+    def __acquire(self):
+        """
+        Blocks until a token is available and takes it
+        """
+        while True:
+            with self.__lock:
+                now = time.monotonic()
+                wait = self.__blocked_until - now
+                if wait <= 0:
+                    # refill the bucket with the tokens earned since
+                    # the last call
+                    self.__tokens = min(
+                        self.burst,
+                        self.__tokens + (now - self.__last) * self.rate
+                    )
+                    self.__last = now
+                    if self.__tokens >= 1:
+                        self.__tokens -= 1
+                        self.calls += 1
+                        return
+                    wait = (1 - self.__tokens) / self.rate
+                self.waited += wait
+            time.sleep(wait)
+
+    def __retry_delay(self, exception, attempt):
+        """
+        Delay before retrying a throttled call, at least the
+        Retry-After value sent by the API
+        """
+        headers = getattr(exception, "headers", None) or {}
+        try:
+            retry_after = float(headers.get("Retry-After", 0))
+        except ValueError:
+            retry_after = 0
+        delay = max(retry_after, BACKOFF * 2 ** attempt)
+        return delay + random.uniform(0, delay * JITTER)
+
+    def call(self, function, *args, **kwargs):
+        """
+        Calls function(*args, **kwargs) once a token is available,
+        retrying up to `max_retries` times if it is throttled
+        """
+        for attempt in range(self.max_retries + 1):
+            self.__acquire()
+            try:
+                return function(*args, **kwargs)
+            except Exception as e:
+                # spotipy.SpotifyException, matched by its status so
+                # that spotipy is only imported with the clients
+                if (getattr(e, "http_status", None)
+                        != TOO_MANY_REQUESTS_ST_CODE
+                        or attempt == self.max_retries):
+                    raise
+                delay = self.__retry_delay(e, attempt)
+                with self.__lock:
+                    self.throttles += 1
+                    self.__blocked_until = max(self.__blocked_until,
+                                               time.monotonic() + delay)
+                event(f"{self.name} API throttled, "
+                      f"retrying in {delay:.1f}s",
+                      level="warning", delay=delay)
+
+    def stats(self):
+        """
+        Returns the counters of the scheduler as a dict, `waited`
+        being the time (seconds) spent waiting summed over all threads
+        """
+        return {
+            "calls": self.calls,
+            "throttles": self.throttles,
+            "waited": self.waited,
+        }
+
+
+class ScheduledClient:
+    """
+    Wraps an API client (spotipy.Spotify) so that every method
+    call goes through the provided scheduler, and is sent once more
+    with a new token if the token manager is given and the token
+    is rejected
+    """
+
+    def __init__(self, client, scheduler, tokens=None):
+        self.client = client
+        self.scheduler = scheduler
+        self.tokens = tokens
+
+    def __getattr__(self, name):
+        attribute = getattr(self.client, name)
+        if not callable(attribute):
+            return attribute
+
+        @functools.wraps(attribute)
+        def scheduled(*args, **kwargs):
+            if self.tokens is None:
+                return self.scheduler.call(attribute, *args, **kwargs)
+            return self.tokens.call(self.scheduler.call, attribute,
+                                    *args, **kwargs)
+        return scheduled
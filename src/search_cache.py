@@ -0,0 +1,167 @@
+import json
+import sqlite3
+import threading
+import time
+
+# negative results (query without any track) are searched again after
+# this delay (seconds)
+MISSING_TTL = 7 * 24 * 3600
+MAX_ENTRIES = 100000
+
+
+def normalize(search, market):
+    """
+    Returns the cache key of a search string in a market, case and
+    whitespaces are not significant
+    """
+    return f"{market}|{' '.join(search.casefold().split())}"
+
+
+class SearchCache:
+    """
+    Persistent cache of the search results, stored in a sqlite file
+    Keys are normalized search strings (artist, album, song + market)
+    so that a song keeps its cached result whatever its genre
+    Negative results expire after `missing_ttl` seconds and the least
+    recently used entries are evicted above `max_entries`
+    """
+
+    def __init__(self, path, missing_ttl=MISSING_TTL,
+                 max_entries=MAX_ENTRIES):
+        self.missing_ttl = missing_ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.__lock = threading.Lock()
+        # shared between the fetching threads, guarded by the lock
+        self.__db = sqlite3.connect(path, check_same_thread=False)
+        self.__db.execute("PRAGMA journal_mode=WAL")
+        self.__db.execute("PRAGMA synchronous=NORMAL")
+        self.__db.execute(
+            "CREATE TABLE IF NOT EXISTS searches ("
+            " key TEXT PRIMARY KEY,"
+            " track TEXT,"
+            " fetched REAL NOT NULL,"
+            " used REAL NOT NULL)"
+        )
+        # last time every cached id was checked against the tracks
+        # endpoint, see Muzik.revalidate
+        self.__db.execute(
+            "CREATE TABLE IF NOT EXISTS checks ("
+            " id TEXT PRIMARY KEY,"
+            " checked REAL NOT NULL)"
+        )
+        self.__db.commit()
+
+    def get(self, search, market):
+        """
+        Returns a tuple (found, track), found is False if the search
+        has to be sent to the API, track is None for a cached negative
+        result
+        """
+        key = normalize(search, market)
+        now = time.time()
+        with self.__lock:
+            row = self.__db.execute(
+                "SELECT track, fetched FROM searches WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (row[0] is None
+                               and now - row[1] > self.missing_ttl):
+                self.misses += 1
+                return False, None
+            self.hits += 1
+            self.__db.execute("UPDATE searches SET used = ? WHERE key = ?",
+                              (now, key))
+        return True, None if row[0] is None else json.loads(row[0])
+
+    def put(self, search, market, track):
+        """
+        Stores the result of a search, track being None if the API
+        did not return anything
+        """
+        if track is not None:
+            # only keep what is needed, the full answer is quite big
+            track = json.dumps({
+                "id": track["id"],
+                "name": track["name"],
+                "artists": [{"name": track["artists"][0]["name"]}],
+                "album": {"name": track["album"]["name"]},
+            })
+        now = time.time()
+        with self.__lock:
+            self.__db.execute(
+                "INSERT OR REPLACE INTO searches VALUES (?, ?, ?, ?)",
+                (normalize(search, market), track, now, now)
+            )
+            self.__db.commit()
+
+    def evict(self):
+        """
+        Removes the least recently used entries above `max_entries`
+        """
+        with self.__lock:
+            self.__db.execute(
+                "DELETE FROM searches WHERE key IN ("
+                " SELECT key FROM searches ORDER BY used DESC"
+                " LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self.__db.commit()
+
+    def last_checked(self, ids):
+        """
+        Returns the list of the times the ids were last checked, 0 for
+        the ids never checked
+        """
+        with self.__lock:
+            checked = dict(self.__db.execute(
+                "SELECT id, checked FROM checks").fetchall())
+        return [checked.get(id, 0.) for id in ids]
+
+    def set_checked(self, ids):
+        """
+        Records that the ids were checked now
+        """
+        now = time.time()
+        with self.__lock:
+            self.__db.executemany(
+                "INSERT OR REPLACE INTO checks VALUES (?, ?)",
+                [(id, now) for id in ids]
+            )
+            self.__db.commit()
+
+    def forget_tracks(self, ids):
+        """
+        Removes the searches that found one of the ids, and their
+        checks, so that the songs are searched again
+        """
+        with self.__lock:
+            self.__db.executemany(
+                "DELETE FROM searches WHERE json_extract(track, '$.id') = ?",
+                [(id,) for id in ids]
+            )
+            self.__db.executemany("DELETE FROM checks WHERE id = ?",
+                                  [(id,) for id in ids])
+            self.__db.commit()
+
+    def relink(self, relinked):
+        """
+        Points the searches that found a relinked id to the id it is
+        relinked to, the old id is not checked anymore
+        input:
+            - relinked : {old id: new id}
+        """
+        with self.__lock:
+            self.__db.executemany(
+                "UPDATE searches SET track = json_set(track, '$.id', ?)"
+                " WHERE json_extract(track, '$.id') = ?",
+                [(new, old) for old, new in relinked.items()]
+            )
+            self.__db.executemany("DELETE FROM checks WHERE id = ?",
+                                  [(id,) for id in relinked])
+            self.__db.commit()
+
+    def __len__(self):
+        with self.__lock:
+            return self.__db.execute(
+                "SELECT COUNT(*) FROM searches").fetchone()[0]
@@ -0,0 +1,137 @@
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+# fields of the sheet index that can be looked up
+INDEXED_FIELDS = ["genre", "sub_genre", "artist"]
+
+
+def normalize(value):
+    """
+    Normalized form of a field for duplicate detection: unicode
+    compatibility form, case folded, stripped and with single spaces
+    """
+    if not isinstance(value, str):
+        return ""
+    value = unicodedata.normalize("NFKC", value).casefold()
+    return " ".join(value.split())
+
+
+def normalized_keys(index):
+    """
+    Hashes every row of a (Multi)Index on its normalized fields, rows
+    that only differ by case or spacing get the same uint64 key
+    """
+    frame = index.to_frame(index=False)
+    frame = frame.apply(lambda column: column.map(normalize))
+    return pd.util.hash_pandas_object(frame, index=False).values
+
+
+def _buckets(values, offset=0):
+    """
+    Positions of every distinct value of an array, in increasing order
+    """
+    codes, uniques = pd.factorize(values)
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+    return {value: order[bounds[idx]:bounds[idx + 1]] + offset
+            for idx, value in enumerate(uniques)}
+
+
+class SheetIndex:
+    """
+    Lookup tables of the sheet built once per sheet load: positions of
+    the tracks by genre, sub genre and artist, and normalized keys for
+    the duplicates. Positions follow the rows of the indexed MultiIndex
+    """
+
+    def __init__(self, index):
+        """
+        input:
+            - index : MultiIndex of the sheet
+        """
+        self.names = list(index.names)
+        self.fields = [name for name in INDEXED_FIELDS
+                       if name in self.names]
+        self.size = len(index)
+        self.buckets = {
+            field: _buckets(index.get_level_values(field).values)
+            for field in self.fields
+        }
+        self.keys = normalized_keys(index)
+        self.blank = self.__blank_rows(index)
+
+    @staticmethod
+    def __blank_rows(index):
+        """
+        Boolean array of the rows with only empty (or blank) fields
+        """
+        frame = index.to_frame(index=False)
+        return frame.apply(
+            lambda column: column.map(normalize) == ""
+        ).all(axis=1).values
+
+    def __len__(self):
+        return self.size
+
+    def positions(self, **criteria):
+        """
+        Positions of the tracks matching every criterion, in sheet
+        order, for instance positions(genre="Rock", artist="10cc")
+        input:
+            - criteria : field=value for the fields of INDEXED_FIELDS
+        output:
+            - sorted int array
+        """
+        result = None
+        for field, value in criteria.items():
+            if field not in self.buckets:
+                raise KeyError(f"{field} is not indexed")
+            found = self.buckets[field].get(value, np.empty(0, dtype=int))
+            result = found if result is None \
+                else np.intersect1d(result, found, assume_unique=True)
+        if result is None:
+            return np.arange(self.size)
+        return result
+
+    def values(self, field):
+        """
+        Distinct values of a field
+        """
+        return list(self.buckets[field])
+
+    def tracks(self, data, graded_by=None, **criteria):
+        """
+        Rows of the sheet matching the criteria, for instance all the
+        tracks of an artist graded by someone
+        input:
+            - data : sheet DataFrame indexed like this index
+            - graded_by : contributor column that must not be empty
+            - criteria : see positions
+        """
+        rows = data.iloc[self.positions(**criteria)]
+        if graded_by is not None:
+            grades = rows[graded_by]
+            rows = rows[grades.notnull() & (grades.astype(str) != "")]
+        return rows
+
+    def duplicates(self):
+        """
+        Groups of positions of the rows with the same normalized fields
+        output:
+            - list of int arrays, one for every duplicated track
+        """
+        repeated = pd.Index(self.keys).duplicated(keep=False)
+        if not repeated.any():
+            return []
+        groups = _buckets(self.keys[repeated])
+        positions = np.flatnonzero(repeated)
+        return [positions[group] for group in groups.values()]
+
+    def empty_rows(self):
+        """
+        Positions of the rows without any field
+        """
+        return np.flatnonzero(self.blank)
+
@@ -0,0 +1,160 @@
+import threading
+
+import pandas as pd
+
+CREDENTIALS_PATH_GOOGLE = 'google-credentials.json'
+SCOPES = ['https://www.googleapis.com/auth/spreadsheets',
+          'https://www.googleapis.com/auth/drive.metadata.readonly']
+SPREADSHEET = '1b75J-QTGrujSgF9r0_JPOKkcXAwzFVwpETOAyVBw8ak'
+
+# client shared by everything reading the spreadsheet in the process
+_shared = None
+_shared_lock = threading.Lock()
+
+
+class SheetsClient:
+    """
+    Google Sheets and Drive services of the spreadsheet, built once,
+    with the counters of the requests sent. The values read are kept
+    for the run, a range is downloaded at most once
+    """
+
+    def __init__(self, service=None, drive=None):
+        """
+        input:
+            - service : Google Sheets service, built from the service
+                        account credentials on first use if None
+            - drive : Google Drive service, used to read the version
+                      of the spreadsheet
+        """
+        self.service = service
+        self.drive = drive
+        self.requests = 0
+        # SessionHttp of the services built by connect
+        self.__http = None
+        # values of the ranges already downloaded
+        self.values = {}
+
+    def connect(self):
+        """Creates the Google services if they were not provided"""
+        if self.service is not None:
+            return
+        # slow imports, only paid when google is reached
+        from googleapiclient.discovery import build
+        from google.oauth2.service_account import Credentials
+        from google.auth.transport.requests import AuthorizedSession, Request
+        from src.transport import shared_transport
+
+        # Load service account credentials.
+        credentials = Credentials.from_service_account_file(
+            CREDENTIALS_PATH_GOOGLE, scopes=SCOPES)
+        # both services and the token requests share the connections
+        # of the other clients
+        transport = shared_transport()
+        http = self.__http = transport.http(AuthorizedSession(
+            credentials, auth_request=Request(transport.session())))
+
+        # Creates Google Sheets API (v4/latest) service.
+        self.service = build('sheets', 'v4', http=http)
+        # Drive API is only used to read the version of the sheet
+        self.drive = build('drive', 'v3', http=http)
+
+    def execute(self, request):
+        """Executes a google API request and counts it"""
+        response = request.execute()
+        self.requests += 1
+        return response
+
+    @property
+    def bytes_received(self):
+        """Bytes of the answers on the wire, 0 with services provided
+        by the caller"""
+        return 0 if self.__http is None else self.__http.bytes_received
+
+    def stats(self):
+        """
+        Returns the counters of the requests sent to google
+        """
+        return {"requests": self.requests, "bytes": self.bytes_received}
+
+    def version(self):
+        """Returns the drive version of the spreadsheet, None without
+        drive service"""
+        self.connect()
+        if self.drive is None:
+            return None
+        return str(self.execute(
+            self.drive.files().get(fileId=SPREADSHEET, fields="version")
+        )["version"])
+
+    def batch_get(self, ranges, refresh=False):
+        """
+        Values of several ranges in a single round trip, the ranges
+        already downloaded are not asked again
+        input:
+            - ranges : list of A1 ranges, sheet names for whole sheets
+            - refresh : download every range again
+        output:
+            - list of the values (list of rows) of every range
+        """
+        missing = [range_ for range_ in dict.fromkeys(ranges)
+                   if refresh or range_ not in self.values]
+        if missing:
+            self.connect()
+            response = self.execute(
+                self.service.spreadsheets().values()
+                    .batchGet(spreadsheetId=SPREADSHEET, ranges=missing)
+            )
+            # value ranges come back in the order they were asked
+            for range_, value_range in zip(missing,
+                                           response["valueRanges"]):
+                self.values[range_] = value_range.get("values", [])
+        return [self.values[range_] for range_ in ranges]
+
+    def get(self, range_, refresh=False):
+        """Values of a single range, see batch_get"""
+        return self.batch_get([range_], refresh=refresh)[0]
+
+    def forget(self, range_):
+        """Drops the kept values of a range, to free the memory"""
+        self.values.pop(range_, None)
+
+    def batch_update(self, requests):
+        """Sends a spreadsheets.batchUpdate with the requests"""
+        self.connect()
+        return self.execute(
+            self.service.spreadsheets()
+                .batchUpdate(spreadsheetId=SPREADSHEET,
+                             body={"requests": requests})
+        )
+
+
+def shared_client():
+    """
+    Returns the client shared by the whole process, created on first
+    use
+    """
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = SheetsClient()
+        return _shared
+
+
+def parse_transitions(values):
+    """
+    Transitions sheet as numbers: transitions[from][to], indexed by
+    the genres of the first column, NaN where there is no score
+    input:
+        - values : values of the sheet, header row first
+    """
+    headers, rows = values[0], values[1:]
+    frame = pd.DataFrame(rows).reindex(columns=range(len(headers)))
+    frame.columns = headers
+    frame = frame.set_index(frame.columns[0])
+    frame.index.name = None
+    # decimal commas, anything else than a number is missing
+    return frame.apply(lambda column: pd.to_numeric(
+        column.astype(str).str.replace(",", ".", regex=False),
+        errors="coerce"
+    ))
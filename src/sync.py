@@ -0,0 +1,129 @@
+from collections import defaultdict, deque
+from bisect import bisect_left
+
+MAX_TRACK_PER_REQUESTS = 100
+
+
+def longest_increasing(values):
+    """
+    Returns the indexes of a longest strictly increasing subsequence
+    of values, in O(n log n)
+    """
+    tails, tails_idx = [], []
+    previous = [-1] * len(values)
+    for idx, value in enumerate(values):
+        pos = bisect_left(tails, value)
+        if pos > 0:
+            previous[idx] = tails_idx[pos - 1]
+        if pos == len(tails):
+            tails.append(value)
+            tails_idx.append(idx)
+        else:
+            tails[pos] = value
+            tails_idx[pos] = idx
+    result = []
+    idx = tails_idx[-1] if tails_idx else -1
+    while idx != -1:
+        result.append(idx)
+        idx = previous[idx]
+    return result[::-1]
+
+
+def _batches(items, size=MAX_TRACK_PER_REQUESTS):
+    for first in range(0, len(items), size):
+        yield items[first:first + size]
+
+
+def plan_sync(current, target):
+    """
+    Computes the operations turning the current playlist into the
+    target one, as a list of tuples:
+        - ("remove", [(track id, position), ...]) positions are
+          relative to the playlist before this operation, at most
+          MAX_TRACK_PER_REQUESTS of them
+        - ("reorder", range_start, range_length, insert_before)
+        - ("add", position, [track id, ...]) at most
+          MAX_TRACK_PER_REQUESTS tracks
+    Tracks already in the playlist are kept when they are part of the
+    longest sequence already in the right order, the other ones are
+    moved by blocks, the missing ones are inserted by contiguous runs
+    input:
+        - current : list of the track ids of the playlist
+        - target : list of the track ids wanted, in order
+    """
+    # match every current track to a position of the target,
+    # duplicates being matched in order
+    wanted = defaultdict(deque)
+    for position, track in enumerate(target):
+        wanted[track].append(position)
+    kept, removed = [], []
+    for position, track in enumerate(current):
+        if track is not None and wanted[track]:
+            kept.append(wanted[track].popleft())
+        else:
+            removed.append((track, position))
+
+    operations = []
+    # removing from the end, so that the positions of the next
+    # batches are still valid
+    for batch in _batches(removed[::-1]):
+        operations.append(("remove", batch))
+
+    # kept is now the playlist, as target positions
+    placed = [False] * len(kept)
+    for idx in longest_increasing(kept):
+        placed[idx] = True
+    # moved tracks, by ascending target position
+    moving = sorted((kept[idx], idx) for idx in range(len(kept))
+                    if not placed[idx])
+    done = set()
+    for target_position, _ in moving:
+        if target_position in done:
+            continue
+        start = kept.index(target_position)
+        # extend the block with the next tracks if they are already
+        # following each other
+        length = 1
+        while (start + length < len(kept)
+               and not placed[start + length]
+               and kept[start + length] == target_position + length):
+            length += 1
+        # insert before the first placed track that has to come after
+        insert_before = len(kept)
+        for idx, position in enumerate(kept):
+            if placed[idx] and position > target_position:
+                insert_before = idx
+                break
+        block = kept[start:start + length]
+        done.update(block)
+        if insert_before != start and insert_before != start + length:
+            operations.append(("reorder", start, length, insert_before))
+        del kept[start:start + length]
+        del placed[start:start + length]
+        if insert_before > start:
+            insert_before -= length
+        kept[insert_before:insert_before] = block
+        placed[insert_before:insert_before] = [True] * length
+
+    # insert the new tracks, by runs of contiguous target positions
+    missing = sorted(set(range(len(target))) - set(kept))
+    runs = []
+    for position in missing:
+        if runs and runs[-1][-1] == position - 1:
+            runs[-1].append(position)
+        else:
+            runs.append([position])
+    for run in runs:
+        for batch in _batches(run):
+            operations.append(("add", batch[0],
+                               [target[position] for position in batch]))
+    return operations
+
+
+def replace_calls(target):
+    """
+    Number of calls needed to replace the whole playlist with target
+    (one replace and the adds of the next batches)
+    """
+    return len(target) // MAX_TRACK_PER_REQUESTS + 1
+
@@ -0,0 +1,155 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # not available on Windows, the token is then only shared
+    # between the threads of a process
+    fcntl = None
+
+from src.profiler import event
+from src.util import cache
+
+UNAUTHORIZED_ST_CODE = 401
+TOKEN_CACHE = "spotify-token.json"
+# a token expiring in less than that (seconds) is refreshed
+REFRESH_MARGIN = 60
+
+
+@contextmanager
+def file_lock(path):
+    """
+    Exclusive lock on path between processes, created if needed
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(path, "a") as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+class TokenManager:
+    """
+    Access token of the Spotify user, refreshed ahead of its expiry
+    from the time it was delivered, without any call to check it.
+    The token is shared by the threads of the process and, through a
+    file locked cache, by the other processes: the first one to see
+    it expiring refreshes it, the others read the refreshed one.
+    Can be used as the auth_manager of a spotipy.Spotify client
+    """
+
+    def __init__(self, credentials, path=None, margin=REFRESH_MARGIN):
+        """
+        input:
+            - credentials : spotipy.oauth2.SpotifyOAuth of the user
+            - path : json file of the shared token, in the cache
+                     folder by default
+            - margin : seconds before the expiry the token is
+                       refreshed
+        """
+        self.credentials = credentials
+        self.path = path if path is not None else cache(TOKEN_CACHE)
+        self.margin = margin
+        self.refreshes = 0
+        self.retries = 0
+        self.__token = None
+        self.__lock = threading.Lock()
+
+    def __expiring(self, token):
+        return token is None or \
+            token["expires_at"] - time.time() < self.margin
+
+    def __read(self):
+        """Token of the shared cache, None if there is none"""
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, 'r') as handle:
+            return json.load(handle)
+
+    def __write(self, token):
+        """Saves the token in the shared cache, readers never see a
+        partially written file"""
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        with open(temporary, 'w') as handle:
+            json.dump(token, handle)
+        os.replace(temporary, self.path)
+
+    def __refresh(self, token):
+        """Returns a new token, the first one is asked to spotipy (its
+        own cache, or the authorization flow on the very first run)"""
+        if token is None:
+            token = self.credentials.get_cached_token()
+            if token is None:
+                token = self.credentials.get_access_token(as_dict=True)
+            if not self.__expiring(token):
+                return token
+        event("Token expiring, refreshing now")
+        refreshed = self.credentials.refresh_access_token(
+            token["refresh_token"])
+        # Spotify may not send a new refresh token
+        refreshed.setdefault("refresh_token", token["refresh_token"])
+        self.refreshes += 1
+        return refreshed
+
+    def __update(self, rejected=None):
+        """Replaces the token of the process by the shared one,
+        refreshed if it expires soon or if it is the rejected one"""
+        with file_lock(f"{self.path}.lock"):
+            token = self.__read()
+            if self.__expiring(token) or \
+                    token["access_token"] == rejected:
+                token = self.__refresh(
+                    token if token is not None else self.__token)
+                self.__write(token)
+            self.__token = token
+
+    def get_access_token(self, as_dict=False):
+        """
+        Returns the current access token, refreshed if it expires
+        soon. Same signature as the spotipy auth managers
+        """
+        with self.__lock:
+            if self.__expiring(self.__token):
+                self.__update()
+            return self.__token if as_dict else self.__token["access_token"]
+
+    def invalidate(self, access_token):
+        """
+        Refreshes the token after Spotify rejected access_token, unless
+        another thread or process already replaced it
+        """
+        with self.__lock:
+            if self.__token is None or \
+                    self.__token["access_token"] == access_token:
+                self.__update(rejected=access_token)
+
+    def call(self, function, *args, **kwargs):
+        """
+        Calls function(*args, **kwargs), once more with a new token if
+        the current one is rejected (HTTP 401)
+        """
+        access_token = self.get_access_token()
+        try:
+            return function(*args, **kwargs)
+        except Exception as e:
+            # spotipy.SpotifyException, see Scheduler.call
+            if getattr(e, "http_status", None) != UNAUTHORIZED_ST_CODE:
+                raise
+            event("Token rejected, refreshing now", level="warning")
+            self.retries += 1
+            self.invalidate(access_token)
+            return function(*args, **kwargs)
+
+    def stats(self):
+        """
+        Returns the counters of the token manager
+        """
+        return {"refreshes": self.refreshes, "retries": self.retries}
@@ -0,0 +1,227 @@
+import threading
+from urllib.parse import urlsplit
+
+import httplib2
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# connections kept open by host, the fetch of the ids is the most
+# concurrent use, see Transport.reserve
+POOL_MAXSIZE = 10
+# hosts with a pool of their own: spotify api and accounts, sheets,
+# drive (googleapis), oauth2
+POOL_CONNECTIONS = 8
+# attempts to open a connection before giving up, the answers
+# themselves are retried by the callers (Scheduler, TokenManager)
+CONNECT_RETRIES = 3
+# urllib3 would retry the 429 with a Retry-After header on its own,
+# they have to reach Scheduler.call
+RETRY = Retry(total=CONNECT_RETRIES, read=False,
+              respect_retry_after_header=False)
+# (connect, read) timeouts in seconds by host, for the requests sent
+# without a timeout
+TIMEOUTS = {
+    "api.spotify.com": (3.05, 20),
+    "accounts.spotify.com": (3.05, 10),
+    "sheets.googleapis.com": (3.05, 60),
+    "www.googleapis.com": (3.05, 30),
+    "oauth2.googleapis.com": (3.05, 10),
+}
+DEFAULT_TIMEOUT = (3.05, 30)
+
+# transport shared by every client of the process
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def response_size(response, stream=False):
+    """
+    Bytes of an answer on the wire: its Content-Length (compressed
+    size when gzipped), the decoded content when it is chunked. The
+    streamed answers without Content-Length are not read, and count 0
+    """
+    length = response.headers.get("Content-Length", "")
+    if length.isdigit():
+        return int(length)
+    return 0 if stream else len(response.content)
+
+
+class PooledAdapter(HTTPAdapter):
+    """
+    requests adapter counting its requests and connections, whose pools
+    outlive the sessions it is mounted on
+    """
+
+    def __init__(self, timeouts, **kwargs):
+        """
+        input:
+            - timeouts : {host: (connect, read)}
+            - kwargs : arguments of HTTPAdapter
+        """
+        self.timeouts = timeouts
+        self.requests = 0
+        self.bytes_received = 0
+        # connections of the pools already closed
+        self.retired = 0
+        self.lock = threading.Lock()
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        # called on the pools evicted or cleared
+        self.poolmanager.pools.dispose_func = self.__retire
+
+    def __retire(self, pool):
+        with self.lock:
+            self.retired += pool.num_connections
+        pool.close()
+
+    def send(self, request, timeout=None, **kwargs):
+        host = urlsplit(request.url).hostname
+        # the timeout of the caller wins over the one of the host
+        timeout = timeout or self.timeouts.get(host, DEFAULT_TIMEOUT)
+        response = super().send(request, timeout=timeout, **kwargs)
+        size = response_size(response, kwargs.get("stream", False))
+        with self.lock:
+            self.requests += 1
+            self.bytes_received += size
+        return response
+
+    def close(self):
+        # spotipy closes its sessions when they are garbage collected,
+        # the shared pools stay open
+        pass
+
+    def shutdown(self):
+        """
+        Closes every pooled connection
+        """
+        super().close()
+
+
+class Transport:
+    """
+    HTTP connections shared by every API client: one requests adapter
+    keeping the connections alive in a pool per host, mounted on the
+    session of every client. Requests sent without a timeout get the
+    one of their host
+    """
+
+    def __init__(self, pool_maxsize=POOL_MAXSIZE,
+                 pool_connections=POOL_CONNECTIONS, timeouts=None):
+        """
+        input:
+            - pool_maxsize : connections kept open by host
+            - pool_connections : number of hosts with a pool
+            - timeouts : {host: (connect, read)}, TIMEOUTS if None
+        """
+        self.pool_maxsize = pool_maxsize
+        self.pool_connections = pool_connections
+        self.adapter = PooledAdapter(
+            TIMEOUTS if timeouts is None else timeouts,
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=RETRY,
+        )
+        self.__lock = threading.Lock()
+
+    def reserve(self, connections):
+        """
+        Grows the pools to keep at least `connections` connections by
+        host, the number of threads sending requests at once
+        """
+        with self.__lock:
+            if connections <= self.pool_maxsize:
+                return
+            self.pool_maxsize = connections
+            # the open connections are closed, and counted, by clear
+            self.adapter.poolmanager.clear()
+            self.adapter.init_poolmanager(self.pool_connections,
+                                          connections)
+
+    def session(self, session=None):
+        """
+        Mounts the shared pools on a requests session
+        input:
+            - session : requests.Session (or subclass) of a client, a
+                        new one if None
+        output:
+            - the session
+        """
+        if session is None:
+            session = requests.Session()
+        session.mount("https://", self.adapter)
+        session.mount("http://", self.adapter)
+        return session
+
+    def http(self, session=None):
+        """
+        httplib2.Http stand-in sending the requests of a googleapiclient
+        service through the shared pools, see session
+        """
+        return SessionHttp(self.session(session))
+
+    def stats(self):
+        """
+        Returns the requests sent, the connections opened, the
+        requests sent on an already open connection and the bytes of
+        the answers
+        """
+        with self.adapter.lock:
+            connections = self.adapter.retired
+            sent = self.adapter.requests
+            received = self.adapter.bytes_received
+        for key in self.adapter.poolmanager.pools.keys():
+            pool = self.adapter.poolmanager.pools.get(key)
+            if pool is not None:
+                connections += pool.num_connections
+        return {
+            "requests": sent,
+            "connections": connections,
+            "reused": sent - connections,
+            "bytes": received,
+        }
+
+    def close(self):
+        """
+        Closes every pooled connection
+        """
+        self.adapter.shutdown()
+
+
+class SessionHttp:
+    """
+    Minimal httplib2.Http interface over a requests session, used as
+    the `http` of googleapiclient.discovery.build, counting the bytes
+    of its own answers
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self.bytes_received = 0
+
+    def request(self, uri, method="GET", body=None, headers=None,
+                redirections=None, connection_type=None):
+        response = self.session.request(method, uri, data=body,
+                                        headers=headers)
+        self.bytes_received += response_size(response)
+        info = {key.lower(): value
+                for key, value in response.headers.items()
+                # the content is already decoded
+                if key.lower() not in ("content-encoding",
+                                       "content-length")}
+        info["status"] = str(response.status_code)
+        return httplib2.Response(info), response.content
+
+
+def shared_transport():
+    """
+    Returns the transport shared by the whole process, created on
+    first use
+    """
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = Transport()
+        return _shared
@@ -1,7 +1,22 @@
-
 import os
+import json
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from src.profiler import event
 
 CACHE_DIR = "cache/"
+# bump when the layout of the cached arrays changes
+CACHE_VERSION = 2
+CACHE_SCHEMA = "schema.json"
+
+
+class CacheError(Exception):
+    """
+    Raised when a cached object does not match the expected format
+    """
 
 
 def create_cache_dir():
@@ -14,3 +29,175 @@ def create_cache_dir():
 
 def cache(file_name):
     return CACHE_DIR + file_name
+
+
+def _encode(frame):
+    """
+    Int32 codes and string table of every index level then of every
+    column, -1 being a missing value. The codes of the index levels and
+    of the categorical columns are reused, only the plain columns are
+    factorized. The table is the UTF-8 of its strings, each followed
+    by a NUL
+    """
+    index = frame.index
+    if isinstance(index, pd.MultiIndex):
+        arrays = [(index.codes[idx], index.levels[idx])
+                  for idx in range(index.nlevels)]
+    else:
+        arrays = [pd.factorize(np.asarray(index, dtype=object))]
+    for _, column in frame.items():
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            arrays.append((column.cat.codes, column.cat.categories))
+        else:
+            arrays.append(pd.factorize(np.asarray(column, dtype=object)))
+    encoded = []
+    for codes, table in arrays:
+        blob = "\0".join([*map(str, table), ""]).encode()
+        if blob.count(b"\0") != len(table):
+            raise CacheError("NUL characters cannot be cached")
+        encoded.append((np.asarray(codes, dtype=np.int32), blob))
+    return encoded
+
+
+def _write(target, write):
+    """Writes a file with write(handle), renamed once complete so that
+    a crash never leaves a half written file"""
+    with open(target + ".tmp", "wb") as handle:
+        write(handle)
+    os.replace(target + ".tmp", target)
+
+
+def _save_column(path, codes, table):
+    """
+    Saves the codes and the string table of a column in files named
+    after their content, already written columns are not written again
+    output:
+        - the digest naming the files of the column
+    """
+    digest = hashlib.sha1(codes.tobytes())
+    digest.update(table)
+    digest = digest.hexdigest()
+    target = os.path.join(path, digest)
+    if not os.path.exists(target + ".codes.npy"):
+        _write(target + ".codes.npy", lambda handle: np.save(handle, codes))
+    if not os.path.exists(target + ".table"):
+        _write(target + ".table", lambda handle: handle.write(table))
+    return digest
+
+
+def _load_column(path, name, version=CACHE_VERSION):
+    """
+    Loads the memory mapped codes and the string table of a column
+    the table is returned as an object array with None appended,
+    so that indexing it with -1 gives a missing value
+    """
+    codes = np.load(os.path.join(path, f"{name}.codes.npy"), mmap_mode="r")
+    if version == 1:
+        # fixed width numpy strings
+        table = np.load(os.path.join(path, f"{name}.table.npy"))
+        return codes, np.append(table.astype(object), None)
+    with open(os.path.join(path, f"{name}.table"), "rb") as handle:
+        # a single split decodes the whole table
+        table = handle.read().decode().split("\0")
+    # the last item is the empty string after the last NUL
+    table[-1] = None
+    return codes, np.array(table, dtype=object)
+
+
+def save_cache(data, name):
+    """
+    Saves a pd.DataFrame or pd.Series of strings in the cache folder
+    as a versioned set of numpy arrays (one string table and one codes
+    array by index level and column). The arrays are named after their
+    content so that only the columns which changed since the last save
+    are written
+    input:
+        - data : pd.DataFrame or pd.Series to save
+        - name : name of the folder in the cache folder
+    """
+    path = cache(name)
+    kind = "series" if isinstance(data, pd.Series) else "frame"
+    frame = data.to_frame() if kind == "series" else data
+    os.makedirs(path, exist_ok=True)
+    digests = [_save_column(path, codes, table)
+               for codes, table in _encode(frame)]
+    levels = digests[:frame.index.nlevels]
+    columns = digests[frame.index.nlevels:]
+    schema = {
+        "version": CACHE_VERSION,
+        "kind": kind,
+        "index": list(frame.index.names),
+        "columns": list(frame.columns),
+        "files": {"index": levels, "columns": columns},
+    }
+    # the new schema replaces the previous one at once, the files it
+    # does not use anymore are removed afterwards
+    tmp = os.path.join(path, CACHE_SCHEMA + ".tmp")
+    with open(tmp, 'w') as handle:
+        json.dump(schema, handle)
+    os.replace(tmp, os.path.join(path, CACHE_SCHEMA))
+    used = {f"{digest}{suffix}" for digest in levels + columns
+            for suffix in (".codes.npy", ".table")}
+    for file_name in os.listdir(path):
+        if file_name != CACHE_SCHEMA and file_name not in used:
+            os.remove(os.path.join(path, file_name))
+
+
+def load_cache(name, legacy=None):
+    """
+    Loads an object saved with `save_cache`
+    If it doesn't exist yet but the old pickle `legacy` does, the
+    pickle is migrated to the new format
+    input:
+        - name : name of the folder in the cache folder
+        - legacy : name of the old pickle file in the cache folder
+    output:
+        - the pd.DataFrame (with categorical columns) or pd.Series,
+          None if nothing is cached
+    """
+    path = cache(name)
+    if not os.path.exists(os.path.join(path, CACHE_SCHEMA)):
+        if legacy is None or not os.path.exists(cache(legacy)):
+            return None
+        event(f"Migrating {cache(legacy)} to {path}")
+        save_cache(pd.read_pickle(cache(legacy)), name)
+        os.remove(cache(legacy))
+    with open(os.path.join(path, CACHE_SCHEMA), 'r') as handle:
+        schema = json.load(handle)
+    if schema.get("version") not in (1, CACHE_VERSION):
+        raise CacheError(f"{path} has version {schema.get('version')},"
+                         f" expected {CACHE_VERSION}")
+    if schema.get("kind") not in ("series", "frame"):
+        raise CacheError(f"{path} has an unknown kind {schema.get('kind')}")
+    # the first version named the files after the position of the
+    # columns, it is rewritten on the next save
+    files = schema.get("files", {
+        "index": [f"index{idx}" for idx in range(len(schema["index"]))],
+        "columns": [f"column{idx}"
+                    for idx in range(len(schema["columns"]))],
+    })
+    # the index is built from the codes directly, no need to hash
+    # every label again
+    levels, codes = [], []
+    for file_name in files["index"]:
+        level_codes, table = _load_column(path, file_name,
+                                          schema["version"])
+        levels.append(table[:-1])
+        codes.append(level_codes)
+    if len(levels) == 1:
+        index = pd.Index(table[codes[0]], name=schema["index"][0])
+    else:
+        index = pd.MultiIndex(levels=levels, codes=codes,
+                              names=schema["index"],
+                              verify_integrity=False)
+    columns = {}
+    for column, file_name in zip(schema["columns"], files["columns"]):
+        column_codes, table = _load_column(path, file_name,
+                                           schema["version"])
+        if schema["kind"] == "series":
+            return pd.Series(table[column_codes], index=index, name=column)
+        # categorical columns reuse the codes, the strings are only
+        # built when (and if) a column gets converted
+        columns[column] = pd.Categorical.from_codes(column_codes,
+                                                    categories=table[:-1])
+    return pd.DataFrame(columns, index=index, columns=schema["columns"])
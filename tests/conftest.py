@@ -0,0 +1,14 @@
+import pytest
+
+from src import util
+from src import muzik as muzik_module
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    """Cache folder of the run in a temporary folder"""
+    path = f"{tmp_path}/cache/"
+    monkeypatch.setattr(util, "CACHE_DIR", path)
+    monkeypatch.setattr(muzik_module, "CACHE_DIR", path)
+    util.create_cache_dir()
+    return path
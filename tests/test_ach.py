@@ -0,0 +1,108 @@
+import pandas as pd
+import pytest
+
+from src.ach import Ach, ACH_SHEET_NAME, TRANSITIONS_SHEET_NAME
+from benchmarks.fakes import FakeSheets
+
+HEADER = ["genre", "sub_genre", "artist", "album", "song", "Qu",
+          "api:Spotify"]
+SONGS = 50
+
+
+@pytest.fixture
+def service():
+    notations = [HEADER] + [
+        ["Rock", "Indie", f"Artist {idx}", "N/A", f"Song {idx}", "8", ""]
+        for idx in range(SONGS)
+    ]
+    transitions = [["", "Rock"], ["Rock", "8,5"]]
+    return FakeSheets({ACH_SHEET_NAME: notations,
+                       TRANSITIONS_SHEET_NAME: transitions}, latency=0)
+
+
+def run(service, ids=None):
+    """get_sheets, and update_missing with ids (a function of the
+    sheet) like main_playlist, returns the Ach"""
+    ach = Ach(service=service, drive=service)
+    sheet = ach.get_sheets()
+    if ids is not None:
+        ach.update_missing(ids(sheet), "Spotify")
+    return ach
+
+
+def same_ids(sheet):
+    return pd.Series([f"{idx:022d}" for idx in range(len(sheet))],
+                     index=sheet.index)
+
+
+def new_ids(number):
+    """ids of the number-th run, every one of them modified"""
+    return lambda sheet: same_ids(sheet).str.replace("00", f"{number:02d}",
+                                                     n=1)
+
+
+def test_unchanged_sheet_not_downloaded(cache_dir, service):
+    cold = run(service)
+    assert cold.get_transitions().loc["Rock", "Rock"] == 8.5
+    cold_bytes = service.bytes_sent
+    warm = run(service)
+    # the version and the header row only
+    assert warm.requests == 2
+    assert service.bytes_sent - cold_bytes < cold_bytes / 4
+    # the cached columns are categorical
+    pd.testing.assert_frame_equal(warm.ach.astype(object),
+                                  cold.ach.astype(object))
+    assert warm.get_transitions().equals(cold.get_transitions())
+
+
+def test_modified_sheet_downloaded(cache_dir, service):
+    run(service)
+    service.sheets[ACH_SHEET_NAME][1][5] = "3"
+    service.version += 1
+    ach = run(service)
+    assert ach.ach["Qu"].iloc[0] == "3"
+
+
+def test_own_write_does_not_invalidate_the_cache(cache_dir, service):
+    run(service, same_ids)
+    column = [row[6] for row in service.sheets[ACH_SHEET_NAME][1:]]
+    assert column == [f"{idx:022d}" for idx in range(SONGS)]
+    for number in range(1, 3):
+        ach = run(service, new_ids(number))
+        # version, header row and api column, version, write, version
+        assert ach.requests == 6
+
+
+def test_write_of_someone_else_downloads_again(cache_dir, service):
+    ach = Ach(service=service, drive=service)
+    sheet = ach.get_sheets()
+    # modified while the ids were fetched
+    service.sheets[ACH_SHEET_NAME][1][5] = "3"
+    service.version += 1
+    ach.update_missing(same_ids(sheet), "Spotify")
+    assert run(service).ach["Qu"].iloc[0] == "3"
+
+
+def test_nothing_written_without_modified_ids(cache_dir, service):
+    run(service, same_ids)
+    assert len(service.updates) == 1
+    ach = run(service, same_ids)
+    assert len(service.updates) == 1
+    # the version and the header row, then the api column
+    assert ach.requests == 3
+
+
+def test_only_modified_ranges_written(cache_dir, service):
+    run(service, same_ids)
+
+    def modified_ids(sheet):
+        ids = same_ids(sheet)
+        ids.iloc[[3, 4, 10]] = "modified"
+        return ids
+
+    run(service, modified_ids)
+    requests = service.updates[-1]["requests"]
+    assert [(request["updateCells"]["range"]["startRowIndex"],
+             len(request["updateCells"]["rows"]))
+            for request in requests[:-1]] == [(4, 2), (11, 1)]
+    assert requests[-1]["updateCells"]["fields"] == "note"
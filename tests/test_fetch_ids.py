@@ -0,0 +1,98 @@
+import time
+
+import pandas as pd
+import pytest
+
+from src import muzik as muzik_module
+from src.muzik import Muzik, MARKETS
+from src.search_cache import SearchCache
+from benchmarks.fakes import FakeSpotify
+
+
+class SlowFirstSpotify(FakeSpotify):
+    """FakeSpotify answering the first songs last, so that the threads
+    finish out of order"""
+
+    def __init__(self, delays, **kwargs):
+        super().__init__(latency=0, **kwargs)
+        self.delays = delays
+        self.queries = []
+
+    def search(self, q, market=None, **kwargs):
+        self.queries.append((q, market))
+        time.sleep(next((delay for song, delay in self.delays.items()
+                         if song in q), 0))
+        return super().search(q, market=market, **kwargs)
+
+
+def songs_frame(count):
+    return pd.DataFrame({
+        "genre": ["Rock"] * count,
+        "sub_genre": ["Indie"] * count,
+        "artist": [f"Artist {idx}" for idx in range(count)],
+        "album": ["N/A"] * count,
+        "song": [f"Song {idx}" for idx in range(count)],
+    })
+
+
+def fetch(endpoint, songs, workers):
+    muzik = Muzik(workers=workers)
+    muzik._Muzik__sp_user = endpoint
+    muzik.search_cache = SearchCache(":memory:")
+    return muzik._Muzik__fetch_id(songs)
+
+
+@pytest.mark.parametrize("workers", [1, 8])
+def test_results_keep_the_row_order(cache_dir, workers):
+    songs = songs_frame(16)
+    delays = {f"Song {idx}\"": .02 * (4 - idx) for idx in range(4)}
+    endpoint = SlowFirstSpotify(delays, missing=("Song 5\"",))
+    ids = fetch(endpoint, songs, workers)
+
+    assert list(ids.index) == list(pd.MultiIndex.from_frame(songs))
+    for idx, id in enumerate(ids):
+        if idx == 5:
+            assert id is None
+        else:
+            query = (f"artist:\"Artist {idx}\" track:\"Song {idx}\"",
+                     MARKETS[0])
+            assert id == f"{abs(hash(query)):022d}"[:22]
+
+
+def test_fallbacks_cancelled_once_found(cache_dir):
+    songs = songs_frame(10)
+    songs.loc[3, "song"] = "Don't Song 3"
+    missing = ("Song 2\"", "Song 3\"")
+    endpoint = SlowFirstSpotify({}, missing=missing)
+    ids = fetch(endpoint, songs, workers=4)
+
+    assert ids.isnull().sum() == 2
+    # a found song is only searched once, a missing one in every
+    # market, twice with an apostrophe
+    assert endpoint.calls == 8 + len(MARKETS) + 2 * len(MARKETS)
+    searched = [q for q, _ in endpoint.queries]
+    assert sum("Song 3" in q for q in searched) == 2 * len(MARKETS)
+
+
+def test_rate_reaches_the_schedulers(cache_dir):
+    muzik = Muzik(rate=50, burst=4)
+    for scheduler in muzik.schedulers.values():
+        assert (scheduler.rate, scheduler.burst) == (50, 4)
+
+
+def test_single_search_cache_opened(cache_dir, monkeypatch):
+    opened = []
+
+    class SlowSearchCache(SearchCache):
+        def __init__(self, path):
+            # long enough for every thread to ask for it
+            time.sleep(.05)
+            super().__init__(path)
+            opened.append(self)
+
+    monkeypatch.setattr(muzik_module, "SearchCache", SlowSearchCache)
+    muzik = Muzik(workers=8)
+    muzik._Muzik__sp_user = FakeSpotify(latency=0)
+    ids = muzik._Muzik__fetch_id(songs_frame(16))
+    assert ids.notnull().all()
+    assert opened == [muzik.search_cache]
@@ -0,0 +1,27 @@
+from src.muzik import Muzik
+from src.search_cache import SearchCache
+from benchmarks.fakes import FakeSpotify
+from tests.test_fetch_ids import songs_frame
+
+
+def test_search_cache_follows_relinked_and_deleted_ids(cache_dir):
+    endpoint = FakeSpotify(latency=0)
+    muzik = Muzik(workers=4)
+    muzik._Muzik__sp_user = endpoint
+    muzik.search_cache = SearchCache(cache_dir + "searches.sqlite")
+    songs = songs_frame(4)
+    muzik.ids = muzik._Muzik__fetch_id(songs)
+    old = list(muzik.ids)
+    endpoint.relinked = {old[0]: "relinked0"}
+    endpoint.deleted = {old[1]}
+
+    assert muzik.revalidate() == {"checked": 4, "relinked": 1,
+                                  "searched": 1, "calls": 2}
+    # the fake finds the same track for the deleted one
+    assert list(muzik.ids) == ["relinked0"] + old[1:]
+
+    calls = endpoint.calls
+    ids = muzik._Muzik__fetch_id(songs)
+    # every search answered by the cache, with the relinked id
+    assert endpoint.calls == calls
+    assert list(ids) == ["relinked0"] + old[1:]
@@ -0,0 +1,67 @@
+import pytest
+
+from src.muzik import Muzik
+from benchmarks.fakes import FakeSpotifyUser
+
+
+class PagesSpotifyUser(FakeSpotifyUser):
+    """FakeSpotifyUser counting the pages of tracks read, it should
+    never be read"""
+
+    def __init__(self, **kwargs):
+        super().__init__(latency=0, **kwargs)
+        self.pages = 0
+
+    def playlist_tracks(self, *args, **kwargs):
+        self.pages += 1
+        return super().playlist_tracks(*args, **kwargs)
+
+
+@pytest.fixture
+def endpoint():
+    return PagesSpotifyUser()
+
+
+def sync(endpoint, playlist_id, tracks):
+    muzik = Muzik()
+    muzik._Muzik__sp_user = endpoint
+    muzik._Muzik__user_id = "fake-user"
+    calls = endpoint.calls
+    muzik._Muzik__sync_playlist(playlist_id, tracks)
+    assert endpoint.playlists[playlist_id]["tracks"] == tracks
+    return endpoint.calls - calls
+
+
+def tracks(count, prefix="track"):
+    return [f"{prefix}{idx}" for idx in range(count)]
+
+
+def test_replaced_without_pushed_playlist(cache_dir, endpoint):
+    playlist_id = endpoint.user_playlist_create("fake-user", "test")["id"]
+    # nothing to compare with, not even the snapshot is read
+    assert sync(endpoint, playlist_id, tracks(250)) == 3
+
+
+def test_synced_when_unchanged_since_pushed(cache_dir, endpoint):
+    playlist_id = endpoint.user_playlist_create("fake-user", "test")["id"]
+    sync(endpoint, playlist_id, tracks(250))
+    target = tracks(250)
+    target[10:12] = ["new0", "new1"]
+    # the snapshot, one remove and one add
+    assert sync(endpoint, playlist_id, target) == 3
+    assert endpoint.pages == 0
+
+
+def test_edited_playlist_replaced(cache_dir, endpoint):
+    playlist_id = endpoint.user_playlist_create("fake-user", "test")["id"]
+    sync(endpoint, playlist_id, tracks(250))
+    endpoint.user_playlist_add_tracks("fake-user", playlist_id, ["hand"])
+    # reading the 3 pages would cost as much as the replace
+    assert sync(endpoint, playlist_id, tracks(250)) == 1 + 3
+    assert endpoint.pages == 0
+
+
+def test_replaced_when_operations_cost_more(cache_dir, endpoint):
+    playlist_id = endpoint.user_playlist_create("fake-user", "test")["id"]
+    sync(endpoint, playlist_id, tracks(250))
+    assert sync(endpoint, playlist_id, tracks(250, prefix="new")) == 1 + 3
@@ -0,0 +1,65 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import spotipy
+
+from src import scheduler as scheduler_module
+from src.scheduler import Scheduler, ScheduledClient
+from src.transport import Transport
+
+
+class ThrottlingHandler(BaseHTTPRequestHandler):
+    """Answers 429 to every other request"""
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests += 1
+            throttled = self.server.requests % 2 == 1
+        if throttled:
+            body = json.dumps({"error": {
+                "status": 429, "message": "API rate limit exceeded"}})
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+        else:
+            body = json.dumps({"tracks": {"items": []}})
+            self.send_response(200)
+        body = body.encode()
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ThrottlingHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.requests = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_throttled_calls_reach_the_scheduler(server, monkeypatch):
+    # retried right away, as asked by the stub
+    monkeypatch.setattr(scheduler_module, "BACKOFF", 0)
+    # the sessions of the Spotify clients of Muzik
+    client = spotipy.Spotify(auth="fake",
+                             requests_session=Transport().session())
+    client.prefix = f"http://127.0.0.1:{server.server_address[1]}/v1/"
+    scheduler = Scheduler("stub", rate=1e6, burst=1e6)
+
+    for _ in range(3):
+        assert ScheduledClient(client, scheduler).search("track:fake") == \
+            {"tracks": {"items": []}}
+    # every 429 was retried by the scheduler, never by urllib3
+    assert scheduler.stats()["throttles"] == 3
+    assert server.requests == 6
@@ -0,0 +1,69 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+from benchmarks.transport import StubServer, spotify, sheet_request
+from src.transport import Transport
+
+
+@pytest.fixture
+def server():
+    server = StubServer(handshake=0, latency=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_bytes_counted_on_the_wire(server):
+    transport = Transport()
+    client = spotify(server, transport.session())
+    http = transport.http()
+    for _ in range(3):
+        client.search("track:fake")
+    sheet_request(server, http)
+    # gzipped answers, as sent by the stub
+    assert transport.stats()["bytes"] == server.bytes_sent
+    assert 0 < http.bytes_received < server.bytes_sent
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_connections_reused(server, workers):
+    transport = Transport(pool_maxsize=workers)
+    client = spotify(server, transport.session())
+    with ThreadPoolExecutor(workers) as executor:
+        list(executor.map(lambda _: client.search("track:fake"), range(40)))
+    # a Sheets request to the same host goes through the same pool
+    sheet_request(server, transport.http())
+    stats = transport.stats()
+    assert server.requests == stats["requests"] == 41
+    assert server.connections == stats["connections"] <= workers
+    assert stats["reused"] >= 41 - workers
+
+
+def test_pools_grown_by_reserve(server):
+    transport = Transport(pool_maxsize=1)
+    transport.reserve(4)
+    client = spotify(server, transport.session())
+    with ThreadPoolExecutor(4) as executor:
+        list(executor.map(lambda _: client.search("track:fake"), range(40)))
+    # the connections opened beyond the pool size would be closed after
+    # every request
+    assert server.connections <= 4
+    assert transport.stats()["reused"] >= 36
+
+
+def test_timeout_of_the_caller_wins():
+    server = StubServer(handshake=0, latency=.3)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        session = Transport(timeouts={"127.0.0.1": (1, 1)}).session()
+        # the timeout of the host
+        assert session.get(server.url + "v1/search").ok
+        with pytest.raises(requests.exceptions.ReadTimeout):
+            session.get(server.url + "v1/search", timeout=(1, .1))
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,52 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.util import save_cache, load_cache
+
+
+def sheet():
+    index = pd.MultiIndex.from_arrays(
+        [["Rock", "Rock", "Jazz"], ["Song 1", "Song 2", "Song 3"]],
+        names=["genre", "song"])
+    return pd.DataFrame({"Qu": ["8", None, "7,5"], "Vi": ["", "9", "9"]},
+                        index=index)
+
+
+def test_round_trip(cache_dir):
+    save_cache(sheet(), "sheet")
+    loaded = load_cache("sheet")
+    pd.testing.assert_frame_equal(loaded.astype(object), sheet())
+    ids = pd.Series(["a", None, ""], index=["x", "y", "z"], name="ids")
+    save_cache(ids, "ids")
+    pd.testing.assert_series_equal(load_cache("ids"), ids)
+
+
+def test_only_changed_columns_written(cache_dir):
+    save_cache(sheet(), "sheet")
+    before = set(os.listdir(cache_dir + "sheet"))
+    loaded = load_cache("sheet")
+    save_cache(loaded, "sheet")
+    assert set(os.listdir(cache_dir + "sheet")) == before
+
+    changed = loaded.astype(object)
+    changed.loc[("Jazz", "Song 3"), "Vi"] = "4"
+    save_cache(changed, "sheet")
+    after = set(os.listdir(cache_dir + "sheet"))
+    # codes and table of Vi replaced, the others kept
+    assert len(after - before) == len(before - after) == 2
+    assert load_cache("sheet").loc[("Jazz", "Song 3"), "Vi"] == "4"
+
+
+def test_first_version_read(cache_dir):
+    path = cache_dir + "ids/"
+    os.makedirs(path)
+    for name, codes, table in (("index0", [0, 1], ["x", "y"]),
+                               ("column0", [1, -1], ["a", "b"])):
+        np.save(path + f"{name}.codes.npy", np.array(codes, dtype=np.int32))
+        np.save(path + f"{name}.table.npy", np.array(table, dtype=str))
+    with open(path + "schema.json", "w") as handle:
+        handle.write('{"version": 1, "kind": "series", "index": [null], '
+                     '"columns": ["ids"]}')
+    assert load_cache("ids").to_dict() == {"x": "b", "y": None}